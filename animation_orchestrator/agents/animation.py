@@ -1,20 +1,30 @@
 import os
-import time
+import hashlib
 import mimetypes
 import logging
-from typing import Optional
+from concurrent.futures import Future
+from typing import Callable, Optional
 
 import google.genai
 from google.genai import types
 
+from gcs import get_storage_fetcher
+from metrics import timed
+from placeholder import DEFAULT_VARIANT, get_placeholder_videos
+from veo_poller import OperationPoller
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Aspect ratios accepted by Veo
+VEO_ASPECT_RATIOS = ("16:9", "9:16")
+
 class AnimationAgent:
     def __init__(self, location: str = "us-central1", project_id: str = "amibuddy"):
         self.location = location
         self.project_id = project_id
+        self.placeholders = get_placeholder_videos()
         
         # Prioritize API Key (AI Studio) to avoid Vertex AI costs
         self.api_key = os.environ.get("GEMINI_API_KEY")
@@ -30,32 +40,50 @@ class AnimationAgent:
             logger.error(f"Error initializing Google Gen AI Client: {e}")
             self.client = None
 
-    def generate_animation(self, 
-                           frame1_path: str, 
-                           audio_path: Optional[str] = None, 
-                           character_description: str = "") -> str:
-        """
-        Generates an animation using Veo 3.1 via Google Gen AI SDK.
-        Returns the path to the generated video.
-        """
-        
-        prompt = f"""
+        # One asyncio poller tracks every in-flight Veo operation of this agent
+        self.poller = OperationPoller(self.client) if self.client else None
+
+    def _prompt(self, character_description: str) -> str:
+        return f"""
         [Shot: Medium Close-up] 
         [Subject: Hand-drawn character, {character_description}] 
         [Action: The character talks with an engaging expression, moving its mouth and making friendly hand gestures as if explaining something.] 
         [Aesthetics: Soft crayon texture, vibrant colors, warm "Hanamaru" glow]
         """
-        
+
+    def start_animation(self,
+                        frame1_path: str,
+                        character_description: str = "",
+                        aspect_ratio: Optional[str] = None,
+                        on_progress: Optional[Callable[[float], None]] = None) -> Optional[Future]:
+        """
+        Submits a Veo 3.1 generation and hands it to the shared poller.
+        An identical request (same frame, prompt and aspect ratio) that is still running, or finished
+        recently, is attached to instead of being submitted again.
+        Returns a Future resolving to the finished operation, or None if nothing could be submitted.
+        """
+        if aspect_ratio is not None and aspect_ratio not in VEO_ASPECT_RATIOS:
+            raise ValueError(f"Unsupported aspect ratio {aspect_ratio}. Use one of {list(VEO_ASPECT_RATIOS)}.")
+
+        prompt = self._prompt(character_description)
         logger.info(f"Generating animation with prompt: {prompt}")
-        
+
         if not self.client:
             logger.warning("Client not initialized. Generating placeholder.")
-            return self._generate_placeholder_video("output_animation.mp4")
+            return None
 
         try:
             # Read image file
             with open(frame1_path, "rb") as f:
                 image_bytes = f.read()
+
+            request_key = hashlib.sha256(image_bytes + prompt.encode() + str(aspect_ratio).encode()).hexdigest()
+            existing = self.poller.find(request_key)
+            if existing is not None:
+                logger.info(f"Attaching to existing Veo operation for request {request_key[:12]}")
+                if on_progress:
+                    self.poller.add_progress_callback(request_key, on_progress)
+                return existing
             
             mime_type, _ = mimetypes.guess_type(frame1_path)
             if not mime_type:
@@ -69,146 +97,103 @@ class AnimationAgent:
             
             # Call generate_videos using the recommended 'source' parameter
             logger.info("Sending request to Veo model...")
-            operation = self.client.models.generate_videos(
-                model="veo-3.1-generate-preview",
-                source=types.GenerateVideosSource(
-                    prompt=prompt,
-                    image=image_input
-                ),
-                config=types.GenerateVideosConfig(
-                    # sample_count=1, # Not supported in this version
+            with timed("veo_submit"):
+                operation = self.client.models.generate_videos(
+                    model="veo-3.1-generate-preview",
+                    source=types.GenerateVideosSource(
+                        prompt=prompt,
+                        image=image_input
+                    ),
+                    config=types.GenerateVideosConfig(
+                        # sample_count=1, # Not supported in this version
+                        aspect_ratio=aspect_ratio,
+                    )
                 )
-            )
             
             logger.info(f"Operation started: {operation.name}")
-            
-            # Poll operation
-            while not operation.done:
-                logger.info("Polling operation...")
-                time.sleep(10)
-                operation = self.client.operations.get(operation)
+            return self.poller.track(operation, request_key, on_progress)
+
+        except Exception as e:
+            logger.error(f"Error submitting generation: {e}")
+            return None
+
+    def finish_animation(self,
+                         operation_future: Optional[Future],
+                         output_path: str = "output_animation.mp4",
+                         aspect_ratio: Optional[str] = None) -> str:
+        """
+        Writes the video of a finished operation (from start_animation) to output_path and returns that path.
+        Any failure falls back to a placeholder clip.
+        """
+        if operation_future is None:
+            return self._generate_placeholder_video(output_path, aspect_ratio)
+
+        try:
+            operation = operation_future.result()
 
             if operation.error:
                 logger.error(f"Operation failed: {operation.error}")
-                return self._generate_placeholder_video("output_animation.mp4")
+                return self._generate_placeholder_video(output_path, aspect_ratio)
             
             # Retrieve result
             # result might be in operation.result
             if not operation.result or not operation.result.generated_videos:
                 logger.error("No generated videos in result.")
-                return self._generate_placeholder_video("output_animation.mp4")
+                return self._generate_placeholder_video(output_path, aspect_ratio)
 
             video_result = operation.result.generated_videos[0]
-            output_path = "output_animation.mp4"
-
-            # Check if we have uri or bytes
-            if hasattr(video_result, 'video') and hasattr(video_result.video, 'uri') and video_result.video.uri:
-                logger.info(f"Video URI: {video_result.video.uri}")
-                # If it's a GCS URI, we might need to download it.
-                # Use client.files.get_content? Or just requests if public?
-                # Usually Veo output is in GCS bucket of the project.
-                # We need to download it.
-                # Since we have google-auth, we can use storage client or simplified download if available.
-                # For now, let's assume we need to handle bytes if possible, or implement GCS download.
-                # WAIT: earlier REST API response had `bytesBase64Encoded`.
-                # Does SDK return bytes?
-                # If `video.video_bytes` exists?
-                pass
-            
-            # Temporary: if we get a URI, we can't easily download without Storage client/permissions setup
-            # unless the SDK provides a helper.
-            # I will check if `video_result` has bytes.
-            
-            # If we simply return the path (which might be what success looks like for now), user can download it?
-            # But the user wants a file `output_animation.mp4` locally.
-            
-            # Let's try to access `video.video_bytes` or fallback to placeholder (simulation).
-            # If the SDK usage example ends with `.uri`, it likely returns URI.
-            
-            # I'll implement a basic GCS download using `google-auth` requests if URI is present.
-            
+
             if hasattr(video_result, 'video') and hasattr(video_result.video, 'video_bytes') and video_result.video.video_bytes:
                  with open(output_path, "wb") as f:
                      f.write(video_result.video.video_bytes)
                  logger.info(f"Saved video to {output_path}")
             elif hasattr(video_result, 'video') and hasattr(video_result.video, 'uri') and video_result.video.uri:
+                 logger.info(f"Video URI: {video_result.video.uri}")
                  # Download from GCS URI
                  self._download_gcs_uri(video_result.video.uri, output_path)
             else:
                  logger.warning("Could not find video bytes or URI.")
-                 return self._generate_placeholder_video("output_animation.mp4")
+                 return self._generate_placeholder_video(output_path, aspect_ratio)
 
             return output_path
 
         except Exception as e:
             logger.error(f"Error during generation: {e}")
-            return self._generate_placeholder_video("output_animation.mp4")
+            return self._generate_placeholder_video(output_path, aspect_ratio)
+
+    def generate_animation(self, 
+                           frame1_path: str, 
+                           audio_path: Optional[str] = None, 
+                           character_description: str = "",
+                           output_path: str = "output_animation.mp4",
+                           aspect_ratio: Optional[str] = None) -> str:
+        """
+        Generates an animation using Veo 3.1 via Google Gen AI SDK, blocking until it is done.
+        Writes the video to output_path and returns that path.
+        aspect_ratio ("16:9" or "9:16") is passed to Veo; failures fall back to a placeholder of that shape.
+        """
+        operation_future = self.start_animation(frame1_path, character_description, aspect_ratio)
+        return self.finish_animation(operation_future, output_path, aspect_ratio)
 
     # Helper for GCS download if needed
     def _download_gcs_uri(self, uri: str, output_path: str):
-        # uri format: gs://bucket/path
-        if not uri.startswith("gs://"):
-             logger.error(f"Invalid GCS URI: {uri}")
-             return
-        
-        # We can use `gsutil` logic or `google.cloud.storage`
-        # But we only have `google-auth`.
-        # We can use XML API or JSON API with requests.
-        # https://storage.googleapis.com/download/storage/v1/b/BUCKET/o/OBJECT?alt=media
-        
-        try:
-            parts = uri[5:].split("/", 1)
-            bucket_name = parts[0]
-            object_name = parts[1]
-            
-            url = f"https://storage.googleapis.com/storage/v1/b/{bucket_name}/o/{object_name.replace('/', '%2F')}?alt=media"
-            
-            import google.auth.transport.requests
-            import requests
-            
-            credentials, _ = google.auth.default()
-            auth_req = google.auth.transport.requests.Request()
-            credentials.refresh(auth_req)
-            
-            response = requests.get(url, headers={"Authorization": f"Bearer {credentials.token}"})
-            if response.status_code == 200:
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                logger.info(f"Downloaded video from {uri} to {output_path}")
-            else:
-                logger.error(f"Failed to download from GCS: {response.status_code} {response.text}")
-        except Exception as e:
-            logger.error(f"Error downloading GCS object: {e}")
+        # Shared fetcher: cached credentials, pooled connections, streamed and resumable.
+        # Errors propagate (the partial file is already removed) so the caller falls back to a placeholder
+        with timed("video_download"):
+            get_storage_fetcher().download_to_file(uri, output_path)
 
 
-    def _generate_placeholder_video(self, output_path: str):
-        # ... (keep existing placeholder logic but verify imports)
-        import cv2
-        import numpy as np
-        
-        width, height = 720, 720
-        fps = 30
-        duration_sec = 5
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        if not out.isOpened():
-            with open(output_path, "wb") as f:
-                f.write(b"")
-            return
-
-        frame_count = duration_sec * fps
-        for i in range(frame_count):
-            img = np.zeros((height, width, 3), dtype=np.uint8)
-            t = i / frame_count
-            x = int(width * t)
-            y = int(height // 2)
-            cv2.circle(img, (x, y), 50, (0, 255, 255), -1) 
-            cv2.putText(img, "SDK Simulation Mode", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            out.write(img)
-        out.release()
-        logger.info(f"Placeholder video generated at {output_path}")
+    def _generate_placeholder_video(self, output_path: str, aspect_ratio: Optional[str] = None):
+        # Pre-rendered clip, so a burst of Veo failures does not turn into a burst of OpenCV encodes
+        self.placeholders.write_to(output_path, aspect_ratio or DEFAULT_VARIANT)
+        logger.info(f"Placeholder video written to {output_path}")
         return output_path
 
+    def warmup(self):
+        """
+        Loads (or renders) every placeholder variant up front.
+        """
+        self.placeholders.load_all()
+
 if __name__ == "__main__":
     agent = AnimationAgent()
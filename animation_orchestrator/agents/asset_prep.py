@@ -1,36 +1,112 @@
-from rembg import remove
+from rembg import remove, new_session
 from PIL import Image
-import io
+import numpy as np
 import os
+import queue
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
+from ingest import IngestedImage, as_ingested
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ImageInput = Union[Image.Image, np.ndarray]
 
 class AssetPrepAgent:
-    def __init__(self):
-        pass
+    def __init__(self, model_name: str = "u2net", pool_size: Optional[int] = None,
+                 intra_op_threads: Optional[int] = None):
+        """
+        Keeps a pool of long-lived rembg/ONNX Runtime sessions so background removal
+        does not pay session setup per call. One session serves one image at a time.
+        """
+        self.model_name = model_name
+        self.pool_size = pool_size or int(os.environ.get("REMBG_SESSIONS", 1))
+        self.intra_op_threads = intra_op_threads or int(os.environ.get("REMBG_INTRA_OP_THREADS", 0))
+
+        self._sessions = queue.Queue()
+        for _ in range(self.pool_size):
+            self._sessions.put(self._new_session())
+        self._batch_executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="rembg")
+        logger.info(f"AssetPrepAgent: {self.pool_size} rembg session(s) for {model_name}")
 
-    def process_image(self, input_path: str, output_path: str, upscale_factor: int = 2):
+    def _new_session(self):
+        if not self.intra_op_threads:
+            return new_session(self.model_name)
+
+        # rembg only reads thread counts from OMP_NUM_THREADS, so build the session options ourselves
+        try:
+            import onnxruntime as ort
+            from rembg.sessions import sessions_class
+
+            sess_opts = ort.SessionOptions()
+            sess_opts.intra_op_num_threads = self.intra_op_threads
+            sess_opts.inter_op_num_threads = 1
+            session_class = next(c for c in sessions_class if c.name() == self.model_name)
+            return session_class(self.model_name, sess_opts)
+        except Exception as e:
+            logger.warning(f"Could not set rembg thread count, using defaults: {e}")
+            return new_session(self.model_name)
+
+    @contextmanager
+    def _session(self):
+        session = self._sessions.get()
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def warmup(self):
         """
-        Removes background and optionally upscales the image.
+        Runs background removal once per session so every u2net session is hot before the first request.
         """
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input image not found: {input_path}")
+        dummy = Image.new("RGB", (64, 64), "white")
+        for _ in range(self.pool_size):
+            with self._session() as session:
+                remove(dummy, session=session)
+
+    def _process(self, image: Image.Image, upscale_factor: int) -> Image.Image:
+        with self._session() as session, timed("rembg"):
+            img = remove(image, session=session)
 
-        # Load image
-        with open(input_path, 'rb') as i:
-            input_data = i.read()
-            subject = remove(input_data)
-        
-        img = Image.open(io.BytesIO(subject))
-        
         # Upscale (Basic implementation using PIL, real "Nano Banana" might use better AI upscaling)
         # Using LANCZOS for high quality downsampling/upsampling
-        new_size = (img.width * upscale_factor, img.height * upscale_factor)
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
-        
+        if upscale_factor != 1:
+            new_size = (img.width * upscale_factor, img.height * upscale_factor)
+            with timed("upscale"):
+                img = img.resize(new_size, Image.Resampling.LANCZOS)
+        return img
+
+    def process_array(self, image: ImageInput, upscale_factor: int = 2) -> np.ndarray:
+        """
+        Removes background and upscales an already decoded image (PIL image or HxWxC array).
+        Returns an HxWx4 RGBA uint8 array.
+        """
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        return np.asarray(self._process(image, upscale_factor))
+
+    def process_batch(self, images: List[ImageInput], upscale_factor: int = 2) -> List[np.ndarray]:
+        """
+        Processes several images across the session pool. Results keep the input order.
+        """
+        return list(self._batch_executor.map(lambda img: self.process_array(img, upscale_factor), images))
+
+    def process_image(self, image: Union[str, IngestedImage], output_path: str, upscale_factor: int = 2):
+        """
+        Removes background and optionally upscales the image (shared IngestedImage or file path).
+        """
+        img = self._process(as_ingested(image).image, upscale_factor)
+
         # Ensure directory exists
         output_dir = os.path.dirname(output_path)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
-        
+
         # Save as PNG
         img.save(output_path, format="PNG")
         print(f"Processed image saved to {output_path}")
@@ -0,0 +1,180 @@
+import logging
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from google import genai
+from google.genai import types
+from pydantic import BaseModel, Field, ValidationError
+
+from cache import AnalysisCache, get_analysis_cache
+from gemini_image import GeminiImageEncoding, get_gemini_encoding
+from ingest import IngestedImage, as_ingested
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_ID = "gemini-2.5-flash"
+# Bump whenever the prompt below changes so cached analyses are not reused
+PROMPT_VERSION = "analysis-v1"
+
+class Keypoint(BaseModel):
+    name: str = Field(..., description="Name of the keypoint (e.g., nose, left_eye, right_shoulder)")
+    x: float = Field(..., description="Normalized X coordinate (0.0-1.0)")
+    y: float = Field(..., description="Normalized Y coordinate (0.0-1.0)")
+    confidence: float = Field(..., description="Confidence score (0.0-1.0)")
+
+class CharacterRig(BaseModel):
+    character_name: str = Field(default="Unknown", description="Name of the character")
+    description: str = Field(default="", description="Visual description of the character")
+    keypoints: List[Keypoint] = Field(..., description="List of detected keypoints")
+
+class CharacterAnalysis(CharacterRig):
+    """
+    Combined result of one Gemini call: the decomposition fields (name, description, keypoints)
+    plus the rigging fields (joints, part boxes, mouth) used for segmentation.
+    Every field is optional so a partial answer still yields whatever rig it contains.
+    """
+    keypoints: List[Keypoint] = Field(default_factory=list, description="List of detected keypoints")
+    joints: Optional[Dict[str, Any]] = Field(default=None, description="Joint name -> normalized [x, y]")
+    parts: Optional[Dict[str, Any]] = Field(default=None, description="Part name -> normalized [ymin, xmin, ymax, xmax]")
+    mouth: Optional[Dict[str, Any]] = Field(default=None, description="Mouth center [x, y] and box")
+
+    @classmethod
+    def from_response(cls, data: Any) -> "CharacterAnalysis":
+        """
+        Validates a Gemini answer (or cached analysis). Like the former rigging agent, which passed the
+        JSON through as-is, a slightly malformed answer is not fatal: invalid keypoints are dropped
+        and any other field that does not validate falls back to its default.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object from Gemini, got {type(data).__name__}")
+        try:
+            return cls(**data)
+        except ValidationError as e:
+            logger.warning(f"Gemini answer only partially valid, keeping the valid fields: {e}")
+
+        keypoints = []
+        for keypoint in data.get("keypoints") or []:
+            try:
+                keypoints.append(Keypoint(**keypoint))
+            except (ValidationError, TypeError):
+                continue
+        kept: Dict[str, Any] = {"keypoints": keypoints}
+        for name in cls.model_fields:
+            if name == "keypoints" or data.get(name) is None:
+                continue
+            try:
+                cls(**kept, **{name: data[name]})
+                kept[name] = data[name]
+            except ValidationError:
+                continue
+        return cls(**kept)
+
+    def rig_data(self) -> Dict[str, Any]:
+        """
+        The part of the analysis /segment-character returns (same shape the former rigging agent produced).
+        """
+        return self.model_dump(include={"joints", "parts", "mouth"}, exclude_none=True)
+
+class CharacterAnalysisAgent:
+    """
+    Rigging (joints, part boxes, mouth) and decomposition (name, description, keypoints) in a single
+    Gemini request whose result is cached per image, so /segment-character followed by
+    /animate for the same drawing costs one LLM call.
+    """
+
+    def __init__(self, api_key: str = None, cache: Optional[AnalysisCache] = None,
+                 encoding: Optional[GeminiImageEncoding] = None):
+        self.cache = cache or get_analysis_cache()
+        self.encoding = encoding or get_gemini_encoding()
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        if not self.api_key:
+            logger.error("GEMINI_API_KEY not found. Vertex AI fallback is disabled to prevent costs.")
+            raise ValueError("GEMINI_API_KEY is required. Please set it in your environment.")
+        self.client = genai.Client(api_key=self.api_key)
+
+    def analyze_image(self, image: Union[str, IngestedImage]) -> CharacterAnalysis:
+        image = as_ingested(image)
+        cache_key = AnalysisCache.make_key(image.hash, MODEL_ID, f"{PROMPT_VERSION}/{self.encoding.signature}")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Character analysis served from cache.")
+            return CharacterAnalysis.from_response(cached)
+
+        prompt = """
+        Analyze this character drawing for animation rigging.
+        Provide a JSON object with the following structure:
+        {
+            "character_name": "Name if written, else a creative name",
+            "description": "Brief visual description",
+            "keypoints": [
+                {"name": "nose", "x": 0.5, "y": 0.3, "confidence": 0.95},
+                ...
+            ],
+            "joints": {
+                "neck": [x, y],
+                "left_shoulder": [x, y],
+                "right_shoulder": [x, y],
+                "left_elbow": [x, y],
+                "right_elbow": [x, y],
+                "left_hand": [x, y],
+                "right_hand": [x, y],
+                "hips": [x, y]
+            },
+            "parts": {
+                "head": [ymin, xmin, ymax, xmax],
+                "body": [ymin, xmin, ymax, xmax],
+                "left_arm": [ymin, xmin, ymax, xmax],
+                "right_arm": [ymin, xmin, ymax, xmax],
+                "left_leg": [ymin, xmin, ymax, xmax],
+                "right_leg": [ymin, xmin, ymax, xmax]
+            },
+            "mouth": {
+                "center": [x, y],
+                "box": [ymin, xmin, ymax, xmax]
+            }
+        }
+
+        For "keypoints", identify the following if visible:
+        nose, left_eye, right_eye, left_ear, right_ear, left_shoulder, right_shoulder,
+        left_elbow, right_elbow, left_wrist, right_wrist, left_hip, right_hip,
+        left_knee, right_knee, left_ankle, right_ankle.
+
+        All coordinates should be normalized (0.0 to 1.0) relative to the image width and height.
+        IMPORTANT: For "parts", ensure the bounding boxes are GENEROUS and INCLUSIVE.
+        Include the ENTIRE limb, even if it overlaps with the body slightly.
+        Do not crop off hands, feet, or joints. It is better to include a bit more than less.
+        For example, "left_arm" should include the shoulder, elbow, wrist, and hand.
+        RETURN ONLY JSON.
+        """
+
+        try:
+            logger.info(f"Sending request to Gemini ({MODEL_ID})...")
+            image_part = self.encoding.part(image.image)
+            with timed("gemini_analysis"):
+                response = self.client.models.generate_content(
+                    model=MODEL_ID,
+                    contents=[prompt, image_part],
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        temperature=0.1
+                    )
+                )
+
+            if not response.text:
+                error_msg = f"No JSON returned from Gemini. Response: {response}"
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+
+            # Clean up potential markdown code blocks
+            clean_text = response.text.replace("```json", "").replace("```", "").strip()
+            analysis = CharacterAnalysis.from_response(json.loads(clean_text))
+            self.cache.set(cache_key, analysis.model_dump())
+            return analysis
+
+        except Exception as e:
+            logger.error(f"Character analysis failed: {e}", exc_info=True)
+            raise
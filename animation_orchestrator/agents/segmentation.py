@@ -1,23 +1,72 @@
+import io
 import os
+import json
+import hashlib
 import logging
+import threading
 import numpy as np
 import torch
 from PIL import Image
-import uuid
-from typing import List, Dict, Any, Optional
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import firebase_admin
 from firebase_admin import credentials, storage
+from google.api_core.exceptions import PreconditionFailed
+from requests.adapters import HTTPAdapter
 
 from sam2.build_sam import build_sam2
 from sam2.sam2_image_predictor import SAM2ImagePredictor
 
+from atlas import build_atlas
+from cache import BlobIndex, EmbeddingCache
+from compositing import PartCompositor
+from ingest import IngestedImage, as_ingested
+from metrics import submit, timed
+from sam2_backends import install_backend
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Quality tiers. SAM 2 always encodes at its fixed 1024px input, so the tiers trade what comes
+# after the encoder: the cap on the longest side of the part images (None = the ingested image
+# size; smaller masks are upsampled from the low-res logits, and compositing, PNG encoding and
+# upload all scale with pixel count) and the zlib level of the part PNGs (1 = fastest, 6 = PIL default).
+SEGMENTATION_TIERS = {
+    "fast": {"output_side": 768, "png_compress_level": 1},
+    "balanced": {"output_side": 1024, "png_compress_level": 3},
+    "high": {"output_side": None, "png_compress_level": 6},
+}
+DEFAULT_TIER = os.environ.get("SEGMENTATION_TIER", "high")
+# Images per set_image_batch call in segment_many
+BATCH_SIZE = int(os.environ.get("SEGMENTATION_BATCH_SIZE", 4))
+# Uploads are content-addressed (<prefix>/<sha256>.<ext>), so an object never changes once written
+CONTENT_PREFIX = os.environ.get("PART_BLOB_PREFIX", "characters/sha256")
+CACHE_CONTROL = os.environ.get("PART_CACHE_CONTROL", "public, max-age=31536000, immutable")
+
+
+def _fit(size, max_side: Optional[int]):
+    """
+    (width, height) scaled down so the longest side is at most max_side.
+    """
+    width, height = size
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _resized_array(image: IngestedImage, size) -> np.ndarray:
+    if tuple(size) == tuple(image.size):
+        return image.array
+    return np.asarray(image.image.resize(size, Image.Resampling.BILINEAR))
+
+
 class SegmentationAgent:
-    def __init__(self, checkpoint_path: str = "checkpoints/sam2_hiera_tiny.pt", model_cfg: str = "sam2_hiera_t.yaml"):
+    def __init__(self, checkpoint_path: str = "checkpoints/sam2_hiera_tiny.pt", model_cfg: str = "sam2_hiera_t.yaml",
+                 upload_workers: Optional[int] = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Using device: {self.device}")
         
@@ -32,6 +81,26 @@ class SegmentationAgent:
             logger.error(f"Failed to initialize SAM 2: {e}")
             self.predictor = None
 
+        # Encoder backend for CPU inference (SAM2_BACKEND), validated against eager outputs
+        self.backend = "eager"
+        if self.predictor and self.device == "cpu":
+            self.backend = install_backend(self.predictor)
+
+        # The predictor holds per-image state, so only one request may use it at a time
+        self.predictor_lock = threading.Lock()
+        # Image embeddings by image hash, so part refinements only run the mask decoder
+        self.embedding_cache = EmbeddingCache()
+        # Builds every part's RGBA image from the mask stack in one pass, on pooled buffers
+        self.compositor = PartCompositor()
+
+        # Part uploads run concurrently on a small bounded pool
+        self.upload_workers = upload_workers or int(os.environ.get("UPLOAD_WORKERS", 8))
+        self.upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="upload")
+        # Objects known to be in the bucket, so repeat parts skip both the existence check and the upload
+        self.blob_index = BlobIndex()
+        self._upload_counters = {"uploaded": 0, "skipped": 0, "uploaded_bytes": 0, "skipped_bytes": 0}
+        self._upload_counters_lock = threading.Lock()
+
         # Initialize Firebase
         self.init_error = None
         self._init_firebase()
@@ -72,6 +141,8 @@ class SegmentationAgent:
             except Exception as bucket_err:
                 logger.error(f"storage.bucket() failed for name '{bucket_name}': {bucket_err}")
                 raise bucket_err
+
+            self._size_connection_pool()
             
         except Exception as e:
             logger.error(f"Failed to initialize Firebase: {e}")
@@ -79,113 +150,445 @@ class SegmentationAgent:
             self.init_error = f"{str(e)} (bucket: {repr(bucket_name)})"
             self.bucket = None
 
-    def segment_and_upload(self, image_path: str, rig_data: Dict[str, Any]) -> Dict[str, str]:
+    def _size_connection_pool(self):
+        # The storage client shares one HTTP session; give it enough pooled connections
+        # for every upload worker so parallel uploads reuse keep-alive connections.
+        try:
+            adapter = HTTPAdapter(pool_connections=self.upload_workers, pool_maxsize=self.upload_workers)
+            self.bucket.client._http.mount("https://", adapter)
+        except Exception as e:
+            logger.warning(f"Could not resize storage connection pool: {e}")
+
+    def warmup(self):
         """
-        Segments the image based on rig data (joints/parts) and uploads parts to Firebase.
-        Returns a dictionary of part_name -> url.
+        Runs one dummy encode + decode so the first request does not pay for lazy torch setup.
+        Only needs the model: a missing bucket fails the upload paths, not the warmup.
         """
+        self._check_predictor()
+        if not self.bucket:
+            logger.warning(f"SAM 2 warmed up without a Firebase bucket; uploads will fail: {self.init_error}")
+        dummy = np.full((256, 256, 3), 255, dtype=np.uint8)
+        with self.predictor_lock, torch.inference_mode():
+            self.predictor.set_image(dummy)
+            self.predictor.predict(
+                point_coords=None,
+                point_labels=None,
+                box=np.array([[64, 64, 192, 192]], dtype=np.float32),
+                multimask_output=False,
+            )
+            self.predictor.reset_predictor()
+
+    def _check_predictor(self):
         if not self.predictor:
             error_msg = "SAM 2 Predictor not initialized"
             logger.error(error_msg)
-            raise ValueError(error_msg)
-        
+            raise RuntimeError(error_msg)
+
+    def _check_ready(self):
+        self._check_predictor()
         if not self.bucket:
              error_msg = f"Firebase bucket not initialized. Error: {self.init_error}"
              logger.error(error_msg)
-             raise ValueError(error_msg)
+             raise RuntimeError(error_msg)
 
-        results = {}
-        
-        # Remove broad try/except to see actual error
-        # try:
-        image = Image.open(image_path).convert("RGB")
-        # Resize if needed? SAM 2 handles it.
-        # Set image
-        self.predictor.set_image(np.array(image))
-        
-        # Map parts to prompts
-        # rig_data['parts'] contains { "head": [ymin, xmin, ymax, xmax], ... }
-        # SAM 2 expects box in [xmin, ymin, xmax, ymax] format usually? 
-        # Check prompt format. Typically [x1, y1, x2, y2].
-        # Gemini returns [ymin, xmin, ymax, xmax] (normalized 0-1) usually if asked.
-        # My Prompt asked for "normalized".
-        
+    def _tier(self, tier: Optional[str]) -> Dict[str, Optional[int]]:
+        tier = tier or DEFAULT_TIER
+        if tier not in SEGMENTATION_TIERS:
+            raise ValueError(f"Unknown segmentation tier {tier}. Use one of {list(SEGMENTATION_TIERS)}.")
+        return SEGMENTATION_TIERS[tier]
+
+    def _store_embedding(self, cache_key: str, features: Dict[str, Any], orig_hw, image: IngestedImage):
+        nbytes = sum(
+            t.numel() * t.element_size()
+            for t in [features["image_embed"], *features["high_res_feats"]]
+        ) + image.size[0] * image.size[1] * 3  # RGB array
+        self.embedding_cache.set(cache_key, {
+            "features": features,
+            "orig_hw": orig_hw,
+            "image": image,
+        }, nbytes)
+
+    def _set_image(self, image_hash: str, image: Optional[IngestedImage] = None) -> IngestedImage:
+        """
+        Points the predictor at an image, reusing a cached embedding when one exists.
+        Must be called with self.predictor_lock held.
+        Returns the image the embedding belongs to.
+        """
+        cached = self.embedding_cache.get(image_hash)
+        if cached is not None:
+            logger.info(f"Reusing cached SAM 2 embedding for {image_hash[:12]}")
+            self.predictor.reset_predictor()
+            self.predictor._features = cached["features"]
+            self.predictor._orig_hw = [cached["orig_hw"]]
+            self.predictor._is_image_set = True
+            self.predictor._is_batch = False
+            return cached["image"]
+
+        if image is None:
+            raise LookupError(f"No cached embedding for image {image_hash}. Segment it again first.")
+
+        # Runs the Hiera image encoder, the expensive part of segmentation
+        with timed("sam2_encode"):
+            self.predictor.set_image(image.array)
+        self._store_embedding(image_hash, self.predictor._features, self.predictor._orig_hw[0], image)
+        return image
+
+    def _encode_batch(self, images: List[IngestedImage]):
+        """
+        Runs the encoder once over every image that has no cached embedding yet (set_image_batch)
+        and caches each image's slice of the batched features. Must be called with self.predictor_lock held.
+        """
+        todo, seen = [], set()
+        for image in images:
+            if image.hash not in self.embedding_cache and image.hash not in seen:
+                seen.add(image.hash)
+                todo.append((image.hash, image))
+        if not todo:
+            return
+
+        logger.info(f"Encoding {len(todo)} images in one SAM 2 batch")
+        with timed("sam2_encode_batch"):
+            self.predictor.set_image_batch([image.array for _, image in todo])
+        features = self.predictor._features
+        for i, (cache_key, image) in enumerate(todo):
+            # Cloned so every cached embedding owns its memory instead of pinning the whole batch
+            single = {
+                "image_embed": features["image_embed"][i:i + 1].clone(),
+                "high_res_feats": [f[i:i + 1].clone() for f in features["high_res_feats"]],
+            }
+            self._store_embedding(cache_key, single, self.predictor._orig_hw[i], image)
+        self.predictor.reset_predictor()
+
+    def _masks_at(self, masks: np.ndarray, low_res: np.ndarray, count: int, output_size) -> np.ndarray:
+        """
+        Boolean (count, H, W) masks at output_size. When that is smaller than the image, the
+        256x256 low-res logits are upsampled directly instead of resizing the full-size masks.
+        """
+        width, height = output_size
+        if tuple(masks.shape[-2:]) == (height, width):
+            return masks.reshape(count, -1, height, width)[:, 0].astype(bool)
+        with timed("mask_upsample"):
+            logits = torch.from_numpy(low_res.reshape(count, -1, *low_res.shape[-2:])[:, :1]).float()
+            upsampled = torch.nn.functional.interpolate(logits, size=(height, width), mode="bilinear", align_corners=False)
+            return (upsampled[:, 0] > self.predictor.mask_threshold).numpy()
+
+    def _decode_parts(self, image: IngestedImage, rig_data: Dict[str, Any], settings: Dict[str, Optional[int]]):
+        """
+        Decodes every part box of rig_data against the image's (cached or fresh) embedding.
+        Must be called with self.predictor_lock held.
+        Returns (part_names, masks, low_res_logits, output_size), to be turned into final masks by _masks_at.
+        """
         width, height = image.size
-        
-        parts = rig_data.get("parts", {})
-        for part_name, box in parts.items():
-            # Convert normalized [ymin, xmin, ymax, xmax] to pixel [xmin, ymin, xmax, ymax]
-            # Assuming Gemini follows the prompt instructions.
-            # If Gemini returns 0-1000, divide. If 0-1, multiply.
-            # Let's assume 0-1 for now based on prompt request.
-            
+        output_size = _fit(image.size, settings["output_side"])
+
+        part_names, input_boxes = self._part_boxes(rig_data, width, height)
+        if not part_names:
+            logger.warning("Rig data contains no part boxes to segment.")
+            empty = np.zeros((0, output_size[1], output_size[0]), dtype=bool)
+            return [], empty, None, output_size
+
+        self._set_image(image.hash, image)
+
+        # Decode every part box in a single predictor call instead of one call per part
+        with timed("sam2_decode"):
+            masks, scores, low_res = self.predictor.predict(
+                point_coords=None,
+                point_labels=None,
+                box=input_boxes,
+                multimask_output=False,
+            )
+        return part_names, masks, low_res, output_size
+
+    def _final_masks(self, image: IngestedImage, part_names, masks, low_res, output_size):
+        """
+        Returns (part_names, boolean (N, H, W) masks, RGB array), both at output_size.
+        """
+        if part_names:
+            masks = self._masks_at(masks, low_res, len(part_names), output_size)
+        return part_names, masks, _resized_array(image, output_size)
+
+    def _predict_part_masks(self, image: IngestedImage, rig_data: Dict[str, Any], tier: Optional[str] = None):
+        """
+        Runs SAM 2 on every part box of rig_data at the given quality tier.
+        Returns (part_names, boolean (N, H, W) masks, RGB array), masks and array at the tier's output size.
+        """
+        settings = self._tier(tier)
+        with self.predictor_lock, torch.inference_mode():
+            decoded = self._decode_parts(image, rig_data, settings)
+        return self._final_masks(image, *decoded)
+
+    def _upload_parts(self, part_names: List[str], masks: np.ndarray, rgb: np.ndarray,
+                      parallel: bool = True, compress_level: int = 6) -> Dict[str, str]:
+        """
+        Composites full-canvas part PNGs and uploads them (content-addressed, so unchanged parts are not re-sent).
+        parallel=False uploads from the calling thread (used when already running on the upload pool).
+        """
+        results = {}
+        # Full-canvas transparent PNGs, so the app can stack parts without offsets
+        with self.compositor.composite(rgb, masks, crop=False) as parts:
+            if not parallel:
+                for part_name, part in zip(part_names, parts):
+                    results[part_name] = self._upload_part(part[0], compress_level)
+                return results
+
+            futures = {}
+            for part_name, part in zip(part_names, parts):
+                futures[part_name] = submit(self.upload_executor, self._upload_part, part[0], compress_level)
+
+            # The part images live in the compositor's buffer: every upload must be finished, failed
+            # or not, before the block releases it to the next request
+            wait(futures.values())
+            for part_name, future in futures.items():
+                results[part_name] = future.result()
+                logger.info(f"Uploaded {part_name} to {results[part_name]}")
+
+        return results
+
+    def _upload_atlas(self, part_names: List[str], masks: np.ndarray, rgb: np.ndarray,
+                      rig_data: Dict[str, Any], parallel: bool = True, compress_level: int = 6) -> Dict[str, Any]:
+        with self.compositor.composite(rgb, masks, crop=True) as parts:
+            sprites = {}
+            for part_name, part in zip(part_names, parts):
+                if part is None:
+                    logger.warning(f"Mask for {part_name} is empty, leaving it out of the atlas.")
+                    continue
+                sprites[part_name] = part
+
+            # build_atlas copies the sprites into a new sheet, so the buffer can be released after it
+            sheet, manifest = build_atlas(sprites, rig_data, (rgb.shape[1], rgb.shape[0]))
+
+        # sort_keys keeps the bytes (and so the content address) stable for identical manifests
+        manifest_bytes = json.dumps(manifest, sort_keys=True).encode()
+        if parallel:
+            atlas_future = submit(self.upload_executor, self._upload_part, sheet, compress_level)
+            manifest_future = submit(self.upload_executor, self._upload_bytes, manifest_bytes, "json", "application/json")
+            atlas_url, manifest_url = atlas_future.result(), manifest_future.result()
+        else:
+            atlas_url = self._upload_part(sheet, compress_level)
+            manifest_url = self._upload_bytes(manifest_bytes, "json", "application/json")
+
+        logger.info(f"Uploaded atlas with {len(sprites)} parts to {atlas_url}")
+        return {"atlas_url": atlas_url, "manifest_url": manifest_url, "manifest": manifest}
+
+    def segment_and_upload(self, image: Union[str, IngestedImage], rig_data: Dict[str, Any],
+                           tier: Optional[str] = None) -> Dict[str, str]:
+        """
+        Segments the image (shared IngestedImage or file path) based on rig data (joints/parts)
+        and uploads parts to Firebase. tier is a SEGMENTATION_TIERS name (default SEGMENTATION_TIER).
+        Returns a dictionary of part_name -> url.
+        """
+        self._check_ready()
+        image = as_ingested(image)
+        part_names, masks, rgb = self._predict_part_masks(image, rig_data, tier)
+        return self._upload_parts(part_names, masks, rgb, compress_level=self._tier(tier)["png_compress_level"])
+
+    def segment_to_atlas(self, image: Union[str, IngestedImage], rig_data: Dict[str, Any],
+                         tier: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Atlas variant of segment_and_upload: every part is cropped to its mask bounds and packed
+        into one sprite sheet, uploaded with a JSON manifest (see atlas.build_atlas).
+        Returns {"atlas_url", "manifest_url", "manifest"}.
+        """
+        self._check_ready()
+        image = as_ingested(image)
+        part_names, masks, rgb = self._predict_part_masks(image, rig_data, tier)
+        return self._upload_atlas(part_names, masks, rgb, rig_data,
+                                  compress_level=self._tier(tier)["png_compress_level"])
+
+    def _finish_batch_item(self, image: IngestedImage, rig_data: Dict[str, Any], decoded, layout: str,
+                           compress_level: int) -> Dict[str, Any]:
+        part_names, masks, rgb = self._final_masks(image, *decoded)
+        if layout == "atlas":
+            return {"atlas": self._upload_atlas(part_names, masks, rgb, rig_data, parallel=False,
+                                                compress_level=compress_level)}
+        return {"part_urls": self._upload_parts(part_names, masks, rgb, parallel=False, compress_level=compress_level)}
+
+    def segment_many(self,
+                     items: Iterable[Tuple[Any, Union[str, IngestedImage], Dict[str, Any]]],
+                     tier: Optional[str] = None,
+                     layout: str = "parts",
+                     batch_size: Optional[int] = None) -> Iterator[Tuple[Any, Union[Dict[str, Any], Exception]]]:
+        """
+        Segments many (key, image, rig_data) items. Images are encoded in micro-batches of
+        batch_size (SEGMENTATION_BATCH_SIZE) with one set_image_batch call, part boxes are decoded
+        per image, and compositing + uploads of every image run on the shared upload pool.
+        items may be a blocking iterator (e.g. fed as rig analyses finish).
+        Yields (key, result) in completion order; result is {"part_urls": ...} or {"atlas": ...},
+        or the exception that image failed with.
+        """
+        self._check_ready()
+        settings = self._tier(tier)
+        batch_size = batch_size or BATCH_SIZE
+        items = iter(items)
+        pending = {}
+
+        while True:
+            batch = [(key, as_ingested(image), rig_data) for key, image, rig_data in itertools.islice(items, batch_size)]
+            if not batch:
+                break
+
+            decoded, failed = {}, []
+            with self.predictor_lock, torch.inference_mode():
+                try:
+                    self._encode_batch([image for _, image, _ in batch])
+                except Exception as e:
+                    # Each image falls back to its own encode in _decode_parts
+                    logger.error(f"Batched SAM 2 encode failed: {e}")
+                for key, image, rig_data in batch:
+                    try:
+                        decoded[key] = self._decode_parts(image, rig_data, settings)
+                    except Exception as e:
+                        logger.error(f"Segmentation of batch item {key} failed: {e}")
+                        failed.append((key, e))
+
+            # Yielded only after the predictor lock is released
+            yield from failed
+            for key, image, rig_data in batch:
+                if key in decoded:
+                    future = submit(self.upload_executor, self._finish_batch_item, image, rig_data, decoded[key], layout,
+                                    settings["png_compress_level"])
+                    pending[future] = key
+
+            # Hand back whatever finished while this micro-batch was being encoded
+            for future in [f for f in pending if f.done()]:
+                yield pending.pop(future), future.exception() or future.result()
+
+        for future in as_completed(list(pending)):
+            yield pending.pop(future), future.exception() or future.result()
+
+    def refine_part(self, image_hash: str, part_name: str,
+                    box: Optional[List[float]] = None,
+                    points: Optional[List[List[float]]] = None,
+                    point_labels: Optional[List[int]] = None,
+                    tier: Optional[str] = None) -> str:
+        """
+        Re-segments a single part of a previously segmented image from an edited box
+        ([ymin, xmin, ymax, xmax], normalized) and/or normalized [x, y] points.
+        Only the mask decoder runs; the cached image embedding is reused.
+        Returns the public URL of the new part image.
+        """
+        self._check_ready()
+        if box is None and not points:
+            raise ValueError("A box or at least one point is required.")
+        settings = self._tier(tier)
+
+        with self.predictor_lock, torch.inference_mode():
+            image = self._set_image(image_hash)
+            width, height = image.size
+
+            input_box = None
+            if box is not None:
+                _, boxes = self._part_boxes({"parts": {part_name: box}}, width, height)
+                if len(boxes) == 0:
+                    raise ValueError(f"Malformed box: {box}")
+                input_box = boxes[0][None, :]
+
+            point_coords = None
+            labels = None
+            if points:
+                point_coords = np.array([[x * width, y * height] for x, y in points], dtype=np.float32)
+                labels = np.array(point_labels if point_labels is not None else [1] * len(points), dtype=np.int32)
+                if len(labels) != len(point_coords):
+                    raise ValueError("point_labels must have one label per point.")
+
+            with timed("sam2_decode"):
+                masks, scores, low_res = self.predictor.predict(
+                    point_coords=point_coords,
+                    point_labels=labels,
+                    box=input_box,
+                    multimask_output=False,
+                )
+
+        output_size = _fit(image.size, settings["output_side"])
+        mask = self._masks_at(masks, low_res, 1, output_size)
+        with self.compositor.composite(_resized_array(image, output_size), mask, crop=False) as parts:
+            url = self._upload_part(parts[0][0], settings["png_compress_level"])
+        logger.info(f"Refined {part_name}, uploaded to {url}")
+        return url
+
+    def _upload_part(self, image: Image.Image, compress_level: int = 6) -> str:
+        """
+        PNG-encodes a part in memory and stores it as a public, content-addressed object.
+        """
+        buffer = io.BytesIO()
+        with timed("part_encode"):
+            image.save(buffer, format="PNG", compress_level=compress_level)
+        return self._upload_bytes(buffer.getvalue(), "png", "image/png")
+
+    def _upload_bytes(self, data: bytes, extension: str, content_type: str) -> str:
+        """
+        Stores data at <CONTENT_PREFIX>/<sha256>.<extension> and returns its public URL.
+        Objects already in the bucket are not uploaded again: the local index answers for names
+        this process has seen, otherwise one existence check is made before uploading.
+        """
+        blob_name = f"{CONTENT_PREFIX}/{hashlib.sha256(data).hexdigest()}.{extension}"
+        blob = self.bucket.blob(blob_name)
+        if blob_name in self.blob_index:
+            self._count_upload("skipped", len(data))
+            return blob.public_url
+
+        with timed("part_exists"):
+            exists = blob.exists()
+        if not exists:
+            blob.cache_control = CACHE_CONTROL
+            try:
+                # predefined_acl makes the object public as part of the upload, no separate make_public() call;
+                # if_generation_match=0 turns a concurrent upload of the same content into a no-op
+                with timed("part_upload"):
+                    blob.upload_from_string(data, content_type=content_type, predefined_acl="publicRead",
+                                            if_generation_match=0)
+                self._count_upload("uploaded", len(data))
+            except PreconditionFailed:
+                exists = True
+        if exists:
+            self._count_upload("skipped", len(data))
+        self.blob_index.add(blob_name)
+        return blob.public_url
+
+    def _count_upload(self, outcome: str, nbytes: int):
+        with self._upload_counters_lock:
+            self._upload_counters[outcome] += 1
+            self._upload_counters[f"{outcome}_bytes"] += nbytes
+
+    def upload_stats(self) -> Dict[str, Any]:
+        with self._upload_counters_lock:
+            stats = dict(self._upload_counters)
+        stats.update({f"index_{key}": value for key, value in self.blob_index.stats().items()})
+        return stats
+
+    def _part_boxes(self, rig_data: Dict[str, Any], width: int, height: int, padding: float = 10):
+        """
+        Collects the part boxes (plus the mouth box, if present) as a stacked (N, 4) pixel array.
+        Returns (part_names, boxes).
+        """
+        # rig_data['parts'] contains { "head": [ymin, xmin, ymax, xmax], ... }, normalized 0-1
+        part_boxes = dict(rig_data.get("parts", {}))
+        mouth_box = (rig_data.get("mouth") or {}).get("box")
+        if mouth_box:
+            part_boxes["mouth"] = mouth_box
+
+        part_names = []
+        input_boxes = []
+        for part_name, box in part_boxes.items():
+            if not box or len(box) != 4:
+                logger.warning(f"Skipping part {part_name} with malformed box: {box}")
+                continue
+
             # Gemini returns [ymin, xmin, ymax, xmax]
             ymin, xmin, ymax, xmax = box
-            
+
             # SAM 2 expects [xmin, ymin, xmax, ymax]
-            input_box = np.array([xmin * width, ymin * height, xmax * width, ymax * height])
-            
+            input_box = np.array([xmin * width, ymin * height, xmax * width, ymax * height], dtype=np.float32)
+
             # Add padding to box to ensure coverage
-            padding = 10 
             input_box[0] = max(0, input_box[0] - padding)
             input_box[1] = max(0, input_box[1] - padding)
             input_box[2] = min(width, input_box[2] + padding)
             input_box[3] = min(height, input_box[3] + padding)
 
-            masks, scores, _ = self.predictor.predict(
-                point_coords=None,
-                point_labels=None,
-                box=input_box[None, :],
-                multimask_output=False,
-            )
-            
-            # Take the best mask
-            mask = masks[0] # (H, W) bool
-            
-            # Apply mask to image to get transparent PNG
-            masked_image = self._apply_mask(image, mask)
-            
-            # Save to buffer
-            blob_name = f"characters/{uuid.uuid4()}/{part_name}.png"
-            blob = self.bucket.blob(blob_name)
-            
-            # Save locally temp to upload? Or write to memory.
-            # Use temp file for safety
-            temp_filename = f"temp_{part_name}.png"
-            masked_image.save(temp_filename, format="PNG")
-            
-            blob.upload_from_filename(temp_filename)
-            blob.make_public()
-            results[part_name] = blob.public_url
-            
-            os.remove(temp_filename)
-            logger.info(f"Uploaded {part_name} to {blob.public_url}")
-            
-        # except Exception as e:
-        #     logger.error(f"Segmentation failed: {e}")
-        #     raise e # Re-raise to see it in API response
-        
-        return results
+            part_names.append(part_name)
+            input_boxes.append(input_box)
 
-    def _apply_mask(self, image: Image.Image, mask: np.ndarray) -> Image.Image:
-        # Create RGBA image
-        rgba = image.convert("RGBA")
-        datas = rgba.getdata()
-        
-        newData = []
-        width, height = image.size
-        # This is slow, better use numpy
-        
-        # NumPy approach
-        img_arr = np.array(image.convert("RGBA"))
-        
-        # mask is (H, W) boolean? or 0/1?
-        # Resize mask to image size if needed (SAM usually returns original size)
-        
-        # Ensure mask is boolean
-        mask_bool = mask.astype(bool)
-        
-        # Set alpha channel 0 where mask is False
-        img_arr[:, :, 3] = img_arr[:, :, 3] * mask_bool
-        
-        return Image.fromarray(img_arr)
+        if not input_boxes:
+            return [], np.zeros((0, 4), dtype=np.float32)
+        return part_names, np.stack(input_boxes)
@@ -0,0 +1,162 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Iterator, Optional, Tuple
+
+from fastapi.responses import Response, StreamingResponse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class ArtifactStore:
+    """
+    Bounded local store for generated files (e.g. videos), one directory per job.
+    A background sweep deletes artifacts older than the TTL and, when the store is over
+    its size budget, the least recently written ones first.
+    On Cloud Run the default location (/tmp) is tmpfs, so the budget is also a memory budget.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.root = root or os.environ.get("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "amibuddy-artifacts"))
+        self.max_bytes = max_bytes or int(float(os.environ.get("ARTIFACT_MAX_MB", 512)) * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("ARTIFACT_TTL_SECONDS", 3600))
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._gc_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def path_for(self, key: str, name: str) -> str:
+        """
+        Path where the artifact `name` of `key` should be written. Creates the key's directory.
+        """
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def get(self, key: str, name: str) -> Optional[str]:
+        path = os.path.join(self.root, key, name)
+        return path if os.path.isfile(path) else None
+
+    def _entries(self):
+        entries = []
+        for key in os.listdir(self.root):
+            directory = os.path.join(self.root, key)
+            if not os.path.isdir(directory):
+                continue
+            size = 0
+            newest = os.path.getmtime(directory)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                newest = max(newest, stat.st_mtime)
+            entries.append((newest, size, directory))
+        return entries
+
+    def gc(self):
+        """
+        Removes expired artifacts, then the oldest ones until the store fits its budget.
+        """
+        with self._lock:
+            now = time.time()
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for mtime, size, directory in entries:
+                if now - mtime <= self.ttl_seconds and total <= self.max_bytes:
+                    break
+                shutil.rmtree(directory, ignore_errors=True)
+                total -= size
+                removed += 1
+            if removed:
+                logger.info(f"Artifact GC removed {removed} artifact(s), {total} bytes remain")
+
+    def start_gc(self, interval_seconds: Optional[float] = None):
+        interval = interval_seconds or float(os.environ.get("ARTIFACT_GC_INTERVAL_SECONDS", 300))
+        if self._gc_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.gc()
+                except Exception as e:
+                    logger.warning(f"Artifact GC failed: {e}")
+
+        self._gc_thread = threading.Thread(target=loop, name="artifact-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self):
+        self._stop.set()
+
+
+def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=" range into inclusive (start, end). Returns None if unsatisfiable.
+    Only the first range of a multi-range request is served.
+    """
+    spec = range_header.split("=", 1)[1].split(",")[0].strip()
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                return None
+            return max(0, file_size - length), file_size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size or start > end:
+        return None
+    return start, min(end, file_size - 1)
+
+
+def _iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(path: str, range_header: Optional[str], media_type: str,
+                         filename: Optional[str] = None) -> Response:
+    """
+    Streams a file in chunks, honouring HTTP Range requests with 206 Partial Content
+    so video players can start playback (and seek) before the whole file arrives.
+    """
+    file_size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    start, end = 0, file_size - 1
+    status_code = 200
+    if range_header and range_header.strip().lower().startswith("bytes="):
+        byte_range = _parse_range(range_header, file_size)
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(path, start, end), status_code=status_code,
+                             media_type=media_type, headers=headers)
@@ -0,0 +1,98 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ATLAS_MANIFEST_VERSION = 1
+# Transparent gutter around every sprite so texture filtering never bleeds into a neighbour
+ATLAS_PADDING = 2
+
+# Joint each part rotates around when the rig is animated
+PART_PIVOTS = {
+    "head": "neck",
+    "body": "hips",
+    "left_arm": "left_shoulder",
+    "right_arm": "right_shoulder",
+    "left_leg": "hips",
+    "right_leg": "hips",
+}
+
+
+def pack_shelves(sizes: List[Tuple[int, int]], padding: int = ATLAS_PADDING) -> Tuple[List[Tuple[int, int]], Tuple[int, int]]:
+    """
+    Shelf-packs (width, height) rectangles, tallest first, into a sheet about as wide as it is tall.
+    Returns the (x, y) position of every rectangle (in input order) and the sheet size.
+    """
+    if not sizes:
+        return [], (0, 0)
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    sheet_width = max(max(w for w, _ in sizes) + 2 * padding, int(np.ceil(np.sqrt(area))))
+
+    positions: List[Tuple[int, int]] = [(0, 0)] * len(sizes)
+    x, y, shelf_height = padding, padding, 0
+    for i in sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True):
+        w, h = sizes[i]
+        if x + w + padding > sheet_width:
+            x, y = padding, y + shelf_height + padding
+            shelf_height = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return positions, (sheet_width, y + shelf_height + padding)
+
+
+def _pivot(part_name: str, rig_data: Dict[str, Any], width: int, height: int) -> Optional[Tuple[str, float, float]]:
+    if part_name == "mouth":
+        center = (rig_data.get("mouth") or {}).get("center")
+        return ("mouth", center[0] * width, center[1] * height) if center and len(center) == 2 else None
+    joint = PART_PIVOTS.get(part_name)
+    xy = rig_data.get("joints", {}).get(joint) if joint else None
+    return (joint, xy[0] * width, xy[1] * height) if xy and len(xy) == 2 else None
+
+
+def build_atlas(parts: Dict[str, Tuple[Image.Image, Tuple[int, int]]],
+                rig_data: Dict[str, Any],
+                image_size: Tuple[int, int]) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Packs cropped part sprites into one RGBA sheet.
+    parts maps part name -> (cropped RGBA image, (x, y) offset of the crop in the source image).
+    The manifest lists, per part, its source rect, its rect in the sheet and its pivot joint,
+    both in source pixels and relative to the sprite's top-left corner. Rects are [x, y, w, h].
+    """
+    width, height = image_size
+    names = list(parts)
+    positions, sheet_size = pack_shelves([parts[name][0].size for name in names])
+    sheet = Image.new("RGBA", (max(sheet_size[0], 1), max(sheet_size[1], 1)), (0, 0, 0, 0))
+
+    manifest_parts = {}
+    for name, (x, y) in zip(names, positions):
+        sprite, (offset_x, offset_y) = parts[name]
+        sheet.paste(sprite, (x, y))
+        entry = {
+            "source": [offset_x, offset_y, sprite.width, sprite.height],
+            "rect": [x, y, sprite.width, sprite.height],
+            "pivot": None,
+        }
+        pivot = _pivot(name, rig_data, width, height)
+        if pivot:
+            joint, px, py = pivot
+            entry["pivot"] = {
+                "joint": joint,
+                "source": [round(px, 1), round(py, 1)],
+                "local": [round(px - offset_x, 1), round(py - offset_y, 1)],
+            }
+        manifest_parts[name] = entry
+
+    manifest = {
+        "version": ATLAS_MANIFEST_VERSION,
+        "image_size": [width, height],
+        "atlas_size": list(sheet.size),
+        "parts": manifest_parts,
+    }
+    logger.info(f"Packed {len(names)} parts into a {sheet.size[0]}x{sheet.size[1]} atlas")
+    return sheet, manifest
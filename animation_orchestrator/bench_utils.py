@@ -0,0 +1,34 @@
+"""
+Shared defaults and statistics for the benchmark and load-test scripts. Standard library only, so
+load_test.py can run on a machine without the server's dependencies.
+"""
+import os
+import glob
+import math
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES = sorted(glob.glob(os.path.join(HERE, "..", "public", "drawings", "*"))) + [
+    os.path.join(HERE, "test_character.jpg")]
+DEFAULT_RECORDINGS = os.path.join(HERE, "gemini_reference_responses.json")
+
+
+def percentiles(seconds: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Nearest-rank percentiles, in milliseconds.
+    """
+    if not seconds:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    values = sorted(s * 1000 for s in seconds)
+
+    def rank(q: float) -> float:
+        return round(values[max(0, math.ceil(q * len(values)) - 1)], 1)
+
+    return {
+        "count": len(values),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "mean_ms": round(sum(values) / len(values), 1),
+        "max_ms": round(values[-1], 1),
+    }
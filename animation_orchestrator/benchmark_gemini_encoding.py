@@ -0,0 +1,150 @@
+"""
+Payload size vs rig accuracy for the image encodings sent to Gemini.
+
+    python benchmark_gemini_encoding.py --record     # reference answers from full-size PNG uploads
+    python benchmark_gemini_encoding.py              # every encoding in the grid vs the recordings
+    python benchmark_gemini_encoding.py --offline    # payload sizes and encode times only, no API calls
+
+Drift is measured against the recorded reference: mean joint distance and mean part-box
+coordinate error (both in normalized units) and mean part-box IoU. The "reference" row
+re-runs the reference encoding, so its drift is Gemini's own run-to-run noise.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Dict, List, Optional
+
+from bench_utils import DEFAULT_IMAGES, DEFAULT_RECORDINGS
+from cache import AnalysisCache
+from gemini_image import GeminiImageEncoding
+from ingest import IngestedImage, as_ingested
+
+REFERENCE = GeminiImageEncoding(max_side=0, fmt="PNG")
+GRID = [
+    ("reference", REFERENCE),
+    ("png-1024", GeminiImageEncoding(max_side=1024, fmt="PNG")),
+    ("jpeg-1536-q90", GeminiImageEncoding(max_side=1536, fmt="JPEG", quality=90)),
+    ("jpeg-1024-q85", GeminiImageEncoding(max_side=1024, fmt="JPEG", quality=85)),
+    ("jpeg-768-q80", GeminiImageEncoding(max_side=768, fmt="JPEG", quality=80)),
+    ("jpeg-512-q75", GeminiImageEncoding(max_side=512, fmt="JPEG", quality=75)),
+    ("webp-1024-q80", GeminiImageEncoding(max_side=1024, fmt="WEBP", quality=80)),
+    ("webp-768-q75", GeminiImageEncoding(max_side=768, fmt="WEBP", quality=75)),
+]
+
+
+def _box_iou(a: List[float], b: List[float]) -> float:
+    ymin, xmin = max(a[0], b[0]), max(a[1], b[1])
+    ymax, xmax = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ymax - ymin) * max(0.0, xmax - xmin)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def rig_drift(reference: Dict, candidate: Dict) -> Dict[str, Optional[float]]:
+    joint_errors = [
+        ((candidate["joints"][name][0] - xy[0]) ** 2 + (candidate["joints"][name][1] - xy[1]) ** 2) ** 0.5
+        for name, xy in reference.get("joints", {}).items() if name in candidate.get("joints", {})
+    ]
+    shared_parts = [name for name in reference.get("parts", {}) if name in candidate.get("parts", {})]
+    box_errors = [
+        statistics.mean(abs(c - r) for c, r in zip(candidate["parts"][name], reference["parts"][name]))
+        for name in shared_parts
+    ]
+    ious = [_box_iou(reference["parts"][name], candidate["parts"][name]) for name in shared_parts]
+    return {
+        "joint_error": statistics.mean(joint_errors) if joint_errors else None,
+        "box_error": statistics.mean(box_errors) if box_errors else None,
+        "box_iou": statistics.mean(ious) if ious else None,
+        "missing": (len(reference.get("joints", {})) - len(joint_errors)) + (len(reference.get("parts", {})) - len(shared_parts)),
+    }
+
+
+def _analyze(image: IngestedImage, encoding: GeminiImageEncoding) -> Dict:
+    from agents.character_analysis import CharacterAnalysisAgent
+
+    # Fresh in-memory cache: every run must reach Gemini
+    agent = CharacterAnalysisAgent(cache=AnalysisCache(db_path=":memory:"), encoding=encoding)
+    return agent.analyze_image(image).rig_data()
+
+
+def record(images: List[IngestedImage], recordings_path: str):
+    recordings = {}
+    for image in images:
+        print(f"Recording reference analysis for {image.filename}...")
+        recordings[image.hash] = {"filename": os.path.basename(image.filename), "rig_data": _analyze(image, REFERENCE)}
+    with open(recordings_path, "w") as f:
+        json.dump(recordings, f, indent=2)
+    print(f"Saved {len(recordings)} reference analyses to {recordings_path}")
+
+
+def run(images: List[IngestedImage], recordings_path: str, offline: bool) -> List[Dict]:
+    recordings = {}
+    if not offline:
+        if not os.path.exists(recordings_path):
+            sys.exit(f"No recordings at {recordings_path}; run with --record first (or use --offline).")
+        with open(recordings_path) as f:
+            recordings = json.load(f)
+
+    rows = []
+    for label, encoding in GRID:
+        sizes, encode_ms, drifts = [], [], []
+        for image in images:
+            start = time.perf_counter()
+            data, _ = encoding.encode(image.image)
+            encode_ms.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(data))
+
+            if offline or image.hash not in recordings:
+                continue
+            drifts.append(rig_drift(recordings[image.hash]["rig_data"], _analyze(image, encoding)))
+
+        row = {
+            "encoding": label,
+            "signature": encoding.signature,
+            "mean_payload_bytes": int(statistics.mean(sizes)),
+            "mean_encode_ms": round(statistics.mean(encode_ms), 2),
+        }
+        for metric in ("joint_error", "box_error", "box_iou"):
+            values = [d[metric] for d in drifts if d[metric] is not None]
+            row[metric] = round(statistics.mean(values), 4) if values else None
+        row["missing"] = sum(d["missing"] for d in drifts)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=DEFAULT_IMAGES, help="Drawings to benchmark")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Reference responses JSON")
+    parser.add_argument("--record", action="store_true", help="Record reference responses and exit")
+    parser.add_argument("--offline", action="store_true", help="Only measure payload size and encode time")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    images = [as_ingested(path) for path in args.images if os.path.isfile(path)]
+    if not images:
+        sys.exit("No images found.")
+
+    if args.record:
+        record(images, args.recordings)
+        return
+
+    rows = run(images, args.recordings, args.offline)
+    header = f"{'encoding':<16}{'payload KB':>12}{'encode ms':>11}{'joint err':>11}{'box err':>9}{'box IoU':>9}{'missing':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        cells = [f"{row[m]:.4f}" if row[m] is not None else "-" for m in ("joint_error", "box_error", "box_iou")]
+        print(f"{row['encoding']:<16}{row['mean_payload_bytes'] / 1024:>12.1f}{row['mean_encode_ms']:>11.2f}"
+              f"{cells[0]:>11}{cells[1]:>9}{cells[2]:>9}{row['missing']:>9}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Pipeline benchmark: the real agents and FastAPI app, with Gemini, Veo and Firebase replaced by
+the fakes in fakes.py (recorded rigs, placeholder video, in-memory bucket, simulated latency).
+
+    python benchmark_pipeline.py                                  # public/drawings + test_character.jpg
+    python benchmark_pipeline.py --repeats 5 --json pipeline.json
+    python benchmark_pipeline.py --stages segmentation,asset_prep --concurrency 4
+    python benchmark_pipeline.py --gemini-latency 0 --veo-latency 2 --compare baseline.json
+
+Stages:
+    analysis      CharacterAnalysisAgent.analyze_image (fake Gemini, latency --gemini-latency)
+    segmentation  SegmentationAgent.segment_and_upload / segment_to_atlas (real SAM 2, fake bucket)
+    asset_prep    AssetPrepAgent.process_image (real rembg + upscale)
+    end_to_end    POST /segment-character, then POST /animate polled to completion, in process
+
+Each stage reports p50/p95/p99 latency, throughput and peak RSS, plus the sub-stages recorded
+through metrics.timed (sam2_encode, part_upload, rembg, ...). Every iteration starts with empty
+analysis and embedding caches unless --warm; identical Veo requests still attach to a recent
+operation, as they do in production. end_to_end turns off the server's coalescing of identical
+uploads (singleflight.py) unless --coalesce, since every iteration re-sends the same drawings and
+would otherwise just attach to the first run. Gemini answers come from the recordings of
+benchmark_gemini_encoding.py --record when available, else from a generic rig.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from bench_utils import DEFAULT_IMAGES, DEFAULT_RECORDINGS, percentiles
+from cache import AnalysisCache, EmbeddingCache
+from fakes import FakeLatency, fake_agent_factories, load_rigs
+from ingest import as_ingested
+import metrics
+
+STAGES = ("analysis", "segmentation", "asset_prep", "end_to_end")
+# Job states after which /jobs/{id} stops changing
+FINISHED_JOB_STATES = ("succeeded", "failed")
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # Lifetime peak only (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """
+    Samples this process's resident set size on a background thread while the block runs.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+    def __enter__(self) -> "PeakRSS":
+        self.start_bytes = self.peak_bytes = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "rss_start_mb": round(self.start_bytes / 2 ** 20, 1),
+            "rss_peak_mb": round(self.peak_bytes / 2 ** 20, 1),
+        }
+
+
+def _summary(latencies: List[float], substages: Dict[str, List[float]], errors: int,
+             wall_seconds: float, rss: PeakRSS) -> Dict[str, Any]:
+    return {
+        **percentiles(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+        **rss.to_dict(),
+        "substages": {name: percentiles(values) for name, values in sorted(substages.items())},
+    }
+
+
+def run_stage(fn: Callable[[Any], Any], items: List[Any], repeats: int, concurrency: int,
+              reset: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Calls fn(item) repeats times per item on `concurrency` threads, tracing each call.
+    """
+    def one(item):
+        if reset:
+            reset()
+        with metrics.request_trace(True) as spans:
+            start = time.perf_counter()
+            try:
+                fn(item)
+            except Exception as e:
+                print(f"  error: {e}", file=sys.stderr)
+                return None, spans
+            return time.perf_counter() - start, spans
+
+    latencies, substages, errors = [], {}, 0
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, [item for item in items for _ in range(repeats)]))
+        wall_seconds = time.perf_counter() - start
+
+    for seconds, spans in outcomes:
+        if seconds is None:
+            errors += 1
+            continue
+        latencies.append(seconds)
+        per_call: Dict[str, float] = {}
+        for span in spans:
+            per_call[span["stage"]] = per_call.get(span["stage"], 0.0) + span["duration_ms"] / 1000
+        for name, value in per_call.items():
+            substages.setdefault(name, []).append(value)
+    return _summary(latencies, substages, errors, wall_seconds, rss)
+
+
+def _parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            timings[name] = float(duration) / 1000
+    return timings
+
+
+async def _end_to_end(paths: List[str], repeats: int, concurrency: int, layout: str, tier: Optional[str],
+                      reset: Optional[Callable[[], None]], poll_interval: float) -> Dict[str, Dict[str, Any]]:
+    import httpx
+    from main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"segment_character": ([], {}, [0]), "animate": ([], {}, [0])}
+
+    async def one(client, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        files = {"file": (os.path.basename(path), data, "image/png")}
+        async with semaphore:
+            if reset:
+                reset()
+            latencies, substages, errors = results["segment_character"]
+            start = time.perf_counter()
+            form = {"layout": layout, **({"tier": tier} if tier else {})}
+            response = await client.post("/segment-character", files=files, data=form, headers={"X-Trace": "1"})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+                for name, seconds in _parse_server_timing(response.headers.get("server-timing", "")).items():
+                    substages.setdefault(name, []).append(seconds)
+            else:
+                errors[0] += 1
+                print(f"  /segment-character {response.status_code}: {response.text[:200]}", file=sys.stderr)
+
+            latencies, substages, errors = results["animate"]
+            start = time.perf_counter()
+            response = await client.post("/animate", files=files)
+            if response.status_code != 202:
+                errors[0] += 1
+                print(f"  /animate {response.status_code}: {response.text[:200]}", file=sys.stderr)
+                return
+            job = response.json()
+            while job["status"] not in FINISHED_JOB_STATES:
+                await asyncio.sleep(poll_interval)
+                job = (await client.get(f"/jobs/{job['job_id']}")).json()
+            if job["status"] != "succeeded":
+                errors[0] += 1
+                print(f"  /animate job failed: {job.get('error')}", file=sys.stderr)
+                return
+            latencies.append(time.perf_counter() - start)
+
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            await asyncio.gather(*(one(client, path) for path in paths for _ in range(repeats)))
+        wall_seconds = time.perf_counter() - start
+
+    return {
+        f"end_to_end_{name}": _summary(latencies, substages, errors[0], wall_seconds, rss)
+        for name, (latencies, substages, errors) in results.items()
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    header = f"{'stage':<30}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>8}{'peak MB':>9}{'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for stage, row in report["stages"].items():
+        line = (f"{stage:<30}{row['count']:>5}{str(row['p50_ms']):>10}{str(row['p95_ms']):>10}"
+                f"{str(row['p99_ms']):>10}{str(row['throughput_per_s']):>8}{row['rss_peak_mb']:>9}{row['errors']:>5}")
+        before = (baseline or {}).get("stages", {}).get(stage)
+        if before and before.get("p50_ms") and row["p50_ms"]:
+            line += f"   p50 {100 * (row['p50_ms'] / before['p50_ms'] - 1):+.1f}% vs baseline"
+        print(line)
+        for name, sub in row["substages"].items():
+            print(f"  {name:<28}{sub['count']:>5}{str(sub['p50_ms']):>10}{str(sub['p95_ms']):>10}{str(sub['p99_ms']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=DEFAULT_IMAGES, help="Drawings to benchmark")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Recorded Gemini rigs (benchmark_gemini_encoding.py --record)")
+    parser.add_argument("--checkpoint", default="checkpoints/sam2_hiera_tiny.pt")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--repeats", type=int, default=3, help="Iterations per image and stage")
+    parser.add_argument("--concurrency", type=int, default=1, help="Iterations in flight at once")
+    parser.add_argument("--layout", choices=("parts", "atlas"), default="parts")
+    parser.add_argument("--tier", default=None, help="Segmentation tier (default: SEGMENTATION_TIER)")
+    parser.add_argument("--warm", action="store_true", help="Keep analysis and embedding caches between iterations")
+    parser.add_argument("--coalesce", action="store_true", help="Let end_to_end repeats attach to identical in-flight or recent requests")
+    parser.add_argument("--gemini-latency", type=float, default=2.0, help="Simulated seconds per Gemini call")
+    parser.add_argument("--veo-latency", type=float, default=10.0, help="Simulated seconds per Veo generation")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Simulated seconds per Storage upload")
+    parser.add_argument("--json", dest="json_path", help="Write the machine-readable report to this file")
+    parser.add_argument("--compare", help="Earlier --json report to show p50 deltas against")
+    args = parser.parse_args()
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"Unknown stages {sorted(unknown)}. Use any of {list(STAGES)}.")
+    paths = [path for path in args.images if os.path.isfile(path)]
+    if not paths:
+        sys.exit("No images found.")
+
+    latency = FakeLatency(gemini=args.gemini_latency, veo=args.veo_latency, upload=args.upload_latency)
+    factories = fake_agent_factories(load_rigs(args.recordings, paths), latency, args.checkpoint)
+    images = [as_ingested(path) for path in paths]
+
+    # Built directly (not via the registry) so load and warmup stay out of the timed runs
+    analysis_agent = factories["CharacterAnalysisAgent"]()
+    seg_agent = factories["SegmentationAgent"]() if {"segmentation", "end_to_end"} & set(stages) else None
+    asset_agent = factories["AssetPrepAgent"]() if {"asset_prep", "end_to_end"} & set(stages) else None
+    for agent in (seg_agent, asset_agent):
+        if agent is not None:
+            agent.warmup()
+
+    def reset_caches():
+        if args.warm:
+            return
+        analysis_agent.cache = AnalysisCache(db_path=":memory:")
+        if seg_agent is not None:
+            seg_agent.embedding_cache = EmbeddingCache()
+
+    report_stages: Dict[str, Any] = {}
+    if "analysis" in stages:
+        print("Benchmarking analysis...")
+        report_stages["analysis"] = run_stage(
+            analysis_agent.analyze_image, images, args.repeats, args.concurrency, reset_caches)
+
+    if "segmentation" in stages:
+        print("Benchmarking segmentation...")
+        rigs = {image.hash: analysis_agent.analyze_image(image).rig_data() for image in images}
+        segment = seg_agent.segment_to_atlas if args.layout == "atlas" else seg_agent.segment_and_upload
+        report_stages["segmentation"] = run_stage(
+            lambda image: segment(image, rigs[image.hash], args.tier), images, args.repeats, args.concurrency,
+            reset_caches)
+
+    if "asset_prep" in stages:
+        print("Benchmarking asset prep...")
+        with tempfile.TemporaryDirectory() as tmp:
+            report_stages["asset_prep"] = run_stage(
+                lambda image: asset_agent.process_image(image, os.path.join(tmp, f"{threading.get_ident()}.png")),
+                images, args.repeats, args.concurrency)
+
+    if "end_to_end" in stages:
+        print("Benchmarking end to end...")
+        import main as server
+        from registry import AgentRegistry
+
+        built = {
+            "CharacterAnalysisAgent": analysis_agent,
+            "SegmentationAgent": seg_agent,
+            "AssetPrepAgent": asset_agent,
+        }
+        server.agent_registry = AgentRegistry({
+            name: (lambda agent=built.get(name), factory=factory: agent if agent is not None else factory())
+            for name, factory in factories.items()
+        })
+        server.agent_registry.start()
+        server.segment_flights.enabled = server.animate_flights.enabled = args.coalesce
+        report_stages.update(asyncio.run(_end_to_end(
+            paths, args.repeats, args.concurrency, args.layout, args.tier, reset_caches,
+            poll_interval=min(0.25, max(0.01, args.veo_latency / 20)))))
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "images": [os.path.basename(path) for path in paths],
+            "args": {k: v for k, v in vars(args).items() if k not in ("images", "json_path", "compare")},
+        },
+        "stages": report_stages,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_report(report, baseline)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Latency vs output quality for the segmentation tiers (SEGMENTATION_TIERS in agents/segmentation.py).
+
+    python benchmark_segmentation_tiers.py                 # public/drawings + test_character.jpg
+    python benchmark_segmentation_tiers.py --repeats 5 --json tiers.json
+
+The SAM 2 encoder always runs at its fixed input size, so it costs the same in every tier; runs
+start from an empty embedding cache so it is still included. Latency covers the encoder, the
+batched mask decode, mask upsampling, compositing and PNG encoding of every part at the tier's
+compression level; PNG size is the total over all parts. IoU is measured against the "high" tier
+masks, with lower-resolution masks resized (nearest) to full size. Part boxes come from the
+recordings of benchmark_gemini_encoding.py when available, else from a generic rig.
+No uploads are made; Firebase does not need to be configured.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from bench_utils import DEFAULT_IMAGES, DEFAULT_RECORDINGS
+from cache import EmbeddingCache
+from fakes import GENERIC_RIG
+from ingest import as_ingested
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _to_size(masks: np.ndarray, width: int, height: int) -> np.ndarray:
+    if masks.shape[-2:] == (height, width):
+        return masks
+    return np.stack([
+        np.asarray(Image.fromarray(m).resize((width, height), Image.Resampling.NEAREST)) for m in masks
+    ])
+
+
+def run(agent, images, rigs: Dict[str, Dict], repeats: int) -> List[Dict]:
+    from agents.segmentation import SEGMENTATION_TIERS
+
+    reference = {}
+    for image in images:
+        _, masks, _ = agent._predict_part_masks(image, rigs[image.hash], "high")
+        reference[image.hash] = masks
+
+    rows = []
+    for tier in SEGMENTATION_TIERS:
+        compress_level = SEGMENTATION_TIERS[tier]["png_compress_level"]
+        latencies, ious, png_bytes = [], [], []
+        for image in images:
+            for _ in range(repeats):
+                agent.embedding_cache = EmbeddingCache()
+                start = time.perf_counter()
+                _, masks, rgb = agent._predict_part_masks(image, rigs[image.hash], tier)
+                total = 0
+                with agent.compositor.composite(rgb, masks, crop=False) as parts:
+                    for part in parts:
+                        buffer = io.BytesIO()
+                        part[0].save(buffer, format="PNG", compress_level=compress_level)
+                        total += buffer.tell()
+                latencies.append((time.perf_counter() - start) * 1000)
+                png_bytes.append(total)
+
+            full = reference[image.hash]
+            resized = _to_size(masks, full.shape[2], full.shape[1])
+            ious.extend(_iou(a, b) for a, b in zip(resized, full))
+
+        latencies.sort()
+        rows.append({
+            "tier": tier,
+            **SEGMENTATION_TIERS[tier],
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 1),
+            "mean_png_kb": round(statistics.mean(png_bytes) / 1024, 1),
+            "mean_iou": round(statistics.mean(ious), 4) if ious else None,
+            "min_iou": round(min(ious), 4) if ious else None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=DEFAULT_IMAGES, help="Drawings to benchmark")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Recorded Gemini rigs (benchmark_gemini_encoding.py --record)")
+    parser.add_argument("--checkpoint", default="checkpoints/sam2_hiera_tiny.pt")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    from agents.segmentation import SegmentationAgent
+
+    images = [as_ingested(path) for path in args.images if os.path.isfile(path)]
+    if not images:
+        sys.exit("No images found.")
+
+    recordings = {}
+    if os.path.exists(args.recordings):
+        with open(args.recordings) as f:
+            recordings = json.load(f)
+    rigs = {}
+    for image in images:
+        if image.hash in recordings:
+            rigs[image.hash] = recordings[image.hash]["rig_data"]
+        else:
+            print(f"No recorded rig for {image.filename}; using generic part boxes.")
+            rigs[image.hash] = GENERIC_RIG
+
+    agent = SegmentationAgent(checkpoint_path=args.checkpoint)
+    if not agent.predictor:
+        sys.exit("SAM 2 failed to load; check the checkpoint path.")
+
+    # The "high" reference pass in run() also warms the model up before anything is timed
+    rows = run(agent, images, rigs, args.repeats)
+    header = (f"{'tier':<10}{'output side':>12}{'png level':>10}{'p50 ms':>9}{'p95 ms':>9}{'PNG KB':>9}"
+              f"{'mean IoU':>10}{'min IoU':>9}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['tier']:<10}{str(row['output_side'] or 'full'):>12}{row['png_compress_level']:>10}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['mean_png_kb']:>9}{row['mean_iou']:>10}{row['min_iou']:>9}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
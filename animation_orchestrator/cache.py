@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for JSON-serializable model results (e.g. Gemini rig analysis).
+    Entries live in an in-process LRU and in a SQLite file that survives restarts.
+    The memory tier is bounded by entry count; the disk tier by entry count and total serialized
+    size, and it expires entries after a TTL. Disk errors degrade to cache misses.
+    """
+
+    def __init__(self,
+                 db_path: Optional[str] = None,
+                 max_memory_entries: Optional[int] = None,
+                 max_disk_entries: Optional[int] = None,
+                 max_disk_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.db_path = db_path or os.environ.get(
+            "ANALYSIS_CACHE_DB", os.path.join(tempfile.gettempdir(), "amibuddy-analysis-cache.sqlite3"))
+        self.max_memory_entries = max_memory_entries or int(os.environ.get("ANALYSIS_CACHE_MEMORY_ENTRIES", 256))
+        self.max_disk_entries = max_disk_entries or int(os.environ.get("ANALYSIS_CACHE_DISK_ENTRIES", 10000))
+        self.max_disk_bytes = max_disk_bytes or int(float(os.environ.get("ANALYSIS_CACHE_DISK_MB", 64)) * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to open analysis cache at {self.db_path}, using memory only: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(image_hash: str, model_id: str, prompt_version: str) -> str:
+        return f"{model_id}:{prompt_version}:{image_hash}"
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] <= self.ttl_seconds:
+                        self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self._counters["disk_hits"] += 1
+                        return json.loads(row[0])
+                except sqlite3.Error as e:
+                    # A locked or corrupt cache file must not fail the analysis; treat it as a miss
+                    logger.warning(f"Failed to read analysis cache entry: {e}")
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        serialized = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._remember(key, serialized, now)
+            self._counters["sets"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                        (key, serialized, now, now)
+                    )
+                    self._evict_disk(now)
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning(f"Failed to persist analysis cache entry: {e}")
+
+    def _remember(self, key: str, serialized: str, created_at: float):
+        self._memory[key] = (serialized, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        expired = self._db.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        ).rowcount
+        # Least recently accessed entries beyond the size budget
+        oversized = self._db.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER (ORDER BY accessed_at DESC) AS total FROM entries) "
+            "WHERE total > ?)",
+            (self.max_disk_bytes,)
+        ).rowcount
+        self._counters["evictions"] += max(expired, 0) + max(overflow, 0) + max(oversized, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"], stats["disk_bytes"] = 0, 0
+            if self._db is not None:
+                try:
+                    stats["disk_entries"], stats["disk_bytes"] = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to read analysis cache size: {e}")
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+class EmbeddingCache:
+    """
+    In-process LRU for large objects (e.g. SAM 2 image embeddings) bounded by a memory budget.
+    Callers pass the approximate size of each value in bytes.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(float(os.environ.get("EMBEDDING_CACHE_MB", 512)) * 1024 * 1024)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, nbytes: int):
+        if nbytes > self.max_bytes:
+            logger.warning(f"Embedding of {nbytes} bytes exceeds the cache budget, not caching it.")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self._counters["evictions"] += 1
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._total_bytes
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class BlobIndex:
+    """
+    In-process LRU of object names known to exist in a bucket, so content-addressed uploads
+    can skip the existence check for objects this process has already seen.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.environ.get("BLOB_INDEX_ENTRIES", 100000))
+        self._names: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._names:
+                self._counters["misses"] += 1
+                return False
+            self._names.move_to_end(name)
+            self._counters["hits"] += 1
+            return True
+
+    def add(self, name: str):
+        with self._lock:
+            self._names[name] = None
+            self._names.move_to_end(name)
+            while len(self._names) > self.max_entries:
+                self._names.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._names)
+        return stats
+
+
+_default_cache: Optional[AnalysisCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """
+    Process-wide cache shared by the Gemini-backed agents.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache()
+        return _default_cache
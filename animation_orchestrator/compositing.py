@@ -0,0 +1,136 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from metrics import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Soft mask edges, in pixels (0 = hard edges)
+FEATHER_RADIUS = int(os.environ.get("PART_FEATHER_RADIUS", 0))
+# Scratch buffers kept for reuse; one is in use per concurrent composite() call
+POOLED_BUFFERS = int(os.environ.get("COMPOSITOR_BUFFERS", 4))
+
+
+def mask_bboxes(masks: np.ndarray) -> np.ndarray:
+    """
+    Tight (x0, y0, x1, y1) bounds of every mask in an (N, H, W) stack, exclusive at the end.
+    Empty masks get an all-zero box.
+    """
+    n, height, width = masks.shape
+    rows = masks.any(axis=2)
+    cols = masks.any(axis=1)
+    boxes = np.stack([
+        cols.argmax(axis=1),
+        rows.argmax(axis=1),
+        width - cols[:, ::-1].argmax(axis=1),
+        height - rows[:, ::-1].argmax(axis=1),
+    ], axis=1)
+    boxes[~rows.any(axis=1)] = 0
+    return boxes
+
+
+def _box_blur(stack: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Separable box blur over the last two axes of a float (N, H, W) stack, via cumulative sums.
+    """
+    k = 2 * radius + 1
+    for axis in (1, 2):
+        size = stack.shape[axis]
+        pad = [(0, 0)] * stack.ndim
+        pad[axis] = (radius + 1, radius)
+        summed = np.cumsum(np.pad(stack, pad, mode="edge"), axis=axis)
+        summed = np.moveaxis(summed, axis, 0)
+        stack = np.moveaxis((summed[k:k + size] - summed[:size]) / k, 0, axis)
+    return stack
+
+
+class PartCompositor:
+    """
+    Turns an RGB image and a stacked (N, H, W) mask array into RGBA part images in one pass:
+    the alpha planes of all parts are computed together, bounding boxes are found vectorized,
+    and every part is written into a slice of a single pooled scratch buffer instead of
+    copying a full-size RGBA array per part.
+    """
+
+    def __init__(self, feather_radius: Optional[int] = None, pooled_buffers: Optional[int] = None):
+        self.feather_radius = feather_radius if feather_radius is not None else FEATHER_RADIUS
+        self.pooled_buffers = pooled_buffers or POOLED_BUFFERS
+        self._free: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self, nbytes: int) -> np.ndarray:
+        with self._lock:
+            fitting = [b for b in self._free if b.nbytes >= nbytes]
+            if fitting:
+                buffer = min(fitting, key=lambda b: b.nbytes)
+                self._free.remove(buffer)
+                return buffer
+        return np.empty(nbytes, dtype=np.uint8)
+
+    def _release(self, buffer: np.ndarray):
+        with self._lock:
+            self._free.append(buffer)
+            if len(self._free) > self.pooled_buffers:
+                # Keep the largest buffers; they fit every smaller request too
+                self._free.remove(min(self._free, key=lambda b: b.nbytes))
+
+    def _alpha(self, masks: np.ndarray, out: np.ndarray, feather_radius: int) -> np.ndarray:
+        if feather_radius > 0:
+            np.multiply(_box_blur(masks.astype(np.float32), feather_radius), 255, out=out, casting="unsafe")
+        else:
+            np.multiply(masks, 255, out=out, casting="unsafe")
+        return out
+
+    @contextmanager
+    def composite(self,
+                  rgb: np.ndarray,
+                  masks: np.ndarray,
+                  crop: bool = True,
+                  feather_radius: Optional[int] = None) -> Iterator[List[Optional[Tuple[Image.Image, Tuple[int, int]]]]]:
+        """
+        Yields one (RGBA image, (x, y) offset in the source) per mask, or None for an empty mask.
+        With crop=False every part keeps the full canvas and offset (0, 0).
+        The images share the pooled buffer: use them (encode, paste, upload) inside the with block only.
+        """
+        feather_radius = self.feather_radius if feather_radius is None else feather_radius
+        n, height, width = masks.shape
+        plane = height * width
+
+        if crop:
+            boxes = mask_bboxes(masks)
+            if feather_radius > 0:
+                # Feathering spreads alpha outward; grow the crops to keep the soft edge
+                nonempty = boxes[:, 2] > boxes[:, 0]
+                boxes[nonempty, :2] = np.maximum(boxes[nonempty, :2] - feather_radius, 0)
+                boxes[nonempty, 2] = np.minimum(boxes[nonempty, 2] + feather_radius, width)
+                boxes[nonempty, 3] = np.minimum(boxes[nonempty, 3] + feather_radius, height)
+        else:
+            boxes = np.tile(np.array([0, 0, width, height]), (n, 1))
+        sprite_bytes = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) * 4
+        sprite_offsets = n * plane + np.concatenate([[0], np.cumsum(sprite_bytes)])
+
+        buffer = self._acquire(int(sprite_offsets[-1]))
+        try:
+            with timed("mask_composite"):
+                alpha = self._alpha(masks, buffer[:n * plane].reshape(n, height, width), feather_radius)
+
+                parts = []
+                for i, (x0, y0, x1, y1) in enumerate(boxes.tolist()):
+                    if x1 <= x0 or y1 <= y0:
+                        parts.append(None)
+                        continue
+                    sprite = buffer[sprite_offsets[i]:sprite_offsets[i + 1]].reshape(y1 - y0, x1 - x0, 4)
+                    sprite[:, :, :3] = rgb[y0:y1, x0:x1]
+                    sprite[:, :, 3] = alpha[i, y0:y1, x0:x1]
+                    parts.append((Image.fromarray(sprite), (x0, y0)))
+            yield parts
+        finally:
+            self._release(buffer)
@@ -0,0 +1,268 @@
+"""
+Offline stand-ins for the Gemini/Veo client and the Firebase bucket, for benchmarks and load tests.
+The real agents run unchanged with these swapped in: Gemini answers come from recorded rig JSON,
+Veo returns the placeholder clip, uploads are kept in memory, and every call sleeps for a
+configurable latency.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rough boxes for a standing character, served when no recorded rig matches an image
+GENERIC_RIG = {
+    "joints": {
+        "neck": [0.5, 0.33],
+        "left_shoulder": [0.38, 0.38],
+        "right_shoulder": [0.62, 0.38],
+        "left_elbow": [0.3, 0.5],
+        "right_elbow": [0.7, 0.5],
+        "left_hand": [0.25, 0.62],
+        "right_hand": [0.75, 0.62],
+        "hips": [0.5, 0.68],
+    },
+    "parts": {
+        "head": [0.0, 0.25, 0.35, 0.75],
+        "body": [0.3, 0.25, 0.7, 0.75],
+        "left_arm": [0.3, 0.0, 0.65, 0.35],
+        "right_arm": [0.3, 0.65, 0.65, 1.0],
+        "left_leg": [0.65, 0.2, 1.0, 0.5],
+        "right_leg": [0.65, 0.5, 1.0, 0.8],
+    },
+    "mouth": {"center": [0.5, 0.25], "box": [0.2, 0.42, 0.3, 0.58]},
+}
+
+
+class FakeLatency:
+    """
+    Simulated service latencies, in seconds.
+    """
+
+    def __init__(self, gemini: float = 2.0, veo: float = 10.0, upload: float = 0.05):
+        self.gemini = gemini
+        self.veo = veo
+        self.upload = upload
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Video:
+    def __init__(self, video_bytes: bytes):
+        self.video_bytes = video_bytes
+        self.uri = None
+
+
+class _GeneratedVideo:
+    def __init__(self, video_bytes: bytes):
+        self.video = _Video(video_bytes)
+
+
+class _VideoResult:
+    def __init__(self, video_bytes: bytes):
+        self.generated_videos = [_GeneratedVideo(video_bytes)]
+
+
+class FakeOperation:
+    def __init__(self, name: str, done: bool = False, result: Optional[_VideoResult] = None):
+        self.name = name
+        self.done = done
+        self.error = None
+        self.result = result
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenaiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents, config=None) -> _Response:
+        time.sleep(self._client.latency.gemini)
+        rig = GENERIC_RIG
+        for item in contents:
+            data = getattr(getattr(item, "inline_data", None), "data", None)
+            if data is not None:
+                rig = self._client.rigs.get(hashlib.sha256(data).hexdigest(), GENERIC_RIG)
+        answer = {
+            "character_name": "Benchmark Buddy",
+            "description": "A hand-drawn character",
+            "keypoints": [],
+            **rig,
+        }
+        return _Response(json.dumps(answer))
+
+    def generate_videos(self, model: str, source=None, config=None, **kwargs) -> FakeOperation:
+        name = f"operations/fake-{uuid.uuid4()}"
+        with self._client.lock:
+            self._client.submitted[name] = time.time()
+        return FakeOperation(name)
+
+
+class _FakeOperations:
+    def __init__(self, client: "FakeGenaiClient"):
+        self._client = client
+
+    async def get(self, operation) -> FakeOperation:
+        await asyncio.sleep(0.01)
+        with self._client.lock:
+            submitted = self._client.submitted.get(operation.name, 0.0)
+        if time.time() - submitted < self._client.latency.veo:
+            return FakeOperation(operation.name)
+        return FakeOperation(operation.name, done=True, result=_VideoResult(self._client.video_bytes()))
+
+
+class _FakeAio:
+    def __init__(self, client: "FakeGenaiClient"):
+        self.operations = _FakeOperations(client)
+
+
+class FakeGenaiClient:
+    """
+    Covers the google-genai surface the agents use: models.generate_content,
+    models.generate_videos and aio.operations.get.
+    rigs maps sha256(encoded image bytes sent to Gemini) -> rig_data.
+    """
+
+    def __init__(self, rigs: Optional[Dict[str, Dict[str, Any]]] = None, latency: Optional[FakeLatency] = None):
+        self.rigs = rigs or {}
+        self.latency = latency or FakeLatency()
+        self.submitted: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+        self._video: Optional[bytes] = None
+
+    def video_bytes(self) -> bytes:
+        if self._video is None:
+            from placeholder import get_placeholder_videos
+            self._video = get_placeholder_videos().get("16:9")
+        return self._video
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.cache_control = None
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.example.invalid/{self.bucket.name}/{self.name}"
+
+    def exists(self) -> bool:
+        time.sleep(self.bucket.latency.upload / 2)
+        with self.bucket.lock:
+            return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, content_type: str = None, predefined_acl: str = None,
+                           if_generation_match: Optional[int] = None, **kwargs):
+        from google.api_core.exceptions import PreconditionFailed
+
+        time.sleep(self.bucket.latency.upload)
+        with self.bucket.lock:
+            if if_generation_match == 0 and self.name in self.bucket.objects:
+                raise PreconditionFailed(f"{self.name} already exists")
+            self.bucket.objects[self.name] = len(data)
+            self.bucket.uploaded_bytes += len(data)
+
+
+class FakeBucket:
+    """
+    In-memory Firebase Storage bucket: records object sizes, never stores content.
+    """
+
+    def __init__(self, latency: Optional[FakeLatency] = None, name: str = "fake-bucket"):
+        self.name = name
+        self.latency = latency or FakeLatency()
+        self.objects: Dict[str, int] = {}
+        self.uploaded_bytes = 0
+        self.lock = threading.Lock()
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+def load_rigs(recordings_path: str, images: List[str], encoding=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Recorded rigs (benchmark_gemini_encoding.py --record) for the given image paths, keyed the way
+    FakeGenaiClient looks them up: by the hash of the bytes the Gemini agents send for each image.
+    """
+    from gemini_image import get_gemini_encoding
+    from ingest import as_ingested
+
+    if not os.path.exists(recordings_path):
+        logger.warning(f"No recordings at {recordings_path}; every image gets the generic rig.")
+        return {}
+    with open(recordings_path) as f:
+        recordings = json.load(f)
+
+    encoding = encoding or get_gemini_encoding()
+    rigs = {}
+    for path in images:
+        image = as_ingested(path)
+        if image.hash in recordings:
+            data, _ = encoding.encode(image.image)
+            rigs[hashlib.sha256(data).hexdigest()] = recordings[image.hash]["rig_data"]
+        else:
+            logger.info(f"No recorded rig for {image.filename}; the fake client answers with the generic rig.")
+    return rigs
+
+
+def fake_agent_factories(rigs: Optional[Dict[str, Dict[str, Any]]] = None,
+                         latency: Optional[FakeLatency] = None,
+                         checkpoint_path: str = "checkpoints/sam2_hiera_tiny.pt") -> Dict[str, Callable[[], Any]]:
+    """
+    AgentRegistry factories building the real agents wired to the fakes. SAM 2 and rembg run for real.
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    # AnimationAgent's constructor starts a poller that resumes operations from VEO_STATE_PATH;
+    # point it at an empty private file first so real operation names are never loaded or rewritten
+    os.environ["VEO_STATE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="amibuddy-fake-veo-"), "operations.json")
+    latency = latency or FakeLatency()
+    client = FakeGenaiClient(rigs, latency)
+    bucket = FakeBucket(latency)
+
+    def analysis_agent():
+        from agents.character_analysis import CharacterAnalysisAgent
+        from cache import AnalysisCache
+        # Private in-memory cache so recorded answers never leak into the real analysis cache
+        agent = CharacterAnalysisAgent(cache=AnalysisCache(db_path=":memory:"))
+        agent.client = client
+        return agent
+
+    def asset_agent():
+        from agents.asset_prep import AssetPrepAgent
+        return AssetPrepAgent()
+
+    def animation_agent():
+        from agents.animation import AnimationAgent
+        agent = AnimationAgent()
+        agent.client = client
+        agent.poller.client = client
+        agent.poller.expected_seconds = latency.veo
+        return agent
+
+    def segmentation_agent():
+        from agents.segmentation import SegmentationAgent
+        agent = SegmentationAgent(checkpoint_path=checkpoint_path)
+        agent.bucket = bucket
+        agent.init_error = None
+        return agent
+
+    return {
+        "CharacterAnalysisAgent": analysis_agent,
+        "AssetPrepAgent": asset_agent,
+        "AnimationAgent": animation_agent,
+        "SegmentationAgent": segmentation_agent,
+    }
@@ -0,0 +1,124 @@
+import os
+import logging
+import threading
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+import google.auth
+import google.auth.transport.requests
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+READ_SCOPE = "https://www.googleapis.com/auth/devstorage.read_only"
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_gcs_uri(uri: str) -> Tuple[str, str]:
+    # uri format: gs://bucket/path
+    if not uri.startswith("gs://") or "/" not in uri[5:]:
+        raise ValueError(f"Invalid GCS URI: {uri}")
+    bucket_name, object_name = uri[5:].split("/", 1)
+    return bucket_name, object_name
+
+
+class StorageFetcher:
+    """
+    Reusable downloader for gs:// objects over the JSON API.
+    Credentials are cached and only refreshed when close to expiry, HTTP connections are
+    pooled, and bodies are streamed in chunks; a dropped connection resumes with a Range request.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, max_retries: int = 3):
+        pool_size = pool_size or int(os.environ.get("GCS_POOL_SIZE", 8))
+        self.max_retries = max_retries
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        self._credentials = None
+        self._auth_request = google.auth.transport.requests.Request(session=self._session)
+        self._lock = threading.Lock()
+
+    def _token(self) -> str:
+        with self._lock:
+            if self._credentials is None:
+                self._credentials, _ = google.auth.default(scopes=[READ_SCOPE])
+            # `valid` is False once the token is within google-auth's refresh threshold of expiry
+            if not self._credentials.valid:
+                self._credentials.refresh(self._auth_request)
+            return self._credentials.token
+
+    @staticmethod
+    def media_url(uri: str) -> str:
+        bucket_name, object_name = parse_gcs_uri(uri)
+        return f"https://storage.googleapis.com/storage/v1/b/{bucket_name}/o/{quote(object_name, safe='')}?alt=media"
+
+    def iter_chunks(self, uri: str, start: int = 0, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yields the object's bytes from offset `start`, resuming after connection errors.
+        Suitable for writing to a file or feeding a StreamingResponse.
+        """
+        url = self.media_url(uri)
+        offset = start
+        attempts = 0
+        while True:
+            headers = {"Authorization": f"Bearer {self._token()}"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                with self._session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    if response.status_code == 416:
+                        # Already have everything
+                        return
+                    if response.status_code not in (200, 206):
+                        raise RuntimeError(f"GCS download failed: {response.status_code} {response.text[:200]}")
+                    if offset and response.status_code == 200:
+                        # Server ignored the Range header; skip what we already yielded
+                        skip = offset
+                    else:
+                        skip = 0
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if skip:
+                            dropped = min(skip, len(chunk))
+                            chunk = chunk[dropped:]
+                            skip -= dropped
+                        if chunk:
+                            offset += len(chunk)
+                            yield chunk
+                return
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                attempts += 1
+                if attempts > self.max_retries:
+                    raise
+                logger.warning(f"GCS download of {uri} interrupted at {offset} bytes ({e}); resuming")
+
+    def download_to_file(self, uri: str, output_path: str) -> int:
+        """
+        Streams the object to output_path without buffering it in memory. Returns the byte count.
+        """
+        written = 0
+        try:
+            with open(output_path, "wb") as f:
+                for chunk in self.iter_chunks(uri):
+                    f.write(chunk)
+                    written += len(chunk)
+        except Exception:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        logger.info(f"Downloaded {written} bytes from {uri} to {output_path}")
+        return written
+
+
+_default_fetcher: Optional[StorageFetcher] = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_storage_fetcher() -> StorageFetcher:
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = StorageFetcher()
+        return _default_fetcher
@@ -0,0 +1,65 @@
+import io
+import os
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+from google.genai import types
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+class GeminiImageEncoding:
+    """
+    How images are downscaled and compressed before they are sent to Gemini.
+    Normalized coordinates do not need full resolution, so a ~1024 px JPEG keeps rigs
+    accurate at a fraction of the upload size (see benchmark_gemini_encoding.py).
+    max_side=0 sends the image at its decoded size.
+    """
+
+    def __init__(self, max_side: Optional[int] = None, fmt: Optional[str] = None, quality: Optional[int] = None):
+        self.max_side = max_side if max_side is not None else int(os.environ.get("GEMINI_IMAGE_MAX_SIDE", 1024))
+        self.format = (fmt or os.environ.get("GEMINI_IMAGE_FORMAT", "JPEG")).upper()
+        self.quality = quality or int(os.environ.get("GEMINI_IMAGE_QUALITY", 85))
+        if self.format not in MIME_TYPES:
+            raise ValueError(f"Unsupported Gemini image format {self.format}. Use one of {list(MIME_TYPES)}.")
+
+    @property
+    def signature(self) -> str:
+        """
+        Identifies the encoding in cache keys: results obtained with one encoding are not reused for another.
+        """
+        return f"{self.max_side}-{self.format}-{self.quality}"
+
+    def encode(self, image: Image.Image) -> Tuple[bytes, str]:
+        if self.max_side and max(image.size) > self.max_side:
+            image = image.copy()
+            image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        if self.format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        if self.format == "PNG":
+            image.save(buffer, format="PNG", optimize=True)
+        else:
+            image.save(buffer, format=self.format, quality=self.quality)
+        return buffer.getvalue(), MIME_TYPES[self.format]
+
+    def part(self, image: Image.Image) -> types.Part:
+        data, mime_type = self.encode(image)
+        logger.info(f"Gemini image payload: {len(data)} bytes ({self.signature})")
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+_default_encoding: Optional[GeminiImageEncoding] = None
+
+
+def get_gemini_encoding() -> GeminiImageEncoding:
+    global _default_encoding
+    if _default_encoding is None:
+        _default_encoding = GeminiImageEncoding()
+    return _default_encoding
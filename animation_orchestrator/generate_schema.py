@@ -1,4 +1,4 @@
-from agents.visual_decomposition import CharacterRig
+from agents.character_analysis import CharacterRig
 import json
 
 with open("character_rig_schema.json", "w") as f:
@@ -0,0 +1,114 @@
+import io
+import os
+import hashlib
+import logging
+from typing import Optional, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_SIDE = int(os.environ.get("INGEST_MAX_SIDE", 2048))
+MAX_BYTES = int(os.environ.get("INGEST_MAX_BYTES", 25 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class IngestedImage:
+    """
+    An uploaded image decoded exactly once and shared by every pipeline stage.
+    Holds the original encoded bytes, their SHA-256 and the decoded RGB image
+    (EXIF orientation applied, transparency flattened onto white, longest side capped). Array views are built on first use.
+    """
+
+    def __init__(self, data: bytes, image: Image.Image, sha256: str, filename: Optional[str] = None):
+        self.data = data
+        self.image = image
+        self.hash = sha256
+        self.filename = filename
+        self._array: Optional[np.ndarray] = None
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        HxWx3 uint8 RGB array (read-only, shared).
+        """
+        if self._array is None:
+            array = np.asarray(self.image)
+            array.flags.writeable = False
+            self._array = array
+        return self._array
+
+
+def decode_image(data: bytes, max_side: int = MAX_SIDE) -> Image.Image:
+    """
+    Decodes to RGB with EXIF orientation applied and the longest side capped at max_side.
+    Transparent areas (alpha channel or palette/colour-key transparency) become white.
+    Large JPEGs are decoded at reduced scale (draft mode) instead of full size then shrunk.
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.format == "JPEG" and max(img.size) > max_side:
+        # Lets libjpeg skip DCT work; keeps the result >= max_side so the resize below stays high quality
+        img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+
+    if "A" in img.getbands() or "transparency" in img.info:
+        # A plain convert("RGB") would turn the transparent background black; drawings sit on white paper
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return img
+
+
+def ingest_bytes(data: bytes, filename: Optional[str] = None, max_side: int = MAX_SIDE) -> IngestedImage:
+    return IngestedImage(data, decode_image(data, max_side), hashlib.sha256(data).hexdigest(), filename)
+
+
+async def ingest_upload(file, max_side: int = MAX_SIDE, max_bytes: int = MAX_BYTES) -> IngestedImage:
+    """
+    Streams a FastAPI UploadFile into memory, hashing it as it arrives, then decodes it once.
+    Raises UploadTooLarge past max_bytes.
+    """
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes.")
+        hasher.update(chunk)
+
+    data = bytes(buffer)
+    image = await run_in_threadpool(decode_image, data, max_side)
+    logger.info(f"Ingested {file.filename}: {len(data)} bytes, decoded to {image.size[0]}x{image.size[1]}")
+    return IngestedImage(data, image, hasher.hexdigest(), file.filename)
+
+
+def as_ingested(source: Union[str, IngestedImage]) -> IngestedImage:
+    """
+    Lets agents accept either a shared IngestedImage or a file path (CLI / orchestrator.py).
+    """
+    if isinstance(source, IngestedImage):
+        return source
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Image not found: {source}")
+    with open(source, "rb") as f:
+        return ingest_bytes(f.read(), filename=os.path.basename(source))
@@ -0,0 +1,221 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import observe
+from scheduler import Overloaded
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class Job:
+    """
+    State of one long-running pipeline run (e.g. an /animate request).
+    Workers report progress through set_stage(); readers take snapshots with to_dict().
+    """
+
+    def __init__(self, kind: str, work_root: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.work_dir = os.path.join(work_root, self.id)
+        self.status = JOB_QUEUED
+        self.stage = JOB_QUEUED
+        self.progress = 0.0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        # Bumped on every change so watchers can tell when to emit an update
+        self.version = 0
+        # Resolves to the result (or fails with the error) once the job finishes
+        self.done: Future = Future()
+        self._lock = threading.Lock()
+
+    def _touch(self):
+        self.updated_at = time.time()
+        self.version += 1
+
+    def set_stage(self, stage: str, progress: Optional[float] = None):
+        with self._lock:
+            self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            self._touch()
+        logger.info(f"Job {self.id}: stage={stage} progress={self.progress:.2f}")
+
+    def _start(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self._touch()
+
+    def _succeed(self, result: Optional[Dict[str, Any]]):
+        with self._lock:
+            self.status = JOB_SUCCEEDED
+            self.stage = "done"
+            self.progress = 1.0
+            self.result = result
+            self.finished_at = time.time()
+            self._touch()
+        self.done.set_result(result)
+
+    def _fail(self, error: str):
+        with self._lock:
+            self.status = JOB_FAILED
+            self.error = error
+            self.finished_at = time.time()
+            self._touch()
+        self.done.set_exception(RuntimeError(error))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class Deferred:
+    """
+    Returned by a job function that is waiting on external work (e.g. a Veo operation).
+    The worker thread is released; continuation(future) runs on the pool once the future
+    completes and its return value becomes the job result (or another Deferred).
+    """
+
+    def __init__(self, future: Future, continuation: Callable[[Future], Any]):
+        self.future = future
+        self.continuation = continuation
+
+
+class JobManager:
+    """
+    Runs pipeline functions on a bounded pool of worker threads and keeps their state
+    around for a while after they finish so clients can poll for the result.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 work_root: Optional[str] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or int(os.environ.get("JOB_WORKERS", 4))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("JOB_QUEUE_SIZE", 16))
+        self.retry_after = int(os.environ.get("JOB_RETRY_AFTER_SECONDS", 30))
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("JOB_TTL_SECONDS", 3600))
+        self.work_root = work_root or os.environ.get(
+            "JOB_WORK_DIR", os.path.join(tempfile.gettempdir(), "amibuddy-jobs"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str) -> Job:
+        """
+        Registers a new job and gives it a private working directory.
+        Raises Overloaded when running + queued jobs already fill the workers and the queue.
+        """
+        self.prune()
+        if self.active_count() >= self.max_workers + self.max_queue:
+            raise Overloaded(kind, self.retry_after)
+        job = Job(kind, self.work_root)
+        os.makedirs(job.work_dir, exist_ok=True)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def start(self, job: Job, fn: Callable[..., Optional[Dict[str, Any]]], *args, **kwargs) -> Job:
+        """
+        Schedules fn(job, *args, **kwargs) on the worker pool. Its return value becomes the job result;
+        returning a Deferred frees the worker until the awaited future completes.
+        """
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def submit(self, kind: str, fn: Callable[..., Optional[Dict[str, Any]]], *args, **kwargs) -> Job:
+        return self.start(self.create(kind), fn, *args, **kwargs)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job._start()
+        observe("job_queue", time.time() - job.created_at)
+        self._step(job, fn, job, *args, **kwargs)
+
+    def _step(self, job: Job, fn, *args, **kwargs):
+        try:
+            result = fn(*args, **kwargs)
+            if isinstance(result, Deferred):
+                result.future.add_done_callback(
+                    lambda future: self._executor.submit(self._step, job, result.continuation, future)
+                )
+                return
+            job._succeed(result)
+            logger.info(f"Job {job.id} finished in {job.finished_at - job.created_at:.1f}s")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job._fail(str(e))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def prune(self):
+        """
+        Forgets finished jobs older than the TTL and removes their working directories.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished and now - job.finished_at > self.ttl_seconds
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+
+        for job in expired:
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+            logger.info(f"Expired job {job.id}")
+
+    async def watch(self, job_id: str, poll_interval: float = 0.5):
+        """
+        Async generator yielding a snapshot every time the job changes, ending once it has finished.
+        """
+        last_version = -1
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job.version != last_version:
+                last_version = job.version
+                yield job.to_dict()
+                if job.finished:
+                    return
+            await asyncio.sleep(poll_interval)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
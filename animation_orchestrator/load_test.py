@@ -0,0 +1,285 @@
+"""
+Load generator for /segment-character and /animate, against a local server (serve_fake.py for
+faked Gemini/Veo/Storage, or main.py) or a deployed Cloud Run URL.
+
+    python load_test.py http://localhost:8080 --concurrency 4 --duration 60
+    python load_test.py https://<service>.run.app --rate 0.5 --requests 100 --mix 0.8 --json load.json
+    python load_test.py http://localhost:8080 --unique --concurrency 8 --requests 64
+
+Closed loop (--concurrency N): N workers, each sending its next request when the last one finishes.
+Open loop (--rate R): R requests per second (Poisson arrivals unless --constant), however slow the
+server gets, which is what exposes queueing and 503 backpressure.
+
+The corpus is public/drawings + test_character.jpg unless images are given. Requests are "cold"
+the first time an endpoint sees an image in this run (Gemini, embedding and Veo caches miss) and
+"warm" afterwards; --unique appends a counter to every upload so all requests are cold.
+
+The server coalesces identical uploads (same bytes and options) that are in flight or finished
+within SINGLEFLIGHT_WINDOW_SECONDS, so without --unique a warm request may only measure attaching
+to an earlier one. Use --unique, or run the server with SINGLEFLIGHT_ENABLED=0 (serve_fake.py
+--no-coalesce), to put every request through the pipeline.
+
+/ready is probed before the run and the first request is reported on its own, so an instance cold
+start (service scaled to zero) shows up separately. /animate latency is submission to finished job;
+with --no-wait only the 202 is timed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from bench_utils import DEFAULT_IMAGES, percentiles
+
+ENDPOINTS = ("segment", "animate")
+# Responses that mean "slow down" rather than "broken"
+BACKPRESSURE_STATUSES = (429, 503)
+FINISHED_JOB_STATES = ("succeeded", "failed")
+MIME_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+
+class LoadTest:
+    def __init__(self, base_url: str, corpus: List[Tuple[str, bytes]], mix: float, unique: bool = False,
+                 wait_for_jobs: bool = True, timeout: float = 300.0, poll_interval: float = 2.0,
+                 layout: str = "parts", tier: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.corpus = corpus
+        self.mix = mix
+        self.unique = unique
+        self.wait_for_jobs = wait_for_jobs
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.form = {"layout": layout, **({"tier": tier} if tier else {})}
+        self.records: List[Dict[str, Any]] = []
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _payload(self, seq: int) -> Tuple[str, bytes]:
+        name, data = self.corpus[seq % len(self.corpus)]
+        if self.unique:
+            # Trailing bytes after the image end marker are ignored by decoders but change the content hash
+            data = data + f"load-test-{os.getpid()}-{seq}".encode()
+        return name, data
+
+    def one(self, seq: int) -> Dict[str, Any]:
+        endpoint = "segment" if random.random() < self.mix else "animate"
+        name, data = self._payload(seq)
+        key = (endpoint, hashlib.sha256(data).hexdigest())
+        with self._lock:
+            cache = "warm" if key in self._seen else "cold"
+            self._seen.add(key)
+
+        files = {"file": (name, data, MIME_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream"))}
+        record = {"seq": seq, "endpoint": endpoint, "image": name, "cache": cache, "status": None,
+                  "latency_s": None, "accept_s": None, "retry_after": None, "error": None}
+        start = time.perf_counter()
+        record["started_s"] = time.time()
+        try:
+            if endpoint == "segment":
+                response = self._session().post(
+                    f"{self.base_url}/segment-character", files=files, data=self.form, timeout=self.timeout)
+                record["status"] = response.status_code
+            else:
+                response = self._session().post(f"{self.base_url}/animate", files=files, timeout=self.timeout)
+                record["status"] = response.status_code
+                record["accept_s"] = time.perf_counter() - start
+                if response.status_code == 202 and self.wait_for_jobs:
+                    record["status"], record["error"] = self._wait_for_job(response.json()["job_id"], start)
+            record["retry_after"] = response.headers.get("Retry-After")
+            if record["status"] not in (200, 202) and record["error"] is None:
+                record["error"] = response.text[:200]
+            elif record["error"] is None:
+                record["latency_s"] = time.perf_counter() - start
+        except Exception as e:
+            # Connection errors, but also malformed responses: a worker must never die silently
+            record["error"] = f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def _wait_for_job(self, job_id: str, start: float) -> Tuple[int, Optional[str]]:
+        while time.perf_counter() - start < self.timeout:
+            time.sleep(self.poll_interval)
+            response = self._session().get(f"{self.base_url}/jobs/{job_id}", timeout=30)
+            if response.status_code != 200:
+                return response.status_code, response.text[:200]
+            job = response.json()
+            if job["status"] in FINISHED_JOB_STATES:
+                return (200, None) if job["status"] == "succeeded" else (500, job.get("error") or "job failed")
+        return 504, f"job {job_id} still running after {self.timeout:.0f}s"
+
+    def run_closed(self, concurrency: int, total: Optional[int], duration: Optional[float]):
+        counter = iter(range(total if total is not None else sys.maxsize))
+        counter_lock = threading.Lock()
+        deadline = time.time() + duration if duration else None
+
+        def worker():
+            while deadline is None or time.time() < deadline:
+                with counter_lock:
+                    seq = next(counter, None)
+                if seq is None:
+                    return
+                self.one(seq)
+
+        threads = [threading.Thread(target=worker, name=f"load-{i}", daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open(self, rate: float, total: Optional[int], duration: Optional[float], poisson: bool = True,
+                 max_in_flight: int = 256):
+        deadline = time.time() + duration if duration else None
+        with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="load") as pool:
+            seq, next_at = 0, time.perf_counter()
+            while (total is None or seq < total) and (deadline is None or time.time() < deadline):
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.one, seq)
+                seq += 1
+                next_at += random.expovariate(rate) if poisson else 1.0 / rate
+
+
+def _probe(base_url: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        response = requests.get(f"{base_url.rstrip('/')}/ready", timeout=300)
+        body = response.json() if response.headers.get("content-type", "").startswith("application/json") else None
+        return {"status": response.status_code, "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                "ready": (body or {}).get("ready")}
+    except requests.RequestException as e:
+        return {"status": None, "error": str(e)}
+
+
+def summarize(records: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    summary = {}
+    for endpoint in ENDPOINTS:
+        rows = [r for r in records if r["endpoint"] == endpoint]
+        if not rows:
+            continue
+        ok = [r for r in rows if r["latency_s"] is not None]
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            status = str(r["status"]) if r["status"] is not None else "connection_error"
+            statuses[status] = statuses.get(status, 0) + 1
+        summary[endpoint] = {
+            "requests": len(rows),
+            "ok": len(ok),
+            "error_rate": round(1 - len(ok) / len(rows), 4),
+            "backpressure": sum(1 for r in rows if r["status"] in BACKPRESSURE_STATUSES),
+            "statuses": statuses,
+            "throughput_per_s": round(len(ok) / wall_seconds, 3) if wall_seconds else None,
+            "latency": percentiles([r["latency_s"] for r in ok]),
+            "cold": percentiles([r["latency_s"] for r in ok if r["cache"] == "cold"]),
+            "warm": percentiles([r["latency_s"] for r in ok if r["cache"] == "warm"]),
+        }
+        if endpoint == "animate":
+            summary[endpoint]["accept"] = percentiles([r["accept_s"] for r in rows if r["accept_s"] is not None])
+    return summary
+
+
+def _print_summary(report: Dict[str, Any]):
+    probe = report["probe"]
+    print(f"/ready before run: status {probe.get('status')}, ready={probe.get('ready')}, {probe.get('latency_ms')} ms")
+    first = report["first_request"]
+    if first:
+        latency = f"{first['latency_s'] * 1000:.0f} ms" if first["latency_s"] is not None else first["error"]
+        print(f"First request ({first['endpoint']}, status {first['status']}): {latency}")
+
+    header = f"{'endpoint':<10}{'group':<8}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    for endpoint, row in report["endpoints"].items():
+        print(f"\n{endpoint}: {row['requests']} requests, {row['ok']} ok, error rate {row['error_rate']:.1%}, "
+              f"{row['backpressure']} backpressure (429/503), {row['throughput_per_s']} ok/s, statuses {row['statuses']}")
+        print(header)
+        groups = ["latency", "cold", "warm"] + (["accept"] if endpoint == "animate" else [])
+        for group in groups:
+            stats = row[group]
+            print(f"{endpoint:<10}{group:<8}{stats['count']:>6}{str(stats['p50_ms']):>10}"
+                  f"{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", nargs="?", default="http://localhost:8080", help="Base URL of the service")
+    parser.add_argument("--images", nargs="*", default=DEFAULT_IMAGES, help="Drawings to upload (round robin)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=None, help="Closed loop: requests in flight")
+    load.add_argument("--rate", type=float, default=None, help="Open loop: requests per second")
+    parser.add_argument("--constant", action="store_true", help="Evenly spaced arrivals instead of Poisson (--rate)")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--duration", type=float, default=None, help="Stop sending after this many seconds")
+    parser.add_argument("--mix", type=float, default=1.0, help="Fraction of requests to /segment-character; the rest go to /animate")
+    parser.add_argument("--unique", action="store_true", help="Make every upload distinct, so every request is cold")
+    parser.add_argument("--no-wait", action="store_true", help="Do not poll /animate jobs to completion")
+    parser.add_argument("--layout", choices=("parts", "atlas"), default="parts")
+    parser.add_argument("--tier", default=None, help="Segmentation tier (default: server's SEGMENTATION_TIER)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request (and per-job) timeout in seconds")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between /jobs polls")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="Write the summary and every request record to this file")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        args.requests = 20
+    if not 0.0 <= args.mix <= 1.0:
+        sys.exit("--mix must be between 0 and 1.")
+    random.seed(args.seed)
+
+    corpus = []
+    for path in args.images:
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+    if not corpus:
+        sys.exit("No images found.")
+
+    test = LoadTest(args.url, corpus, args.mix, unique=args.unique, wait_for_jobs=not args.no_wait,
+                    timeout=args.timeout, poll_interval=args.poll_interval, layout=args.layout, tier=args.tier)
+    probe = _probe(args.url)
+
+    start = time.perf_counter()
+    if args.rate:
+        print(f"Open loop: {args.rate}/s against {args.url}...")
+        test.run_open(args.rate, args.requests, args.duration, poisson=not args.constant)
+    else:
+        concurrency = args.concurrency or 1
+        print(f"Closed loop: {concurrency} in flight against {args.url}...")
+        test.run_closed(concurrency, args.requests, args.duration)
+    wall_seconds = time.perf_counter() - start
+
+    records = sorted(test.records, key=lambda r: r["started_s"])
+    report = {
+        "meta": {
+            "url": args.url,
+            "args": {k: v for k, v in vars(args).items() if k not in ("url", "images", "json_path")},
+            "images": [name for name, _ in corpus],
+            "wall_seconds": round(wall_seconds, 2),
+        },
+        "probe": probe,
+        "first_request": records[0] if records else None,
+        "endpoints": summarize(records, wall_seconds),
+    }
+    _print_summary(report)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({**report, "records": records}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,29 @@
 import os
-import shutil
+import json
+import time
+import queue
+import asyncio
 import logging
-from typing import Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, Request, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from PIL import Image, UnidentifiedImageError
 
-from agents.visual_decomposition import VisualDecompositionAgent
+from agents.character_analysis import CharacterAnalysisAgent
 from agents.asset_prep import AssetPrepAgent
-from agents.animation import AnimationAgent
-from agents.rigging import RiggingAgent
-from agents.segmentation import SegmentationAgent
+from agents.animation import AnimationAgent, VEO_ASPECT_RATIOS
+from agents.segmentation import SegmentationAgent, SEGMENTATION_TIERS, DEFAULT_TIER
+from artifacts import ArtifactStore, ranged_file_response
+from jobs import Deferred, Job, JobManager, JOB_SUCCEEDED
+from scheduler import Overloaded, StageScheduler
+from cache import get_analysis_cache
+from ingest import IngestedImage, UploadTooLarge, ingest_upload
+from registry import AgentRegistry
+from singleflight import SingleFlight, make_key
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,91 +40,204 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variables for lazy loading
-decomposition_agent = None
-asset_agent = None
-animation_agent = None
-rigging_agent = None
-segmentation_agent = None
+# Generated videos, garbage-collected by age and total size
+artifact_store = ArtifactStore()
 
-def get_agents():
-    global decomposition_agent, asset_agent, animation_agent, rigging_agent, segmentation_agent
-    
-    if decomposition_agent is None:
-        try:
-            logger.info("Initializing VisualDecompositionAgent...")
-            decomposition_agent = VisualDecompositionAgent()
-        except Exception as e:
-            logger.error(f"Failed to init VisualDecompositionAgent: {e}")
-            
-    if asset_agent is None:
-        try:
-            logger.info("Initializing AssetPrepAgent...")
-            asset_agent = AssetPrepAgent()
-        except Exception as e:
-             logger.error(f"Failed to init AssetPrepAgent: {e}")
+# Background workers for long-running /animate pipelines
+job_manager = JobManager()
 
-    if animation_agent is None:
-        try:
-            logger.info("Initializing AnimationAgent...")
-            animation_agent = AnimationAgent()
-        except Exception as e:
-            logger.error(f"Failed to init AnimationAgent: {e}")
-            
-    if rigging_agent is None:
-        try:
-            logger.info("Initializing RiggingAgent...")
-            rigging_agent = RiggingAgent()
-        except Exception as e:
-            logger.error(f"Failed to init RiggingAgent: {e}")
+# Bounded per-stage pools for blocking work (Gemini calls, SAM 2, rembg)
+scheduler = StageScheduler()
+
+# Client retries of the same drawing and parameters share one pipeline run (and one Veo generation)
+segment_flights = SingleFlight("segment-character")
+animate_flights = SingleFlight("animate")
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    logger.warning(f"Rejecting request: {exc}")
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Agents are built concurrently in the background at startup (see AgentRegistry)
+agent_registry = AgentRegistry({
+    # One fused Gemini call serves both rigging and decomposition
+    "CharacterAnalysisAgent": CharacterAnalysisAgent,
+    "AssetPrepAgent": AssetPrepAgent,
+    "AnimationAgent": AnimationAgent,
+    "SegmentationAgent": SegmentationAgent,
+})
+
+# Gauges read from existing stats at scrape time
+metrics.register_stats("analysis_cache", lambda: get_analysis_cache().stats())
+metrics.register_stats("scheduler", lambda: scheduler.stats(), label="stage")
+metrics.register_stats("jobs", lambda: {"active": job_manager.active_count()})
+metrics.register_stats("agent", lambda: {
+    name: {
+        "ready": int(status["state"] == "ready"),
+        "load_seconds": status["load_seconds"],
+        "warmup_seconds": status["warmup_seconds"],
+    }
+    for name, status in agent_registry.status().items()
+}, label="agent")
 
-    if segmentation_agent is None:
+def _segmentation_stats():
+    agent = agent_registry.peek("SegmentationAgent")
+    return agent.embedding_cache.stats() if agent else {}
+
+def _veo_stats():
+    agent = agent_registry.peek("AnimationAgent")
+    return {"in_flight": agent.poller.in_flight()} if agent and agent.poller else {}
+
+def _upload_stats():
+    agent = agent_registry.peek("SegmentationAgent")
+    return agent.upload_stats() if agent else {}
+
+metrics.register_stats("embedding_cache", _segmentation_stats)
+metrics.register_stats("part_uploads", _upload_stats)
+metrics.register_stats("veo", _veo_stats)
+metrics.register_stats("singleflight", lambda: {
+    flights.name: flights.stats() for flights in (segment_flights, animate_flights)
+}, label="endpoint")
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Request latency and in-flight count for /metrics. With X-Trace: 1 (or TRACE_REQUESTS=1)
+    the stage spans of the request are logged and summarized in a Server-Timing header.
+    """
+    metrics.HTTP_IN_PROGRESS.inc()
+    started = time.perf_counter()
+    status = 500
+    with metrics.request_trace(request.headers.get("x-trace") == "1") as spans:
         try:
-            logger.info("Initializing SegmentationAgent...")
-            segmentation_agent = SegmentationAgent()
-        except Exception as e:
-            logger.error(f"Failed to init SegmentationAgent: {e}")
-            
-    return decomposition_agent, asset_agent, animation_agent, rigging_agent, segmentation_agent
+            response = await call_next(request)
+            status = response.status_code
+            if spans is not None:
+                response.headers["Server-Timing"] = metrics.server_timing(spans)
+                logger.info(f"Trace {request.method} {request.url.path}: {metrics.format_trace(spans)}")
+            return response
+        finally:
+            route = request.scope.get("route")
+            metrics.HTTP_SECONDS.labels(
+                request.method, route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+            metrics.HTTP_IN_PROGRESS.dec()
+
+def get_agents():
+    """
+    Returns all agents, waiting for any that are still loading. Failed agents are None.
+    """
+    return (
+        agent_registry.get("CharacterAnalysisAgent"),
+        agent_registry.get("AssetPrepAgent"),
+        agent_registry.get("AnimationAgent"),
+        agent_registry.get("SegmentationAgent"),
+    )
     
 class AnimationResponse(BaseModel):
     video_url: str
     character_name: str
     description: str
 
+# Values accepted for the layout form field of /segment-character
+SEGMENTATION_LAYOUTS = ("parts", "atlas")
+# Upper bound on drawings per /segment-characters request
+MAX_BATCH_IMAGES = int(os.environ.get("MAX_BATCH_IMAGES", 32))
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
 class SegmentationResponse(BaseModel):
     rig_data: dict
     part_urls: dict
+    image_hash: Optional[str] = None
+    # layout=atlas: {"atlas_url", "manifest_url", "manifest"}; part_urls is empty then
+    atlas: Optional[Dict[str, Any]] = None
+
+class RefinePartRequest(BaseModel):
+    image_hash: str
+    part_name: str
+    # Normalized [ymin, xmin, ymax, xmax], same format as rig_data["parts"]
+    box: Optional[List[float]] = None
+    # Normalized [x, y] prompts; labels are 1 (include) or 0 (exclude), default all 1
+    points: Optional[List[List[float]]] = None
+    point_labels: Optional[List[int]] = None
+    # Output size and PNG level of the new part; use the tier the image was segmented with so it lines up
+    tier: Optional[str] = None
+
+class RefinePartResponse(BaseModel):
+    part_name: str
+    url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    stage: str
+    progress: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+@app.on_event("startup")
+def start_background_work():
+    if os.environ.get("WARMUP_ON_STARTUP", "1") != "0":
+        agent_registry.start()
+    artifact_store.start_gc()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    job_manager.shutdown()
+    scheduler.shutdown()
+    artifact_store.stop_gc()
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
-@app.post("/segment-character", response_model=SegmentationResponse)
-async def segment_character(
-    file: UploadFile = File(...)
-):
+@app.get("/ready")
+async def readiness_check():
     """
-    Analyzes the character, creates a rig, segments parts, and returns all data for the frontend.
+    Readiness probe: 200 once every agent is loaded and warmed up, 503 until then
+    (or if an agent failed). Includes per-agent state and load timings.
     """
-    temp_input_path = f"temp_seg_{file.filename}"
-    
-    try:
-        # Save uploaded file
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        logger.info(f"Received image for segmentation: {file.filename}")
+    body = {"ready": agent_registry.ready, "agents": agent_registry.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint: stage latency histograms, error counters, request metrics,
+    cache hit rates, scheduler queues and in-flight Veo operations.
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
-        # Lazy load agents
-        _, _, _, rig_agent, seg_agent = get_agents()
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters for the Gemini analysis cache.
+    """
+    return get_analysis_cache().stats()
+
+async def _segment_character(image: IngestedImage, layout: str, tier: Optional[str]) -> SegmentationResponse:
+    """
+    Gemini analysis then SAM 2 segmentation and upload; run once per distinct (image, layout, tier).
+    """
+    try:
+        # Lazy load agents (waits off the event loop if they are still warming up)
+        analysis_agent, _, _, seg_agent = await run_in_threadpool(get_agents)
         
-        if not rig_agent or not seg_agent:
+        if not analysis_agent or not seg_agent:
              raise HTTPException(status_code=500, detail="Agents are not initialized.")
 
         # Step 1: Rigging (Gemini)
         logger.info("Starting Rigging Analysis...")
-        rig_data = rig_agent.analyze_image(temp_input_path)
+        analysis = await scheduler.run("gemini", analysis_agent.analyze_image, image)
+        rig_data = analysis.rig_data()
         if not rig_data:
             raise HTTPException(status_code=500, detail="Rigging analysis failed.")
             
@@ -120,7 +245,16 @@ async def segment_character(
 
         # Step 2: Segmentation (SAM 2)
         logger.info("Starting Segmentation...")
-        part_urls = seg_agent.segment_and_upload(temp_input_path, rig_data)
+        if layout == "atlas":
+            atlas = await scheduler.run("segmentation", seg_agent.segment_to_atlas, image, rig_data, tier)
+            return SegmentationResponse(
+                rig_data=rig_data,
+                part_urls={},
+                image_hash=image.hash,
+                atlas=atlas
+            )
+
+        part_urls = await scheduler.run("segmentation", seg_agent.segment_and_upload, image, rig_data, tier)
         
         if not part_urls:
             logger.warning("Segmentation returned empty, but returning rig data.")
@@ -128,99 +262,328 @@ async def segment_character(
 
         return SegmentationResponse(
             rig_data=rig_data,
-            part_urls=part_urls
+            part_urls=part_urls,
+            image_hash=image.hash
         )
 
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Segmentation endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if os.path.exists(temp_input_path):
-            os.remove(temp_input_path)
 
-@app.post("/animate")
-async def generate_animation(
-    background_tasks: BackgroundTasks,
+@app.post("/segment-character", response_model=SegmentationResponse)
+async def segment_character(
     file: UploadFile = File(...),
-    character_description: Optional[str] = None
+    layout: str = Form("parts"),
+    tier: Optional[str] = Form(None)
 ):
     """
-    Legacy video generation endpoint.
+    Analyzes the character, creates a rig, segments parts, and returns all data for the frontend.
+    layout="parts" uploads one full-canvas PNG per part; layout="atlas" uploads a single
+    sprite sheet of cropped parts plus a JSON manifest.
+    tier ("fast", "balanced", "high") trades part image resolution and PNG size for latency;
+    defaults to SEGMENTATION_TIER.
     """
-    temp_input_path = f"temp_{file.filename}"
-    processed_asset_path = f"processed_{file.filename}.png"
-    output_video_path = f"output_{file.filename}.mp4"
-    
+    if layout not in SEGMENTATION_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of {list(SEGMENTATION_LAYOUTS)}")
+    if tier is not None and tier not in SEGMENTATION_TIERS:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {list(SEGMENTATION_TIERS)}")
+    image = await _ingest(file)
+
+    # Retries of the same upload attach to the run in progress (or one that just finished)
+    key = make_key(image.hash, layout, tier or DEFAULT_TIER)
+    return await segment_flights.run(key, _segment_character, image, layout, tier)
+
+@app.post("/refine-part", response_model=RefinePartResponse)
+async def refine_part(request: RefinePartRequest):
+    """
+    Re-segments one part of an image already sent to /segment-character, from an edited
+    box or point prompts. Reuses the cached SAM 2 embedding, so no Gemini call or re-encode.
+    """
+    _, _, _, seg_agent = await run_in_threadpool(get_agents)
+    if not seg_agent:
+        raise HTTPException(status_code=500, detail="Agents are not initialized.")
+
     try:
-        # Save uploaded file
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        logger.info(f"Received image: {file.filename}")
+        url = await scheduler.run(
+            "segmentation",
+            seg_agent.refine_part,
+            request.image_hash,
+            request.part_name,
+            box=request.box,
+            points=request.points,
+            point_labels=request.point_labels,
+            tier=request.tier
+        )
+    except Overloaded:
+        raise
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Part refinement error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Lazy load agents
-        dec_agent, ast_agent, anim_agent, _, _ = get_agents()
-        
-        if not dec_agent or not ast_agent or not anim_agent:
-             raise HTTPException(status_code=500, detail="Agents are not initialized.")
+    return RefinePartResponse(part_name=request.part_name, url=url)
 
-        # Phase 1: Visual Decomposition
-        # If character_description is not provided, we derive it
-        rig_desc = character_description
-        rig_name = "Unknown"
-        
+def _has_parts(outcome: dict) -> bool:
+    if "atlas" in outcome:
+        return bool(outcome["atlas"]["manifest"]["parts"])
+    return bool(outcome.get("part_urls"))
+
+def _batch_line(index: int, image: IngestedImage, rig_data: Optional[dict], outcome) -> str:
+    body = {"index": index, "filename": image.filename, "image_hash": image.hash, "rig_data": rig_data}
+    if isinstance(outcome, Exception):
+        body["error"] = str(outcome)
+    else:
+        body.update(outcome)
+        body["error"] = None
+    return json.dumps(body) + "\n"
+
+@app.post("/segment-characters")
+async def segment_characters(
+    files: List[UploadFile] = File(...),
+    layout: str = Form("parts"),
+    tier: Optional[str] = Form(None)
+):
+    """
+    Batch version of /segment-character for many drawings at once (e.g. a classroom upload).
+    Rig analyses run concurrently, SAM 2 encodes the images in micro-batches as their rigs
+    arrive, and all parts go through the shared upload pool. Streams one JSON line per image
+    (application/x-ndjson) as soon as it is done:
+    {"index", "filename", "image_hash", "rig_data", "part_urls" | "atlas", "error"}.
+    """
+    if layout not in SEGMENTATION_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of {list(SEGMENTATION_LAYOUTS)}")
+    if tier is not None and tier not in SEGMENTATION_TIERS:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {list(SEGMENTATION_TIERS)}")
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per request.")
+
+    images = []
+    for file in files:
+        try:
+            images.append(await _ingest(file))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"{file.filename}: {e.detail}")
+
+    analysis_agent, _, _, seg_agent = await run_in_threadpool(get_agents)
+    if not analysis_agent or not seg_agent:
+        raise HTTPException(status_code=500, detail="Agents are not initialized.")
+
+    loop = asyncio.get_running_loop()
+    results: asyncio.Queue = asyncio.Queue()
+    # Rigs flow from the analyses to the segmentation thread as they finish; None ends the stream
+    work: queue.Queue = queue.Queue()
+    rigs: Dict[int, dict] = {}
+
+    def segment_all():
+        for index, outcome in seg_agent.segment_many(iter(work.get, None), tier, layout):
+            if isinstance(outcome, dict) and not _has_parts(outcome):
+                outcome = RuntimeError("Segmentation produced no parts.")
+            loop.call_soon_threadsafe(results.put_nowait, (index, outcome))
+
+    def on_segmentation_done(future):
+        if future.exception() is not None:
+            loop.call_soon_threadsafe(results.put_nowait, (None, future.exception()))
+
+    # The whole batch is admitted as one unit and holds a single segmentation slot (503 if full)
+    segmentation = scheduler.submit("segmentation", segment_all)
+    segmentation.add_done_callback(on_segmentation_done)
+
+    gemini_slots = asyncio.Semaphore(scheduler.limits["gemini"])
+
+    async def analyze(index: int, image: IngestedImage):
         try:
-            logger.info("Starting Visual Decomposition...")
-            rig = dec_agent.analyze_image(temp_input_path)
-            rig_desc = rig.description
-            rig_name = rig.character_name
-            logger.info(f"Character Analyzed: {rig_name}")
+            async with gemini_slots:
+                # At most the stage limit per batch; if other traffic fills the Gemini queue this
+                # image fails with Overloaded like a single /segment-character would
+                analysis = await scheduler.run("gemini", analysis_agent.analyze_image, image)
+            rigs[index] = analysis.rig_data()
+            if not rigs[index]:
+                raise RuntimeError("Rigging analysis failed.")
+            work.put((index, image, rigs[index]))
         except Exception as e:
-            logger.error(f"Visual Decomposition failed: {e}")
-            # Fallback if decomposition fails (optional, or re-raise)
-            if not rig_desc:
-                rig_desc = "A character drawing"
-
-        # Phase 2: Asset Prep
-        logger.info("Starting Asset Prep...")
-        ast_agent.process_image(temp_input_path, processed_asset_path)
-
-        # Phase 3: Animation
-        logger.info("Starting Animation Generation...")
-        # Audio is optional/None for now as per orchestrator.py
-        video_path = anim_agent.generate_animation(
-            processed_asset_path, 
-            audio_path=None, 
-            character_description=rig_desc
-        )
+            logger.error(f"Rig analysis of batch image {index} failed: {e}")
+            results.put_nowait((index, e))
+
+    async def analyze_all():
+        try:
+            await asyncio.gather(*(analyze(i, image) for i, image in enumerate(images)))
+        finally:
+            work.put(None)
 
-        if not os.path.exists(video_path):
-            raise HTTPException(status_code=500, detail="Video generation failed to produce output.")
+    # Runs to completion even if the client disconnects, so the segmentation thread always gets its end marker
+    analyses = asyncio.ensure_future(analyze_all())
+    _background_tasks.add(analyses)
+    analyses.add_done_callback(_background_tasks.discard)
 
-        # Rename to specific output path if different
-        if video_path != output_video_path:
-            shutil.move(video_path, output_video_path)
+    async def stream():
+        remaining = set(range(len(images)))
+        while remaining:
+            index, outcome = await results.get()
+            if index is None:
+                # Segmentation stopped; every image still outstanding fails with its error
+                for i in sorted(remaining):
+                    yield _batch_line(i, images[i], rigs.get(i), outcome)
+                break
+            remaining.discard(index)
+            yield _batch_line(index, images[index], rigs.get(index), outcome)
 
-        # Clean up input files immediately
-        cleanup_files(temp_input_path, processed_asset_path)
-        
-        # Schedule cleanup of output video after sending response? 
-        # FileResponse doesn't easily support cleanup after stream.
-        # For a simple prototype, we keep it or rely on Cloud Run container restart/cleanup.
-        # Or we can use a background task to delete it after a delay? 
-        # Actually, FileResponse holds the file open.
-        # We will leave the output file for now or implement a periodic cleanup if this were long-running.
-        
-        return FileResponse(output_video_path, media_type="video/mp4", filename="animation.mp4")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def _ingest(file: UploadFile) -> IngestedImage:
+    """
+    Reads and decodes an upload once; every stage of the request shares the result.
+    """
+    try:
+        return await ingest_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Image.DecompressionBombError as e:
+        # Not an OSError; without this a pixel bomb surfaces as a 500
+        raise HTTPException(status_code=413, detail=f"Image has too many pixels: {e}")
+    except (UnidentifiedImageError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode image: {e}")
+
+def _run_animation_job(job: Job, image: IngestedImage, character_description: Optional[str],
+                       aspect_ratio: Optional[str] = None) -> dict:
+    """
+    Runs decomposition -> asset prep -> Veo for one job on a worker thread.
+    """
+    analysis_agent, ast_agent, anim_agent, _ = get_agents()
+
+    if not analysis_agent or not ast_agent or not anim_agent:
+        raise RuntimeError("Agents are not initialized.")
+
+    processed_asset_path = os.path.join(job.work_dir, "processed.png")
+    output_video_path = artifact_store.path_for(job.id, "animation.mp4")
 
+    # Phase 1: Visual Decomposition
+    # If character_description is not provided, we derive it
+    rig_desc = character_description
+    rig_name = "Unknown"
+
+    try:
+        job.set_stage("decomposition", 0.05)
+        logger.info("Starting Visual Decomposition...")
+        # Usually a cache hit: /segment-character already analyzed this drawing
+        rig = scheduler.call("gemini", analysis_agent.analyze_image, image)
+        rig_desc = rig.description
+        rig_name = rig.character_name
+        logger.info(f"Character Analyzed: {rig_name}")
     except Exception as e:
-        logger.error(f"Pipeline failed: {e}")
-        # Cleanup on failure
-        cleanup_files(temp_input_path, processed_asset_path)
-        if os.path.exists(output_video_path):
-            os.remove(output_video_path)
-            
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Visual Decomposition failed: {e}")
+        # Fallback if decomposition fails (optional, or re-raise)
+        if not rig_desc:
+            rig_desc = "A character drawing"
+
+    # Phase 2: Asset Prep
+    job.set_stage("asset_prep", 0.2)
+    logger.info("Starting Asset Prep...")
+    scheduler.call("asset_prep", ast_agent.process_image, image, processed_asset_path)
+
+    # Phase 3: Animation
+    job.set_stage("animation", 0.3)
+    logger.info("Starting Animation Generation...")
+    # Audio is optional/None for now as per orchestrator.py
+    operation_future = anim_agent.start_animation(
+        processed_asset_path,
+        character_description=rig_desc,
+        aspect_ratio=aspect_ratio,
+        on_progress=lambda fraction: job.set_stage("animation", 0.3 + 0.6 * fraction)
+    )
+    # The frame has been sent to Veo; only the video is needed from here on
+    cleanup_files(processed_asset_path)
+
+    def finish(future) -> dict:
+        job.set_stage("download", 0.9)
+        video_path = anim_agent.finish_animation(future, output_video_path, aspect_ratio)
+
+        if not video_path or not os.path.exists(video_path):
+            raise RuntimeError("Video generation failed to produce output.")
+
+        return AnimationResponse(
+            video_url=f"/jobs/{job.id}/video",
+            character_name=rig_name,
+            description=rig_desc
+        ).model_dump()
+
+    if operation_future is None:
+        # Nothing was submitted (no client or submission error): finish with the placeholder now
+        return finish(None)
+
+    # Release the worker thread while the shared poller waits on Veo
+    return Deferred(operation_future, finish)
+
+@app.post("/animate", response_model=JobStatusResponse, status_code=202)
+async def generate_animation(
+    file: UploadFile = File(...),
+    character_description: Optional[str] = None,
+    aspect_ratio: Optional[str] = None
+):
+    """
+    Starts a video generation job and returns its id immediately.
+    Poll GET /jobs/{job_id} (or stream GET /jobs/{job_id}/events) for progress.
+    """
+    if aspect_ratio is not None and aspect_ratio not in VEO_ASPECT_RATIOS:
+        raise HTTPException(status_code=400, detail=f"aspect_ratio must be one of {list(VEO_ASPECT_RATIOS)}.")
+
+    image = await _ingest(file)
+
+    def start_job():
+        job = job_manager.create("animation")
+        logger.info(f"Received image: {file.filename} (job {job.id})")
+        job_manager.start(job, _run_animation_job, image, character_description, aspect_ratio)
+        return job, job.done
+
+    # A retry of the same drawing and options gets the existing job instead of another Veo generation.
+    # Off the event loop: creating a job prunes expired ones, which deletes their directories
+    key = make_key(image.hash, character_description, aspect_ratio)
+    job, attached = await run_in_threadpool(animate_flights.claim, key, start_job)
+    if attached:
+        logger.info(f"Received image: {file.filename} (attached to job {job.id})")
+    return JobStatusResponse(**job.to_dict())
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JobStatusResponse(**job.to_dict())
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of job snapshots, closed once the job finishes.
+    """
+    if not job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_stream():
+        async for snapshot in job_manager.watch(job_id):
+            yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Serves the finished clip with HTTP Range support so players can start before it fully downloads.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.status != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+
+    output_video_path = artifact_store.get(job_id, "animation.mp4")
+    if not output_video_path:
+        raise HTTPException(status_code=410, detail="Video is no longer available.")
+
+    return ranged_file_response(output_video_path, range_header, media_type="video/mp4", filename="animation.mp4")
 
 
 
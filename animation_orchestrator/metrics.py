@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Record per-request trace spans for every request (otherwise only when the request sends X-Trace: 1)
+TRACE_ALL_REQUESTS = os.environ.get("TRACE_REQUESTS", "0") == "1"
+
+# Stages span milliseconds (mask decode) to minutes (Veo), so buckets cover both ends
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "amibuddy_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+STAGE_ERRORS = Counter(
+    "amibuddy_stage_errors_total", "Pipeline stage executions that raised", ["stage"])
+HTTP_SECONDS = Histogram(
+    "amibuddy_http_request_seconds", "HTTP request latency by route", ["method", "route", "status"],
+    buckets=STAGE_BUCKETS)
+HTTP_IN_PROGRESS = Gauge(
+    "amibuddy_http_requests_in_progress", "HTTP requests currently being handled")
+
+_trace: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Times a block into amibuddy_stage_seconds{stage} (and the current request trace, if any).
+    Exceptions are counted in amibuddy_stage_errors_total and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, start)
+
+
+def observe(stage: str, seconds: float, started: Optional[float] = None):
+    """
+    Records a duration measured elsewhere (e.g. a Veo generation that spans many polls).
+    """
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    spans = _trace.get()
+    if spans is not None:
+        started = started if started is not None else time.perf_counter() - seconds
+        spans.append({
+            "stage": stage,
+            "start_ms": round(started * 1000, 1),
+            "duration_ms": round(seconds * 1000, 1),
+            "thread": threading.current_thread().name,
+        })
+
+
+def submit(executor: Executor, fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    executor.submit that carries the caller's context, so spans recorded on worker threads join its trace.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def request_trace(enabled: bool):
+    """
+    Collects the spans of one request. Yields the span list (None when tracing is off).
+    """
+    if not (enabled or TRACE_ALL_REQUESTS):
+        yield None
+        return
+    spans: List[Dict[str, Any]] = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    if not spans:
+        return "[]"
+    origin = min(span["start_ms"] for span in spans)
+    return json.dumps([{**span, "start_ms": round(span["start_ms"] - origin, 1)} for span in spans])
+
+
+def server_timing(spans: List[Dict[str, Any]]) -> str:
+    """
+    Server-Timing header value summing the spans of each stage.
+    """
+    totals: Dict[str, float] = {}
+    for span in spans:
+        totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["duration_ms"]
+    return ", ".join(f"{stage};dur={duration:.1f}" for stage, duration in totals.items())
+
+
+class _StatsCollector:
+    """
+    Exposes the stats() dicts the caches, scheduler and pollers already keep as gauges,
+    read at scrape time: amibuddy_<source>_<key>, labelled by `label` for nested dicts.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def register(self, source: str, fn: Callable[[], Dict[str, Any]], label: Optional[str] = None):
+        with self._lock:
+            self._sources[source] = (fn, label)
+
+    def collect(self):
+        with self._lock:
+            sources = list(self._sources.items())
+        for source, (fn, label) in sources:
+            try:
+                stats = fn()
+            except Exception as e:
+                logger.warning(f"Could not collect {source} stats: {e}")
+                continue
+            if label is None:
+                for key, value in stats.items():
+                    if isinstance(value, (int, float)):
+                        yield GaugeMetricFamily(f"amibuddy_{source}_{key}", f"{source} {key}", value=value)
+                continue
+
+            families: Dict[str, GaugeMetricFamily] = {}
+            for label_value, values in stats.items():
+                for key, value in values.items():
+                    if not isinstance(value, (int, float)):
+                        continue
+                    if key not in families:
+                        families[key] = GaugeMetricFamily(f"amibuddy_{source}_{key}", f"{source} {key}", labels=[label])
+                    families[key].add_metric([str(label_value)], value)
+            yield from families.values()
+
+
+_stats_collector = _StatsCollector()
+REGISTRY.register(_stats_collector)
+
+
+def register_stats(source: str, fn: Callable[[], Dict[str, Any]], label: Optional[str] = None):
+    _stats_collector.register(source, fn, label)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
@@ -1,7 +1,7 @@
 import os
 import argparse
 import sys
-from agents.visual_decomposition import VisualDecompositionAgent
+from agents.character_analysis import CharacterAnalysisAgent
 from agents.asset_prep import AssetPrepAgent
 from agents.animation import AnimationAgent
 
@@ -17,10 +17,10 @@ def main():
         sys.exit(1)
 
     try:
-        # Phase 1: Visual Decomposition
-        print("--- Phase 1: Visual Decomposition (Gemini 3 Pro Agent) ---")
-        decomposition_agent = VisualDecompositionAgent(api_key=args.api_key)
-        rig = decomposition_agent.analyze_image(args.image_path)
+        # Phase 1: Character Analysis (rig + decomposition in one cached Gemini call, as the API server does)
+        print("--- Phase 1: Character Analysis (Gemini Agent) ---")
+        analysis_agent = CharacterAnalysisAgent(api_key=args.api_key)
+        rig = analysis_agent.analyze_image(args.image_path)
         print(f"Character Identified: {rig.character_name}")
         print(f"Description: {rig.description}")
         print(f"Keypoints detected: {len(rig.keypoints)}")
@@ -0,0 +1,134 @@
+import os
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fallback clip sizes per aspect ratio
+VARIANTS = {
+    "1:1": (720, 720),
+    "16:9": (1280, 720),
+    "9:16": (720, 1280),
+}
+DEFAULT_VARIANT = "1:1"
+
+# Pre-rendered at image build time (python placeholder.py); rendered on first use otherwise
+PRERENDERED_DIR = os.environ.get(
+    "PLACEHOLDER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "placeholders"))
+
+
+def _filename(variant: str) -> str:
+    return f"placeholder_{variant.replace(':', 'x')}.mp4"
+
+
+def render_placeholder(output_path: str, width: int, height: int, fps: int = 30, duration_sec: int = 5) -> str:
+    """
+    Draws the "SDK Simulation Mode" clip with OpenCV. Expensive; use PlaceholderVideos instead of calling per request.
+    """
+    import cv2
+    import numpy as np
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+    if not out.isOpened():
+        with open(output_path, "wb") as f:
+            f.write(b"")
+        return output_path
+
+    frame_count = duration_sec * fps
+    radius = min(width, height) // 14
+    for i in range(frame_count):
+        img = np.zeros((height, width, 3), dtype=np.uint8)
+        t = i / frame_count
+        x = int(width * t)
+        y = int(height // 2)
+        cv2.circle(img, (x, y), radius, (0, 255, 255), -1)
+        cv2.putText(img, "SDK Simulation Mode", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        out.write(img)
+    out.release()
+    logger.info(f"Placeholder video rendered at {output_path} ({width}x{height})")
+    return output_path
+
+
+class PlaceholderVideos:
+    """
+    Fallback clips rendered once and kept in memory, one per aspect ratio.
+    Each variant is also materialized once as a file so write_to() can hard-link it
+    into a job's output instead of copying or re-encoding anything.
+    """
+
+    def __init__(self, link_dir: Optional[str] = None):
+        self.link_dir = link_dir or os.path.join(tempfile.gettempdir(), "amibuddy-placeholders")
+        self._videos: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, variant: str = DEFAULT_VARIANT) -> bytes:
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown placeholder variant {variant}. Use one of {list(VARIANTS)}.")
+        with self._lock:
+            if variant not in self._videos:
+                self._videos[variant] = self._load(variant)
+            return self._videos[variant]
+
+    def _load(self, variant: str) -> bytes:
+        prerendered = os.path.join(PRERENDERED_DIR, _filename(variant))
+        if os.path.isfile(prerendered):
+            with open(prerendered, "rb") as f:
+                return f.read()
+
+        width, height = VARIANTS[variant]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = render_placeholder(os.path.join(tmp, _filename(variant)), width, height)
+            with open(path, "rb") as f:
+                return f.read()
+
+    def load_all(self):
+        for variant in VARIANTS:
+            self.get(variant)
+
+    def _materialized(self, variant: str) -> str:
+        path = os.path.join(self.link_dir, _filename(variant))
+        if not os.path.isfile(path):
+            os.makedirs(self.link_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.get(variant))
+            os.replace(tmp_path, path)
+        return path
+
+    def write_to(self, output_path: str, variant: str = DEFAULT_VARIANT) -> str:
+        """
+        Puts the fallback clip at output_path: a hard link when possible, else one write from memory.
+        """
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(self._materialized(variant), output_path)
+        except OSError:
+            with open(output_path, "wb") as f:
+                f.write(self.get(variant))
+        return output_path
+
+
+_default_placeholders: Optional[PlaceholderVideos] = None
+_default_placeholders_lock = threading.Lock()
+
+
+def get_placeholder_videos() -> PlaceholderVideos:
+    global _default_placeholders
+    with _default_placeholders_lock:
+        if _default_placeholders is None:
+            _default_placeholders = PlaceholderVideos()
+        return _default_placeholders
+
+
+if __name__ == "__main__":
+    # Build step: pre-render every variant so containers never render them at runtime
+    os.makedirs(PRERENDERED_DIR, exist_ok=True)
+    for name, (w, h) in VARIANTS.items():
+        render_placeholder(os.path.join(PRERENDERED_DIR, _filename(name)), w, h)
@@ -0,0 +1,118 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATE_PENDING = "pending"
+STATE_LOADING = "loading"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class _AgentSlot:
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.factory = factory
+        self.agent = None
+        self.state = STATE_PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.done = threading.Event()
+        self.started = False
+
+
+class AgentRegistry:
+    """
+    Builds agents concurrently in the background and runs their optional warmup() hook
+    (e.g. one dummy SAM 2 / rembg inference) so the first real request finds them hot.
+    get() blocks until the requested agent has finished loading, loading it on demand
+    if start() was never called.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        self._slots = {name: _AgentSlot(name, factory) for name, factory in factories.items()}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """
+        Kicks off initialization of every agent in parallel. Returns immediately.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(self._slots), thread_name_prefix="warmup")
+            pending = [slot for slot in self._slots.values() if not slot.started]
+            for slot in pending:
+                slot.started = True
+        for slot in pending:
+            self._executor.submit(self._load, slot)
+
+    def _load(self, slot: _AgentSlot):
+        try:
+            slot.state = STATE_LOADING
+            logger.info(f"Initializing {slot.name}...")
+            started = time.perf_counter()
+            agent = slot.factory()
+            slot.load_seconds = time.perf_counter() - started
+            # A failed warmup marks the agent unready but keeps it, so requests still
+            # surface the agent's own error messages
+            slot.agent = agent
+
+            warmup = getattr(agent, "warmup", None)
+            if callable(warmup):
+                slot.state = STATE_WARMING
+                started = time.perf_counter()
+                warmup()
+                slot.warmup_seconds = time.perf_counter() - started
+
+            slot.state = STATE_READY
+            logger.info(
+                f"{slot.name} ready (load {slot.load_seconds:.2f}s, warmup {slot.warmup_seconds or 0:.2f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Failed to init {slot.name}: {e}")
+            slot.error = str(e)
+            slot.state = STATE_FAILED
+        finally:
+            slot.done.set()
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Returns the agent, or None if it could not be constructed.
+        """
+        slot = self._slots[name]
+        with self._lock:
+            load_inline = not slot.started
+            slot.started = True
+        if load_inline:
+            self._load(slot)
+        slot.done.wait(timeout)
+        return slot.agent
+
+    def peek(self, name: str) -> Optional[Any]:
+        """
+        The agent if it has been built already; never loads or waits.
+        """
+        return self._slots[name].agent
+
+    @property
+    def ready(self) -> bool:
+        return all(slot.state == STATE_READY for slot in self._slots.values())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "state": slot.state,
+                "load_seconds": slot.load_seconds,
+                "warmup_seconds": slot.warmup_seconds,
+                "error": slot.error,
+            }
+            for name, slot in self._slots.items()
+        }
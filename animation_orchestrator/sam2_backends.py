@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+import tempfile
+from typing import Optional
+
+import numpy as np
+import torch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# eager | compile | int8 | onnx
+BACKEND = os.environ.get("SAM2_BACKEND", "eager")
+# Intra-op threads for torch; defaults to the CPUs this process may run on
+NUM_THREADS = int(os.environ.get("SAM2_NUM_THREADS", 0)) or (
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count())
+# Optimized backends are rejected (falling back to eager) below these agreement levels
+MIN_FEATURE_COSINE = float(os.environ.get("SAM2_BACKEND_MIN_COSINE", 0.99))
+MIN_MASK_IOU = float(os.environ.get("SAM2_BACKEND_MIN_IOU", 0.95))
+ONNX_PATH = os.environ.get(
+    "SAM2_ONNX_PATH", os.path.join(tempfile.gettempdir(), "amibuddy-sam2-image-encoder-dynamic.onnx"))
+
+BACKENDS = ("eager", "compile", "int8", "onnx")
+
+
+def tune_threads(num_threads: int = NUM_THREADS):
+    torch.set_num_threads(num_threads)
+    try:
+        # Only allowed before torch has started any inter-op work
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    logger.info(f"torch using {torch.get_num_threads()} intra-op threads")
+
+
+class _EncoderOutputs(torch.nn.Module):
+    """
+    Flattens the image encoder's output dict into a tuple so it can be exported to ONNX.
+    """
+
+    def __init__(self, encoder: torch.nn.Module):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, image: torch.Tensor):
+        out = self.encoder(image)
+        return (out["vision_features"], *out["backbone_fpn"], *out["vision_pos_enc"])
+
+
+class OnnxImageEncoder(torch.nn.Module):
+    """
+    Drop-in replacement for SAM2's image encoder that runs an exported graph on ONNX Runtime
+    and returns the same dict the torch module does.
+    """
+
+    def __init__(self, path: str, num_levels: int, num_threads: int = NUM_THREADS):
+        super().__init__()
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.num_levels = num_levels
+
+    def forward(self, image: torch.Tensor):
+        outputs = [torch.from_numpy(o) for o in self.session.run(None, {self.input_name: image.cpu().numpy()})]
+        n = self.num_levels
+        return {
+            "vision_features": outputs[0],
+            "backbone_fpn": outputs[1:1 + n],
+            "vision_pos_enc": outputs[1 + n:1 + 2 * n],
+        }
+
+
+def _export_onnx(encoder: torch.nn.Module, image_size: int, path: str) -> int:
+    wrapper = _EncoderOutputs(encoder).eval()
+    dummy = torch.zeros(1, 3, image_size, image_size)
+    with torch.no_grad():
+        num_levels = len(encoder(dummy)["backbone_fpn"])
+        if not os.path.exists(path):
+            logger.info(f"Exporting SAM 2 image encoder to {path}...")
+            tmp_path = f"{path}.tmp"
+            output_names = [f"output_{i}" for i in range(1 + 2 * num_levels)]
+            # Dynamic batch dimension, so set_image_batch can run through the same graph
+            dynamic_axes = {name: {0: "batch"} for name in ["image", *output_names]}
+            torch.onnx.export(wrapper, dummy, tmp_path, input_names=["image"], output_names=output_names,
+                              dynamic_axes=dynamic_axes, opset_version=17)
+            os.replace(tmp_path, path)
+    return num_levels
+
+
+def _optimized_encoder(name: str, model) -> torch.nn.Module:
+    encoder = model.image_encoder
+    if name == "compile":
+        # dynamic=True: set_image_batch sends varying batch sizes, which would otherwise each recompile
+        return torch.compile(encoder, dynamic=True)
+    if name == "int8":
+        # Hiera is mostly Linear layers (attention projections and MLPs)
+        return torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    if name == "onnx":
+        num_levels = _export_onnx(encoder, model.image_size, ONNX_PATH)
+        return OnnxImageEncoder(ONNX_PATH, num_levels)
+    raise ValueError(f"Unknown SAM 2 backend {name}. Use one of {list(BACKENDS)}.")
+
+
+def _validation_image(size: int = 512) -> np.ndarray:
+    """
+    Deterministic drawing-like test card: dark strokes and flat fills on white.
+    """
+    yy, xx = np.mgrid[:size, :size]
+    image = np.full((size, size, 3), 255, dtype=np.uint8)
+    head = (xx - size * 0.5) ** 2 + (yy - size * 0.3) ** 2 < (size * 0.15) ** 2
+    body = (abs(xx - size * 0.5) < size * 0.12) & (yy > size * 0.45) & (yy < size * 0.8)
+    image[head] = (250, 200, 60)
+    image[body] = (60, 120, 230)
+    image[abs(np.sqrt((xx - size * 0.5) ** 2 + (yy - size * 0.3) ** 2) - size * 0.15) < 3] = 20
+    return image
+
+
+def _validation_batch(image_size: int) -> torch.Tensor:
+    """
+    Two different normalized images at the encoder's input size, to check batched inference.
+    """
+    image = torch.from_numpy(_validation_image()).permute(2, 0, 1).float() / 255
+    batch = torch.stack([image, image.flip(-1)])
+    return torch.nn.functional.interpolate(batch, size=(image_size, image_size), mode="bilinear", align_corners=False)
+
+
+def _batch_features(encoder: torch.nn.Module, batch: torch.Tensor) -> torch.Tensor:
+    with torch.inference_mode():
+        return encoder(batch)["vision_features"].float().reshape(len(batch), -1)
+
+
+def _run_predictor(predictor, image: np.ndarray, box: np.ndarray):
+    with torch.inference_mode():
+        start = time.perf_counter()
+        predictor.set_image(image)
+        encode_seconds = time.perf_counter() - start
+        features = predictor._features["image_embed"].float().flatten()
+        masks, _, _ = predictor.predict(point_coords=None, point_labels=None, box=box, multimask_output=False)
+        predictor.reset_predictor()
+    return features, masks.astype(bool), encode_seconds
+
+
+def install_backend(predictor, name: Optional[str] = None) -> str:
+    """
+    Tunes torch threads and swaps the predictor's image encoder for the selected backend.
+    The optimized encoder is validated against eager outputs on a fixed test image (embedding
+    cosine similarity and mask IoU) and on a batch of two (per-image embedding cosine, as used by
+    set_image_batch); if it fails, cannot be built, or disagrees, eager is kept.
+    Returns the name of the backend in use.
+    """
+    name = name or BACKEND
+    tune_threads()
+    if name == "eager":
+        return name
+
+    model = predictor.model
+    eager_encoder = model.image_encoder
+    image = _validation_image()
+    box = np.array([[150, 60, 362, 420]], dtype=np.float32)
+
+    try:
+        _run_predictor(predictor, image, box)
+        reference_features, reference_masks, eager_seconds = _run_predictor(predictor, image, box)
+        batch = _validation_batch(model.image_size)
+        reference_batch = _batch_features(eager_encoder, batch)
+        model.image_encoder = _optimized_encoder(name, model)
+        # First calls pay for lazy setup (compilation, session init); time the second ones
+        _run_predictor(predictor, image, box)
+        features, masks, seconds = _run_predictor(predictor, image, box)
+        batch_features = _batch_features(model.image_encoder, batch)
+    except Exception as e:
+        logger.error(f"SAM 2 backend {name} could not be set up, using eager: {e}")
+        model.image_encoder = eager_encoder
+        return "eager"
+
+    cosine = torch.nn.functional.cosine_similarity(features, reference_features, dim=0).item()
+    batch_cosine = torch.nn.functional.cosine_similarity(batch_features, reference_batch, dim=1).min().item()
+    union = np.logical_or(masks, reference_masks).sum()
+    iou = float(np.logical_and(masks, reference_masks).sum() / union) if union else 1.0
+    logger.info(f"SAM 2 backend {name}: encode {seconds * 1000:.0f} ms vs eager {eager_seconds * 1000:.0f} ms, "
+                f"embedding cosine {cosine:.4f} (batch of 2: {batch_cosine:.4f}), mask IoU {iou:.4f}")
+
+    if min(cosine, batch_cosine) < MIN_FEATURE_COSINE or iou < MIN_MASK_IOU:
+        logger.error(f"SAM 2 backend {name} disagrees with eager outputs, using eager instead.")
+        model.image_encoder = eager_encoder
+        return "eager"
+    return name
+
+
+if __name__ == "__main__":
+    # Compare every backend on this machine: python sam2_backends.py [checkpoint] [config]
+    import sys
+    from sam2.build_sam import build_sam2
+    from sam2.sam2_image_predictor import SAM2ImagePredictor
+
+    checkpoint = sys.argv[1] if len(sys.argv) > 1 else "checkpoints/sam2_hiera_tiny.pt"
+    config = sys.argv[2] if len(sys.argv) > 2 else "sam2_hiera_t.yaml"
+    predictor = SAM2ImagePredictor(build_sam2(config, checkpoint, device="cpu"))
+    eager_encoder = predictor.model.image_encoder
+    for backend in BACKENDS[1:]:
+        print(f"{backend}: {'accepted' if install_backend(predictor, backend) == backend else 'rejected'}")
+        predictor.model.image_encoder = eager_encoder
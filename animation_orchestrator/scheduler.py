@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import observe
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Concurrent calls allowed per stage. SAM 2 and rembg are CPU-bound but torch and
+# ONNX Runtime release the GIL while they compute, so threads scale across cores.
+DEFAULT_STAGE_LIMITS = {
+    "gemini": 8,
+    "segmentation": 2,
+    "asset_prep": 1,
+}
+
+
+class Overloaded(Exception):
+    """
+    Raised when a stage (or the job queue) is saturated. Handlers turn it into a 503 with Retry-After.
+    """
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"Server is busy ({stage} queue is full). Retry in {retry_after}s.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    # "segmentation=2,asset_prep=2"
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            stage, value = item.split("=", 1)
+            limits[stage.strip()] = int(value)
+    return limits
+
+
+class StageScheduler:
+    """
+    Runs blocking pipeline stages off the event loop on per-stage thread pools.
+    Each stage has its own concurrency limit and a bounded number of waiting callers;
+    once that is exceeded new work is rejected with Overloaded instead of queueing forever.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, max_queue: Optional[int] = None,
+                 retry_after: Optional[int] = None):
+        self.limits = dict(DEFAULT_STAGE_LIMITS)
+        self.limits.update(_parse_limits(os.environ.get("STAGE_LIMITS", "")))
+        self.limits.update(limits or {})
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("STAGE_QUEUE_SIZE", 8))
+        self.retry_after = retry_after or int(os.environ.get("STAGE_RETRY_AFTER_SECONDS", 5))
+
+        # One pool per stage, sized to its limit, so a backlog in one stage never starves another
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"stage-{stage}")
+            for stage, limit in self.limits.items()
+        }
+        self._pending = {stage: 0 for stage in self.limits}
+        self._lock = threading.Lock()
+
+    def _admit(self, stage: str):
+        with self._lock:
+            if self._pending[stage] >= self.limits[stage] + self.max_queue:
+                raise Overloaded(stage, self.retry_after)
+            self._pending[stage] += 1
+
+    def _release(self, stage: str):
+        with self._lock:
+            self._pending[stage] -= 1
+
+    def _submit(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        # Records how long the call waited for a stage worker, and runs it in the caller's
+        # context so its timings join the caller's request trace
+        submitted = time.perf_counter()
+
+        def run():
+            observe(f"{stage}_queue", time.perf_counter() - submitted, submitted)
+            return fn(*args, **kwargs)
+
+        return self._executors[stage].submit(contextvars.copy_context().run, run)
+
+    def call(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn on the stage pool and blocks until it finishes. For worker threads
+        (e.g. /animate jobs) that were already admitted, so it waits instead of rejecting.
+        """
+        with self._lock:
+            self._pending[stage] += 1
+        try:
+            return self._submit(stage, fn, *args, **kwargs).result()
+        finally:
+            self._release(stage)
+
+    def submit(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Admits fn to the stage (raising Overloaded right away if the queue is full) and returns
+        its Future. The slot is released when fn finishes.
+        """
+        self._admit(stage)
+        try:
+            future = self._submit(stage, fn, *args, **kwargs)
+        except Exception:
+            self._release(stage)
+            raise
+        future.add_done_callback(lambda _: self._release(stage))
+        return future
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn on the stage pool without blocking the event loop. Raises Overloaded if the stage queue is full.
+        """
+        return await asyncio.wrap_future(self.submit(stage, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                stage: {"limit": self.limits[stage], "pending": self._pending[stage]}
+                for stage in self.limits
+            }
+
+    def shutdown(self, wait: bool = False):
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
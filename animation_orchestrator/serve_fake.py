@@ -0,0 +1,41 @@
+"""
+Runs the API with Gemini, Veo and Firebase replaced by the fakes in fakes.py, for load tests
+that should exercise the server (scheduler, SAM 2, rembg, jobs) without paid calls.
+
+    python serve_fake.py                                   # port 8080 (PORT), default fake latencies
+    python serve_fake.py --gemini-latency 1.5 --veo-latency 30
+    python serve_fake.py --no-coalesce                     # identical uploads each run the pipeline
+"""
+import os
+import argparse
+
+from bench_utils import DEFAULT_IMAGES, DEFAULT_RECORDINGS
+from fakes import FakeLatency, fake_agent_factories, load_rigs
+from registry import AgentRegistry
+import main
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8080)))
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Recorded Gemini rigs (benchmark_gemini_encoding.py --record)")
+    parser.add_argument("--checkpoint", default="checkpoints/sam2_hiera_tiny.pt")
+    parser.add_argument("--gemini-latency", type=float, default=2.0, help="Simulated seconds per Gemini call")
+    parser.add_argument("--veo-latency", type=float, default=60.0, help="Simulated seconds per Veo generation")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Simulated seconds per Storage upload")
+    parser.add_argument("--no-coalesce", action="store_true", help="Do not attach identical uploads to an earlier request")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    latency = FakeLatency(gemini=args.gemini_latency, veo=args.veo_latency, upload=args.upload_latency)
+    rigs = load_rigs(args.recordings, [path for path in DEFAULT_IMAGES if os.path.isfile(path)])
+    # Swapped in before startup, so the startup hook loads the faked agents instead of the real ones
+    main.agent_registry = AgentRegistry(fake_agent_factories(rigs, latency, args.checkpoint))
+    if args.no_coalesce:
+        main.segment_flights.enabled = main.animate_flights.enabled = False
+    uvicorn.run(main.app, host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main_cli()
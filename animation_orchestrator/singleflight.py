@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long a finished run keeps answering duplicates (client retries that arrive just after completion)
+WINDOW_SECONDS = float(os.environ.get("SINGLEFLIGHT_WINDOW_SECONDS", 30))
+# Set to 0 to run every request, e.g. when benchmarking or load testing with repeated images
+ENABLED = os.environ.get("SINGLEFLIGHT_ENABLED", "1") != "0"
+
+
+def make_key(image_hash: str, *params: Any) -> str:
+    return ":".join([image_hash, *(str(p) for p in params)])
+
+
+class _Flight:
+    def __init__(self, value: Any, done: Future):
+        self.value = value
+        self.done = done
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests (same image hash and parameters): the first one runs, concurrent
+    duplicates attach to it and get its result, and for window_seconds after it succeeds later
+    duplicates get that result too. Failed runs are forgotten at once so a retry starts fresh.
+    With enabled=False every request runs on its own.
+    """
+
+    def __init__(self, name: str, window_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        self.name = name
+        self.window_seconds = window_seconds if window_seconds is not None else WINDOW_SECONDS
+        self.enabled = enabled if enabled is not None else ENABLED
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {"leaders": 0, "attached_in_flight": 0, "attached_completed": 0}
+
+    def _prune_locked(self, now: float):
+        expired = [
+            key for key, flight in self._flights.items()
+            if flight.finished_at is not None and now - flight.finished_at > self.window_seconds
+        ]
+        for key in expired:
+            del self._flights[key]
+
+    def _finished(self, key: str, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is not flight:
+                return
+            if flight.done.cancelled() or flight.done.exception() is not None:
+                del self._flights[key]
+            else:
+                flight.finished_at = time.time()
+
+    def claim(self, key: str, start: Callable[[], Tuple[Any, Future]]) -> Tuple[Any, bool]:
+        """
+        Returns (value, attached). If an identical run is in flight (or finished within the window)
+        its value is returned with attached=True. Otherwise start() is called and must return
+        (value, done): the value handed to duplicates and a Future completing when the run ends.
+        """
+        if not self.enabled:
+            value, _ = start()
+            with self._lock:
+                self._counters["leaders"] += 1
+            return value, False
+
+        with self._lock:
+            self._prune_locked(time.time())
+            flight = self._flights.get(key)
+            if flight is not None:
+                counter = "attached_completed" if flight.finished_at is not None else "attached_in_flight"
+                self._counters[counter] += 1
+                return flight.value, True
+            # Started under the lock so two simultaneous duplicates cannot both become leaders
+            value, done = start()
+            flight = _Flight(value, done)
+            self._flights[key] = flight
+            self._counters["leaders"] += 1
+        # Outside the lock: the callback runs immediately if done has already completed
+        done.add_done_callback(lambda _: self._finished(key, flight))
+        return value, False
+
+    async def run(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Awaits fn(*args, **kwargs) (a coroutine function) once per key; duplicates await the same result
+        or exception.
+        """
+        def start():
+            future = Future()
+            return future, future
+
+        future, attached = self.claim(key, start)
+        if attached:
+            logger.info(f"{self.name}: attached to run {key[:12]}")
+            # Shielded so a disconnecting duplicate cannot cancel the shared result
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_exception(RuntimeError(f"{self.name}: the original request was cancelled"))
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = sum(1 for flight in self._flights.values() if flight.finished_at is None)
+            return {
+                **self._counters,
+                "in_flight": in_flight,
+                "completed": len(self._flights) - in_flight,
+            }
@@ -0,0 +1,73 @@
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("google.genai")
+pytest.importorskip("prometheus_client")
+
+import agents.animation as animation
+from agents.animation import AnimationAgent
+from placeholder import PlaceholderVideos
+
+
+class _Video:
+    def __init__(self, uri=None, video_bytes=None):
+        self.uri = uri
+        self.video_bytes = video_bytes
+
+
+class _Generated:
+    def __init__(self, video):
+        self.video = video
+
+
+class _Result:
+    def __init__(self, video):
+        self.generated_videos = [_Generated(video)]
+
+
+class _Operation:
+    def __init__(self, video):
+        self.error = None
+        self.result = _Result(video)
+
+
+class _FailingFetcher:
+    def download_to_file(self, uri, output_path):
+        raise RuntimeError("GCS download failed: 403")
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    agent = AnimationAgent()
+    agent.placeholders = PlaceholderVideos(link_dir=str(tmp_path / "links"))
+    # Stand-in clip, so the test never renders one with OpenCV
+    monkeypatch.setattr(agent.placeholders, "get", lambda variant="1:1": f"placeholder {variant}".encode())
+    return agent
+
+
+def _finished(video) -> Future:
+    future = Future()
+    future.set_result(_Operation(video))
+    return future
+
+
+def test_failed_gcs_download_falls_back_to_placeholder(agent, monkeypatch, tmp_path):
+    monkeypatch.setattr(animation, "get_storage_fetcher", lambda: _FailingFetcher())
+    output_path = tmp_path / "output.mp4"
+    result = agent.finish_animation(_finished(_Video(uri="gs://bucket/clip.mp4")), str(output_path), "16:9")
+    assert result == str(output_path)
+    assert output_path.read_bytes() == b"placeholder 16:9"
+
+
+def test_inline_video_bytes_are_written(agent, tmp_path):
+    output_path = tmp_path / "output.mp4"
+    agent.finish_animation(_finished(_Video(video_bytes=b"veo clip")), str(output_path))
+    assert output_path.read_bytes() == b"veo clip"
+
+
+def test_missing_submission_uses_placeholder(agent, tmp_path):
+    output_path = tmp_path / "output.mp4"
+    agent.finish_animation(None, str(output_path), "9:16")
+    assert output_path.read_bytes() == b"placeholder 9:16"
@@ -0,0 +1,90 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from artifacts import ArtifactStore, _parse_range, ranged_file_response
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-0, 10-20", (0, 0)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",
+    "bytes=500-100",
+    "bytes=-0",
+    "bytes=abc-def",
+    "bytes=-",
+])
+def test_parse_range_unsatisfiable(header):
+    assert _parse_range(header, 1000) is None
+
+
+def _write(store: ArtifactStore, key: str, size: int, age: float = 0.0) -> str:
+    path = store.path_for(key, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    os.utime(os.path.dirname(path), (mtime, mtime))
+    return path
+
+
+def test_gc_removes_expired_then_oldest_over_budget(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_bytes=250, ttl_seconds=60)
+    _write(store, "expired", 10, age=120)
+    _write(store, "old", 100, age=30)
+    _write(store, "middle", 100, age=20)
+    _write(store, "new", 100, age=10)
+    store.gc()
+    assert store.get("expired", "video.mp4") is None
+    assert store.get("old", "video.mp4") is None
+    assert store.get("middle", "video.mp4") and store.get("new", "video.mp4")
+
+
+@pytest.fixture
+def client(tmp_path):
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI, Header
+    from fastapi.testclient import TestClient
+
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 4)
+    app = FastAPI()
+
+    @app.get("/video")
+    def video(range: str = Header(None)):
+        return ranged_file_response(str(path), range, "video/mp4")
+
+    return TestClient(app)
+
+
+def test_ranged_response_serves_whole_file(client):
+    response = client.get("/video")
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert len(response.content) == 1024
+
+
+def test_ranged_response_serves_partial_content(client):
+    response = client.get("/video", headers={"Range": "bytes=256-511"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 256-511/1024"
+    assert response.content == bytes(range(256))
+
+
+def test_ranged_response_rejects_unsatisfiable_range(client):
+    response = client.get("/video", headers={"Range": "bytes=2000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from atlas import ATLAS_PADDING, build_atlas, pack_shelves
+
+
+def _overlaps(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+def test_pack_shelves_places_rectangles_without_overlap():
+    sizes = [(40, 30), (10, 50), (25, 25), (60, 5), (5, 5)]
+    positions, (width, height) = pack_shelves(sizes)
+    rects = [(x, y, w, h) for (x, y), (w, h) in zip(positions, sizes)]
+    for i, a in enumerate(rects):
+        x, y, w, h = a
+        assert x >= ATLAS_PADDING and y >= ATLAS_PADDING
+        assert x + w + ATLAS_PADDING <= width and y + h + ATLAS_PADDING <= height
+        for b in rects[i + 1:]:
+            assert not _overlaps(a, b)
+
+
+def test_pack_shelves_empty():
+    assert pack_shelves([]) == ([], (0, 0))
+
+
+def test_build_atlas_copies_sprites_and_maps_pivots():
+    head = Image.new("RGBA", (20, 10), (255, 0, 0, 255))
+    body = Image.new("RGBA", (30, 40), (0, 0, 255, 255))
+    rig = {"joints": {"neck": [0.5, 0.25], "hips": [0.5, 0.75]}}
+    sheet, manifest = build_atlas({"head": (head, (40, 10)), "body": (body, (35, 30))}, rig, (100, 80))
+
+    assert manifest["image_size"] == [100, 80]
+    assert manifest["atlas_size"] == list(sheet.size)
+    for name, sprite in (("head", head), ("body", body)):
+        x, y, w, h = manifest["parts"][name]["rect"]
+        assert (w, h) == sprite.size
+        assert sheet.crop((x, y, x + w, y + h)).tobytes() == sprite.tobytes()
+
+    head_entry = manifest["parts"]["head"]
+    assert head_entry["source"] == [40, 10, 20, 10]
+    assert head_entry["pivot"] == {"joint": "neck", "source": [50.0, 20.0], "local": [10.0, 10.0]}
+
+
+def test_build_atlas_without_joint_has_no_pivot():
+    arm = Image.new("RGBA", (5, 5), (0, 255, 0, 255))
+    _, manifest = build_atlas({"left_arm": (arm, (0, 0))}, {"joints": {}}, (10, 10))
+    assert manifest["parts"]["left_arm"]["pivot"] is None
@@ -0,0 +1,100 @@
+import time
+
+from cache import AnalysisCache, BlobIndex, EmbeddingCache
+
+
+def _memory_cache(**kwargs) -> AnalysisCache:
+    return AnalysisCache(db_path=":memory:", **kwargs)
+
+
+def test_analysis_cache_round_trip():
+    cache = _memory_cache()
+    key = AnalysisCache.make_key("hash", "model", "v1")
+    assert cache.get(key) is None
+    cache.set(key, {"joints": {"neck": [0.5, 0.3]}})
+    assert cache.get(key) == {"joints": {"neck": [0.5, 0.3]}}
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_analysis_cache_memory_tier_evicts_least_recently_used():
+    cache = _memory_cache(max_memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert list(cache._memory) == ["a", "c"]
+    # Evicted from memory, but still served (and promoted) from the disk tier
+    assert cache.get("b") == 2
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_analysis_cache_disk_tier_is_bounded():
+    cache = _memory_cache(max_memory_entries=1, max_disk_entries=2)
+    for i, key in enumerate("abc"):
+        cache.set(key, i)
+        time.sleep(0.001)
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2
+    assert stats["evictions"] >= 1
+    cache._memory.clear()
+    assert cache.get("a") is None
+    assert cache.get("c") == 2
+
+
+def test_analysis_cache_expires_after_ttl():
+    cache = _memory_cache(ttl_seconds=0.05)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_analysis_cache_disk_tier_is_bounded_by_size():
+    cache = _memory_cache(max_memory_entries=1, max_disk_bytes=250)
+    for key in "abc":
+        cache.set(key, "x" * 100)
+        time.sleep(0.001)
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2
+    assert stats["disk_bytes"] <= 250
+    cache._memory.clear()
+    assert cache.get("a") is None
+    assert cache.get("c") == "x" * 100
+
+
+def test_analysis_cache_disk_errors_count_as_misses():
+    cache = _memory_cache(max_memory_entries=1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Any sqlite3.Error (locked, corrupt, closed) must degrade to a miss instead of raising
+    cache._db.close()
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["disk_entries"] == 0
+
+
+def test_embedding_cache_respects_byte_budget():
+    cache = EmbeddingCache(max_bytes=100)
+    cache.set("a", "A", 60)
+    cache.set("b", "B", 30)
+    cache.get("a")
+    cache.set("c", "C", 30)
+    assert "b" not in cache
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    cache.set("huge", "H", 101)
+    assert "huge" not in cache
+    assert cache.stats()["bytes"] == 90
+
+
+def test_blob_index_evicts_oldest_name():
+    index = BlobIndex(max_entries=2)
+    index.add("a")
+    index.add("b")
+    assert "a" in index
+    index.add("c")
+    assert "b" not in index
+    assert "a" in index and "c" in index
+    assert index.stats()["evictions"] == 1
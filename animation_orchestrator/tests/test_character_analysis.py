@@ -0,0 +1,98 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip("google.genai")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from agents.character_analysis import CharacterAnalysis, CharacterAnalysisAgent
+from cache import AnalysisCache
+from ingest import ingest_bytes
+
+RIG = {
+    "joints": {"neck": [0.5, 0.3], "hips": [0.5, 0.7]},
+    "parts": {"head": [0.0, 0.3, 0.3, 0.7]},
+    "mouth": {"center": [0.5, 0.2], "box": [0.15, 0.45, 0.25, 0.55]},
+}
+
+
+def test_full_answer_validates():
+    analysis = CharacterAnalysis.from_response({
+        "character_name": "Ami", "description": "A cat",
+        "keypoints": [{"name": "nose", "x": 0.5, "y": 0.3, "confidence": 0.9}], **RIG,
+    })
+    assert analysis.character_name == "Ami"
+    assert len(analysis.keypoints) == 1
+    assert analysis.rig_data() == RIG
+
+
+def test_missing_fields_fall_back_to_defaults():
+    analysis = CharacterAnalysis.from_response({"parts": RIG["parts"]})
+    assert analysis.character_name == "Unknown"
+    assert analysis.description == ""
+    assert analysis.keypoints == []
+    assert analysis.rig_data() == {"parts": RIG["parts"]}
+
+
+def test_invalid_fields_are_dropped_and_valid_ones_kept():
+    analysis = CharacterAnalysis.from_response({
+        "character_name": ["not", "a", "string"],
+        "keypoints": [
+            {"name": "nose", "x": 0.5, "y": 0.3, "confidence": 0.9},
+            {"name": "left_eye", "x": "left"},
+            "garbage",
+        ],
+        "joints": "none visible",
+        **{k: v for k, v in RIG.items() if k != "joints"},
+    })
+    assert analysis.character_name == "Unknown"
+    assert [k.name for k in analysis.keypoints] == ["nose"]
+    assert analysis.joints is None
+    assert analysis.rig_data() == {"parts": RIG["parts"], "mouth": RIG["mouth"]}
+
+
+def test_non_object_answer_is_rejected():
+    with pytest.raises(ValueError):
+        CharacterAnalysis.from_response(["a", "list"])
+
+
+class _Models:
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        return type("Response", (), {"text": self.text})()
+
+
+def _agent(text: str) -> CharacterAnalysisAgent:
+    agent = CharacterAnalysisAgent(api_key="test-key", cache=AnalysisCache(db_path=":memory:"))
+    agent.client = type("Client", (), {"models": _Models(text)})()
+    return agent
+
+
+def _image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "white").save(buffer, format="PNG")
+    return ingest_bytes(buffer.getvalue())
+
+
+def test_partial_answer_in_markdown_is_cached_once():
+    agent = _agent("```json\n" + json.dumps({"description": "A dog", **RIG}) + "\n```")
+    image = _image()
+    first = agent.analyze_image(image)
+    second = agent.analyze_image(image)
+    assert first.description == second.description == "A dog"
+    assert second.rig_data() == RIG
+    assert agent.client.models.calls == 1
+
+
+def test_unparseable_answer_raises():
+    agent = _agent("I could not find a character.")
+    with pytest.raises(json.JSONDecodeError):
+        agent.analyze_image(_image())
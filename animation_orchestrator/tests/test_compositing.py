@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("prometheus_client")
+
+from compositing import PartCompositor, mask_bboxes
+
+
+def _scene():
+    rgb = np.arange(8 * 10 * 3, dtype=np.uint8).reshape(8, 10, 3)
+    masks = np.zeros((3, 8, 10), dtype=bool)
+    masks[0, 1:4, 2:5] = True
+    masks[1, 5:8, 0:10] = True
+    # masks[2] stays empty
+    return rgb, masks
+
+
+def test_mask_bboxes_are_tight_and_exclusive():
+    _, masks = _scene()
+    assert mask_bboxes(masks).tolist() == [[2, 1, 5, 4], [0, 5, 10, 8], [0, 0, 0, 0]]
+
+
+def test_composite_crops_parts_with_mask_alpha():
+    rgb, masks = _scene()
+    with PartCompositor(feather_radius=0).composite(rgb, masks) as parts:
+        head, legs, empty = parts
+        image, offset = head
+        assert offset == (2, 1)
+        assert image.mode == "RGBA" and image.size == (3, 3)
+        pixels = np.asarray(image)
+        assert (pixels[:, :, :3] == rgb[1:4, 2:5]).all()
+        assert (pixels[:, :, 3] == 255).all()
+        assert legs[1] == (0, 5) and legs[0].size == (10, 3)
+        assert empty is None
+
+
+def test_uncropped_parts_keep_the_full_canvas():
+    rgb, masks = _scene()
+    with PartCompositor(feather_radius=0).composite(rgb, masks, crop=False) as parts:
+        image, offset = parts[0]
+        assert offset == (0, 0) and image.size == (10, 8)
+        alpha = np.asarray(image)[:, :, 3]
+        assert (alpha == masks[0] * 255).all()
+
+
+def test_feathering_grows_the_crop_and_softens_edges():
+    rgb, masks = _scene()
+    with PartCompositor().composite(rgb, masks, feather_radius=1) as parts:
+        image, offset = parts[0]
+        assert offset == (1, 0) and image.size == (5, 5)
+        alpha = np.asarray(image)[:, :, 3]
+        assert alpha[2, 2] == 255
+        assert 0 < alpha[0, 2] < 255
+
+
+def test_scratch_buffers_are_reused_and_bounded():
+    rgb, masks = _scene()
+    compositor = PartCompositor(feather_radius=0, pooled_buffers=1)
+    with compositor.composite(rgb, masks):
+        with compositor.composite(rgb, masks):
+            # Concurrent composites get separate buffers
+            assert compositor._free == []
+    assert len(compositor._free) == 1
+    pooled = compositor._free[0]
+    with compositor.composite(rgb, masks):
+        assert compositor._free == []
+    assert compositor._free[0] is pooled
@@ -0,0 +1,103 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("google.auth")
+
+from gcs import StorageFetcher, parse_gcs_uri
+
+URI = "gs://bucket/videos/clip.mp4"
+BODY = b"0123456789abcdef"
+
+
+class _Response:
+    def __init__(self, status_code: int, chunks, fail_after: int = None):
+        self.status_code = status_code
+        self.text = ""
+        self._chunks = chunks
+        self._fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size: int):
+        for i, chunk in enumerate(self._chunks):
+            if i == self._fail_after:
+                raise requests.exceptions.ChunkedEncodingError("connection dropped")
+            yield chunk
+
+
+class _Session:
+    """
+    Replays scripted responses and records the Range header of every request.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.ranges.append(headers.get("Range"))
+        return self.responses.pop(0)
+
+
+def _fetcher(responses, max_retries: int = 3) -> StorageFetcher:
+    fetcher = StorageFetcher(max_retries=max_retries)
+    fetcher._session = _Session(responses)
+    fetcher._token = lambda: "token"
+    return fetcher
+
+
+def test_parse_gcs_uri():
+    assert parse_gcs_uri(URI) == ("bucket", "videos/clip.mp4")
+    with pytest.raises(ValueError):
+        parse_gcs_uri("https://bucket/clip.mp4")
+    assert StorageFetcher.media_url(URI).endswith("/b/bucket/o/videos%2Fclip.mp4?alt=media")
+
+
+def test_dropped_connection_resumes_with_range():
+    fetcher = _fetcher([
+        _Response(200, [BODY[:4], BODY[4:8], BODY[8:]], fail_after=2),
+        _Response(206, [BODY[8:]]),
+    ])
+    assert b"".join(fetcher.iter_chunks(URI, chunk_size=4)) == BODY
+    assert fetcher._session.ranges == [None, "bytes=8-"]
+
+
+def test_server_ignoring_range_restarts_without_duplicates():
+    fetcher = _fetcher([
+        _Response(200, [BODY[:6], BODY[6:]], fail_after=1),
+        # Answers the resumed request with the whole object instead of 206
+        _Response(200, [BODY[:4], BODY[4:10], BODY[10:]]),
+    ])
+    assert b"".join(fetcher.iter_chunks(URI)) == BODY
+    assert fetcher._session.ranges == [None, "bytes=6-"]
+
+
+def test_unsatisfiable_range_means_nothing_left():
+    fetcher = _fetcher([_Response(416, [])])
+    assert list(fetcher.iter_chunks(URI, start=len(BODY))) == []
+
+
+def test_http_errors_are_not_retried():
+    fetcher = _fetcher([_Response(403, [])])
+    with pytest.raises(RuntimeError, match="403"):
+        list(fetcher.iter_chunks(URI))
+
+
+def test_gives_up_after_max_retries_and_removes_partial_file(tmp_path):
+    fetcher = _fetcher([_Response(200, [BODY[:4], BODY[4:]], fail_after=1) for _ in range(3)], max_retries=2)
+    output_path = tmp_path / "clip.mp4"
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        fetcher.download_to_file(URI, str(output_path))
+    assert not output_path.exists()
+    assert fetcher._session.ranges == [None, "bytes=4-", "bytes=4-"]
+
+
+def test_download_to_file_writes_every_byte(tmp_path):
+    fetcher = _fetcher([_Response(200, [BODY[:5], BODY[5:]])])
+    output_path = tmp_path / "clip.mp4"
+    assert fetcher.download_to_file(URI, str(output_path)) == len(BODY)
+    assert output_path.read_bytes() == BODY
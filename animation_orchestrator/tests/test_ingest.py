@@ -0,0 +1,94 @@
+import io
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("starlette")
+
+from PIL import Image
+
+from ingest import UploadTooLarge, as_ingested, decode_image, ingest_bytes, ingest_upload
+
+
+def _encode(image: Image.Image, fmt: str = "PNG", **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def _transparent_drawing() -> Image.Image:
+    # A red character on a fully transparent background, like the sample drawings
+    image = Image.new("RGBA", (40, 40), (0, 0, 0, 0))
+    image.paste((200, 30, 30, 255), (10, 10, 30, 30))
+    return image
+
+
+def test_transparent_background_becomes_white():
+    decoded = decode_image(_encode(_transparent_drawing()))
+    assert decoded.mode == "RGB"
+    assert decoded.getpixel((0, 0)) == (255, 255, 255)
+    assert decoded.getpixel((20, 20)) == (200, 30, 30)
+
+
+def test_palette_transparency_becomes_white():
+    palette_image = _transparent_drawing().convert("RGB").quantize(colors=4)
+    background_index = palette_image.getpixel((0, 0))
+    decoded = decode_image(_encode(palette_image, transparency=background_index))
+    assert decoded.getpixel((0, 0)) == (255, 255, 255)
+    assert decoded.getpixel((20, 20)) != (255, 255, 255)
+
+
+def test_exif_orientation_is_applied():
+    image = Image.new("RGB", (30, 10), "white")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 degrees clockwise to display
+    decoded = decode_image(_encode(image, "JPEG", exif=exif.tobytes()))
+    assert decoded.size == (10, 30)
+
+
+def test_longest_side_is_capped():
+    decoded = decode_image(_encode(Image.new("RGB", (400, 100), "white"), "JPEG"), max_side=100)
+    assert decoded.size == (100, 25)
+
+
+def test_ingested_array_is_shared_and_read_only():
+    image = ingest_bytes(_encode(_transparent_drawing()), filename="a.png")
+    array = image.array
+    assert array.shape == (40, 40, 3) and array.dtype == np.uint8
+    assert image.array is array
+    assert not array.flags.writeable
+    assert len(image.hash) == 64
+
+
+def test_as_ingested_accepts_paths_and_ingested_images(tmp_path):
+    path = tmp_path / "drawing.png"
+    path.write_bytes(_encode(_transparent_drawing()))
+    image = as_ingested(str(path))
+    assert image.filename == "drawing.png"
+    assert as_ingested(image) is image
+    with pytest.raises(FileNotFoundError):
+        as_ingested(str(tmp_path / "missing.png"))
+
+
+class _Upload:
+    def __init__(self, data: bytes, chunk: int = 7):
+        self.filename = "upload.png"
+        self._stream = io.BytesIO(data)
+        self._chunk = chunk
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._stream.read(min(size, self._chunk))
+
+
+def test_ingest_upload_hashes_the_streamed_bytes():
+    data = _encode(_transparent_drawing())
+    image = asyncio.run(ingest_upload(_Upload(data)))
+    assert image.hash == ingest_bytes(data).hash
+    assert image.data == data
+
+
+def test_ingest_upload_rejects_oversized_uploads():
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(ingest_upload(_Upload(b"x" * 100), max_bytes=50))
@@ -0,0 +1,108 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from jobs import JOB_FAILED, JOB_SUCCEEDED, Deferred, JobManager
+from scheduler import Overloaded
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(max_workers=2, max_queue=1, work_root=str(tmp_path))
+    yield manager
+    manager.shutdown(wait=True)
+
+
+def test_job_succeeds_with_result(manager):
+    job = manager.submit("test", lambda job, value: {"value": value}, 3)
+    assert job.done.result(timeout=5) == {"value": 3}
+    snapshot = job.to_dict()
+    assert snapshot["job_id"] == job.id
+    assert snapshot["status"] == JOB_SUCCEEDED
+    assert snapshot["progress"] == 1.0
+    assert manager.get(job.id) is job
+    assert os.path.isdir(job.work_dir)
+
+
+def test_job_failure_is_recorded(manager):
+    def fail(job):
+        raise ValueError("boom")
+
+    job = manager.submit("test", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        job.done.result(timeout=5)
+    assert job.to_dict()["status"] == JOB_FAILED
+    assert job.error == "boom"
+
+
+def test_prune_forgets_expired_jobs_and_their_directories(manager):
+    job = manager.submit("test", lambda job: None)
+    job.done.result(timeout=5)
+    manager.ttl_seconds = 0
+    job.finished_at -= 1
+    manager.prune()
+    assert manager.get(job.id) is None
+    assert not os.path.exists(job.work_dir)
+
+
+def test_watch_streams_stage_changes_until_finished(manager):
+    advance = threading.Event()
+
+    def staged(job):
+        job.set_stage("rendering", 0.5)
+        advance.wait(5)
+        return {"ok": True}
+
+    job = manager.submit("test", staged)
+
+    async def collect():
+        snapshots = []
+        async for snapshot in manager.watch(job.id, poll_interval=0.01):
+            snapshots.append(snapshot)
+            if snapshot["stage"] == "rendering":
+                advance.set()
+        return snapshots
+
+    snapshots = asyncio.run(collect())
+    assert snapshots[-1]["status"] == JOB_SUCCEEDED
+    assert any(s["stage"] == "rendering" and s["progress"] == 0.5 for s in snapshots)
+
+
+def test_watch_ends_for_unknown_job(manager):
+    async def collect():
+        return [snapshot async for snapshot in manager.watch("missing", poll_interval=0.01)]
+
+    assert asyncio.run(collect()) == []
+
+
+def test_create_rejects_beyond_workers_and_queue(manager):
+    release = threading.Event()
+    jobs = [manager.submit("test", lambda job: release.wait(5)) for _ in range(3)]
+    with pytest.raises(Overloaded):
+        manager.create("test")
+    release.set()
+    for job in jobs:
+        job.done.result(timeout=5)
+    assert manager.create("test") is not None
+
+
+def test_deferred_releases_the_worker_until_its_future_completes(manager):
+    external = Future()
+
+    def wait_for_external(job):
+        return Deferred(external, lambda future: {"video": future.result()})
+
+    job = manager.submit("test", wait_for_external)
+    # While the job waits, both workers are free for other jobs
+    others = [manager.submit("test", lambda job: "other") for _ in range(2)]
+    for other in others:
+        assert other.done.result(timeout=5) == "other"
+    assert not job.finished
+
+    external.set_result("clip.mp4")
+    assert job.done.result(timeout=5) == {"video": "clip.mp4"}
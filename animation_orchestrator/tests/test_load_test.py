@@ -0,0 +1,83 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from bench_utils import percentiles
+from load_test import LoadTest, summarize
+
+
+def test_percentiles_nearest_rank():
+    stats = percentiles([i / 1000 for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (50, 95, 99, 100)
+    assert stats["mean_ms"] == 50.5
+    assert percentiles([])["p50_ms"] is None
+
+
+@pytest.fixture
+def server():
+    """
+    Stub API: /animate answers with the body in server.animate_response, jobs finish on first poll.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            if self.path == "/animate":
+                self._send(202, httpd.animate_response)
+            else:
+                self._send(200, {"parts": {}})
+
+        def do_GET(self):
+            self._send(200, {"job_id": self.path.rsplit("/", 1)[-1], "status": "succeeded"})
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.animate_response = {"job_id": "job-1", "status": "queued"}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _load_test(server, mix: float) -> LoadTest:
+    return LoadTest(f"http://127.0.0.1:{server.server_port}", [("a.png", b"png")], mix, poll_interval=0.01)
+
+
+def test_animate_jobs_are_polled_to_completion(server):
+    test = _load_test(server, mix=0.0)
+    test.run_closed(2, 4, None)
+    summary = summarize(test.records, 1.0)["animate"]
+    assert summary["requests"] == 4
+    assert summary["ok"] == 4
+    assert summary["cold"]["count"] == 1 and summary["warm"]["count"] == 3
+
+
+def test_unexpected_errors_are_recorded(server):
+    server.animate_response = {"id": "job-1"}
+    test = _load_test(server, mix=0.0)
+    test.run_closed(2, 3, None)
+    assert len(test.records) == 3
+    assert all(r["error"] == "KeyError: 'job_id'" and r["latency_s"] is None for r in test.records)
+    assert summarize(test.records, 1.0)["animate"]["error_rate"] == 1.0
+
+
+def test_unique_uploads_are_all_cold(server):
+    test = LoadTest(f"http://127.0.0.1:{server.server_port}", [("a.png", b"png")], 1.0, unique=True)
+    test.run_closed(1, 3, None)
+    assert [r["cache"] for r in test.records] == ["cold"] * 3
+    assert all(r["status"] == 200 for r in test.records)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import placeholder
+from placeholder import PlaceholderVideos, _filename
+
+
+@pytest.fixture
+def placeholders(tmp_path, monkeypatch):
+    """
+    PlaceholderVideos reading small pre-rendered stand-ins, so no clip is rendered with OpenCV.
+    """
+    prerendered = tmp_path / "prerendered"
+    prerendered.mkdir()
+    for variant in placeholder.VARIANTS:
+        (prerendered / _filename(variant)).write_bytes(f"clip {variant}".encode())
+    monkeypatch.setattr(placeholder, "PRERENDERED_DIR", str(prerendered))
+    return PlaceholderVideos(link_dir=str(tmp_path / "links"))
+
+
+def test_get_serves_prerendered_variants(placeholders):
+    assert placeholders.get("9:16") == b"clip 9:16"
+    assert placeholders.get() == b"clip 1:1"
+    with pytest.raises(ValueError):
+        placeholders.get("4:3")
+
+
+def test_write_to_hard_links_the_shared_clip(placeholders, tmp_path):
+    output_path = tmp_path / "job" / "output.mp4"
+    output_path.parent.mkdir()
+    output_path.write_bytes(b"stale partial video")
+    placeholders.write_to(str(output_path), "16:9")
+    assert output_path.read_bytes() == b"clip 16:9"
+    assert os.path.samefile(output_path, placeholders._materialized("16:9"))
+
+
+def test_write_to_falls_back_to_a_copy(placeholders, tmp_path, monkeypatch):
+    def no_links(*args):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_links)
+    output_path = tmp_path / "output.mp4"
+    placeholders.write_to(str(output_path), "1:1")
+    assert output_path.read_bytes() == b"clip 1:1"
+    assert not os.path.samefile(output_path, placeholders._materialized("1:1"))
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from scheduler import Overloaded, StageScheduler, _parse_limits
+
+
+def test_parse_limits():
+    assert _parse_limits("segmentation=2, asset_prep=3,bogus") == {"segmentation": 2, "asset_prep": 3}
+
+
+def test_submit_rejects_when_workers_and_queue_are_full():
+    scheduler = StageScheduler(limits={"segmentation": 1}, max_queue=1, retry_after=7)
+    release = threading.Event()
+    try:
+        running = scheduler.submit("segmentation", release.wait, 5)
+        queued = scheduler.submit("segmentation", lambda: "queued")
+        with pytest.raises(Overloaded) as excinfo:
+            scheduler.submit("segmentation", lambda: "rejected")
+        assert excinfo.value.stage == "segmentation"
+        assert excinfo.value.retry_after == 7
+        assert scheduler.stats()["segmentation"]["pending"] == 2
+
+        release.set()
+        assert running.result(timeout=5) is True
+        assert queued.result(timeout=5) == "queued"
+        # Slots are released as calls finish, so the stage accepts work again
+        assert scheduler.submit("segmentation", lambda: "accepted").result(timeout=5) == "accepted"
+    finally:
+        release.set()
+        scheduler.shutdown(wait=True)
+    assert scheduler.stats()["segmentation"]["pending"] == 0
+
+
+def test_stages_do_not_share_capacity():
+    scheduler = StageScheduler(limits={"segmentation": 1, "gemini": 1}, max_queue=0)
+    release = threading.Event()
+    try:
+        scheduler.submit("segmentation", release.wait, 5)
+        with pytest.raises(Overloaded):
+            scheduler.submit("segmentation", lambda: None)
+        assert scheduler.submit("gemini", lambda: "ok").result(timeout=5) == "ok"
+    finally:
+        release.set()
+        scheduler.shutdown(wait=True)
+
+
+def test_call_waits_instead_of_rejecting():
+    scheduler = StageScheduler(limits={"asset_prep": 1}, max_queue=0)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(scheduler.call("asset_prep", lambda: i)))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        assert sorted(results) == [0, 1, 2, 3]
+    finally:
+        scheduler.shutdown(wait=True)
+
+
+def test_run_propagates_errors():
+    scheduler = StageScheduler(limits={"gemini": 1})
+
+    def fail():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(scheduler.run("gemini", fail))
+        assert scheduler.stats()["gemini"]["pending"] == 0
+    finally:
+        scheduler.shutdown(wait=True)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+from singleflight import SingleFlight, make_key
+
+
+def test_make_key_joins_hash_and_params():
+    assert make_key("abc", "parts", None) == "abc:parts:None"
+
+
+def test_concurrent_duplicates_share_one_run():
+    flights = SingleFlight("test", window_seconds=30)
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", work, 21) for _ in range(3)))
+
+    assert asyncio.run(main()) == [42, 42, 42]
+    assert calls == [21]
+    stats = flights.stats()
+    assert stats["leaders"] == 1
+    assert stats["attached_in_flight"] == 2
+    assert stats["completed"] == 1
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        return value
+
+    async def main():
+        return await asyncio.gather(flights.run("a", work, 1), flights.run("b", work, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert sorted(calls) == [1, 2]
+
+
+def test_finished_run_answers_within_window_only():
+    flights = SingleFlight("test", window_seconds=0.05)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    assert asyncio.run(flights.run("k", work)) == 1
+    assert asyncio.run(flights.run("k", work)) == 1
+    assert flights.stats()["attached_completed"] == 1
+    time.sleep(0.1)
+    assert asyncio.run(flights.run("k", work)) == 2
+
+
+def test_failures_reach_duplicates_and_are_forgotten():
+    flights = SingleFlight("test", window_seconds=30)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(flights.run("k", work), flights.run("k", work), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    # The failed run is not cached, so a retry starts fresh
+    assert asyncio.run(flights.run("k", work)) == "ok"
+    assert len(calls) == 2
+
+
+def test_disabled_runs_every_request():
+    flights = SingleFlight("test", enabled=False)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["ok"] * 3
+    assert len(calls) == 3
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_claim_attaches_to_the_leaders_value():
+    from concurrent.futures import Future
+
+    flights = SingleFlight("test")
+    done = Future()
+    assert flights.claim("k", lambda: ("job-1", done)) == ("job-1", False)
+    assert flights.claim("k", lambda: pytest.fail("must not start a second run")) == ("job-1", True)
+    done.set_result(None)
+    assert flights.stats()["completed"] == 1
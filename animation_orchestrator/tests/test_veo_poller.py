@@ -0,0 +1,94 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("google.genai")
+pytest.importorskip("prometheus_client")
+
+import veo_poller
+from veo_poller import MAX_INTERVAL, MIN_INTERVAL, OperationPoller, _Tracked
+
+
+class _Operation:
+    def __init__(self, name: str, done: bool = False):
+        self.name = name
+        self.done = done
+        self.error = None
+
+
+class _Operations:
+    def __init__(self, polls_until_done: int):
+        self.polls_until_done = polls_until_done
+        self.polls = {}
+
+    async def get(self, operation):
+        self.polls[operation.name] = self.polls.get(operation.name, 0) + 1
+        return _Operation(operation.name, done=self.polls[operation.name] >= self.polls_until_done)
+
+
+class _Client:
+    def __init__(self, polls_until_done: int = 1):
+        self.aio = type("Aio", (), {})()
+        self.aio.operations = _Operations(polls_until_done)
+
+
+def _poller(tmp_path, client=None) -> OperationPoller:
+    return OperationPoller(client or _Client(), state_path=str(tmp_path / "operations.json"))
+
+
+def test_interval_is_sparse_while_young_and_tight_when_overdue(tmp_path):
+    poller = _poller(tmp_path)
+    poller.expected_seconds = 60
+    now = time.time()
+
+    young = _Tracked(_Operation("young"), "young", now)
+    assert poller._interval(young, now) == MAX_INTERVAL
+    nearly_done = _Tracked(_Operation("nearly"), "nearly", now - 57)
+    assert poller._interval(nearly_done, now) == max(MIN_INTERVAL, 1.5)
+
+    overdue = _Tracked(_Operation("overdue"), "overdue", now - 90)
+    intervals = [poller._interval(overdue, now) for _ in range(12)]
+    assert intervals[0] == MIN_INTERVAL
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == MAX_INTERVAL
+
+
+def test_tracked_operation_resolves_and_is_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(veo_poller, "MIN_INTERVAL", 0.01)
+    poller = _poller(tmp_path, _Client(polls_until_done=1))
+    progress = []
+    future = poller.track(_Operation("operations/1"), "request-1", progress.append)
+
+    assert future.result(timeout=5).done
+    assert poller.find("request-1") is future
+    state = json.loads((tmp_path / "operations.json").read_text())
+    assert state["request-1"]["operation"] == "operations/1"
+    assert state["request-1"]["finished_at"] is not None
+
+
+def test_persisted_operations_resume_after_restart(tmp_path):
+    now = time.time()
+    (tmp_path / "operations.json").write_text(json.dumps({
+        "in-flight": {"operation": "operations/running", "submitted_at": now - 30, "finished_at": None},
+        "stale": {"operation": "operations/old", "submitted_at": now - 99999,
+                  "finished_at": now - veo_poller.RESULT_RETENTION_SECONDS - 1},
+    }))
+    client = _Client(polls_until_done=1)
+    poller = _poller(tmp_path, client)
+
+    future = poller.find("in-flight")
+    assert future is not None
+    assert future.result(timeout=5).name == "operations/running"
+    # Resumed by polling the saved name, not by submitting a new generation
+    assert client.aio.operations.polls == {"operations/running": 1}
+    assert poller.find("stale") is None
+    assert "stale" not in json.loads((tmp_path / "operations.json").read_text())
+
+
+def test_completion_refines_expected_duration(tmp_path, monkeypatch):
+    monkeypatch.setattr(veo_poller, "MIN_INTERVAL", 0.01)
+    poller = _poller(tmp_path)
+    poller.expected_seconds = 100
+    poller.track(_Operation("operations/2"), "request-2").result(timeout=5)
+    assert poller.expected_seconds < 100
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from google.genai import types
+
+from metrics import observe
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = float(os.environ.get("VEO_POLL_MIN_SECONDS", 2))
+MAX_INTERVAL = float(os.environ.get("VEO_POLL_MAX_SECONDS", 15))
+# Starting guess for how long a generation takes; refined from observed runs
+EXPECTED_SECONDS = float(os.environ.get("VEO_EXPECTED_SECONDS", 60))
+# Finished operations stay attachable this long, so a retry after a restart reuses the paid result
+RESULT_RETENTION_SECONDS = float(os.environ.get("VEO_RESULT_RETENTION_SECONDS", 3600))
+MAX_POLL_ERRORS = 5
+
+
+class _Tracked:
+    def __init__(self, operation, request_key: str, submitted_at: float):
+        self.operation = operation
+        self.request_key = request_key
+        self.submitted_at = submitted_at
+        self.future: Future = Future()
+        self.callbacks = []
+        self.next_poll = 0.0
+        self.overdue_polls = 0
+        self.errors = 0
+        self.finished_at: Optional[float] = None
+
+
+class OperationPoller:
+    """
+    One asyncio loop (on its own thread) polling every in-flight Veo operation.
+    Poll intervals adapt to the expected completion time: sparse while a generation is
+    young, tight around and after the expected finish. Operation names are persisted so
+    a restarted container resumes polling instead of submitting a new paid generation.
+    """
+
+    def __init__(self, client, state_path: Optional[str] = None):
+        self.client = client
+        self.state_path = state_path or os.environ.get(
+            "VEO_STATE_PATH", os.path.join(tempfile.gettempdir(), "amibuddy-veo-operations.json"))
+        self.expected_seconds = EXPECTED_SECONDS
+        self._tracked: Dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._thread = threading.Thread(target=self._run_loop, name="veo-poller", daemon=True)
+        self._thread.start()
+        self._resume()
+
+    # ---- public API (thread-safe) ----
+
+    def find(self, request_key: str) -> Optional[Future]:
+        """
+        Future for an in-flight or recently finished operation of an identical request, if any.
+        """
+        with self._lock:
+            tracked = self._tracked.get(request_key)
+            return tracked.future if tracked else None
+
+    def track(self, operation, request_key: str,
+              on_progress: Optional[Callable[[float], None]] = None) -> Future:
+        """
+        Starts polling a freshly submitted operation. The returned Future resolves to the finished operation.
+        """
+        with self._lock:
+            tracked = _Tracked(operation, request_key, time.time())
+            tracked.next_poll = tracked.submitted_at + MIN_INTERVAL
+            self._tracked[request_key] = tracked
+            if on_progress:
+                tracked.callbacks.append(on_progress)
+            self._save_locked()
+        self._loop.call_soon_threadsafe(self._wake)
+        return tracked.future
+
+    def add_progress_callback(self, request_key: str, on_progress: Callable[[float], None]):
+        with self._lock:
+            tracked = self._tracked.get(request_key)
+            if tracked:
+                tracked.callbacks.append(on_progress)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(1 for t in self._tracked.values() if not t.future.done())
+
+    # ---- persistence ----
+
+    def _save_locked(self):
+        state = {
+            key: {"operation": t.operation.name, "submitted_at": t.submitted_at, "finished_at": t.finished_at}
+            for key, t in self._tracked.items()
+        }
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"Could not persist Veo operations: {e}")
+
+    def _resume(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read persisted Veo operations: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, entry in state.items():
+                if entry.get("finished_at") and now - entry["finished_at"] > RESULT_RETENTION_SECONDS:
+                    continue
+                operation = types.GenerateVideosOperation(name=entry["operation"])
+                self._tracked[key] = _Tracked(operation, key, entry["submitted_at"])
+            self._save_locked()
+        if self._tracked:
+            logger.info(f"Resuming {len(self._tracked)} persisted Veo operation(s)")
+        self._loop.call_soon_threadsafe(self._wake)
+
+    # ---- polling loop ----
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._loop.run_until_complete(self._poll_forever())
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _interval(self, tracked: _Tracked, now: float) -> float:
+        remaining = self.expected_seconds - (now - tracked.submitted_at)
+        if remaining > 0:
+            # Far from done: check about twice before the expected finish
+            return min(MAX_INTERVAL, max(MIN_INTERVAL, remaining / 2))
+        # Overdue: poll tightly, backing off slowly if it keeps running
+        tracked.overdue_polls += 1
+        return min(MAX_INTERVAL, MIN_INTERVAL * (1.5 ** (tracked.overdue_polls - 1)))
+
+    async def _poll_one(self, tracked: _Tracked):
+        try:
+            operation = await self.client.aio.operations.get(tracked.operation)
+            tracked.errors = 0
+        except Exception as e:
+            tracked.errors += 1
+            logger.warning(f"Polling {tracked.operation.name} failed ({tracked.errors}/{MAX_POLL_ERRORS}): {e}")
+            if tracked.errors >= MAX_POLL_ERRORS:
+                self._finish(tracked, error=e)
+            else:
+                tracked.next_poll = time.time() + MIN_INTERVAL * (2 ** tracked.errors)
+            return
+
+        tracked.operation = operation
+        now = time.time()
+        if operation.done:
+            elapsed = now - tracked.submitted_at
+            # Exponentially weighted estimate of generation time
+            self.expected_seconds = 0.8 * self.expected_seconds + 0.2 * elapsed
+            observe("veo_generation", elapsed)
+            logger.info(f"Operation {operation.name} done after {elapsed:.1f}s")
+            self._finish(tracked)
+            return
+
+        tracked.next_poll = now + self._interval(tracked, now)
+        progress = min(0.95, (now - tracked.submitted_at) / max(self.expected_seconds, 1))
+        for callback in list(tracked.callbacks):
+            try:
+                callback(progress)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+    def _finish(self, tracked: _Tracked, error: Optional[Exception] = None):
+        with self._lock:
+            tracked.finished_at = time.time()
+            if error is not None or tracked.operation.error:
+                # Failed generations are not reused; an identical retry submits a new one
+                self._tracked.pop(tracked.request_key, None)
+            self._save_locked()
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(tracked.operation)
+
+    def _expire_finished(self, now: float):
+        with self._lock:
+            expired = [
+                key for key, t in self._tracked.items()
+                if t.finished_at and now - t.finished_at > RESULT_RETENTION_SECONDS
+            ]
+            for key in expired:
+                del self._tracked[key]
+            if expired:
+                self._save_locked()
+
+    async def _poll_forever(self):
+        while True:
+            now = time.time()
+            self._expire_finished(now)
+            with self._lock:
+                active = [t for t in self._tracked.values() if not t.future.done()]
+            due = [t for t in active if t.next_poll <= now]
+            if due:
+                await asyncio.gather(*(self._poll_one(t) for t in due))
+                continue
+
+            timeout = min((t.next_poll for t in active), default=now + 60) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0.05))
+            except asyncio.TimeoutError:
+                pass
@@ -8,6 +8,38 @@ export interface AnimationResponse {
     videoUri: string;
 }
 
+interface AnimationJob {
+    job_id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    stage: string;
+    progress: number;
+    result?: { video_url: string; character_name: string; description: string };
+    error?: string;
+}
+
+const JOB_POLL_INTERVAL_MS = 3000;
+const JOB_TIMEOUT_MS = 10 * 60 * 1000;
+
+async function waitForJob(baseUrl: string, jobId: string): Promise<AnimationJob> {
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        const response = await fetch(`${baseUrl}/jobs/${jobId}`);
+        if (!response.ok) {
+            throw new Error(`Job status request failed: ${response.status}`);
+        }
+        const job: AnimationJob = await response.json();
+        if (job.status === 'succeeded') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(`Animation job failed: ${job.error}`);
+        }
+        console.log(`Animation job ${jobId}: ${job.stage} (${Math.round(job.progress * 100)}%)`);
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    throw new Error('Animation job timed out');
+}
+
 export async function generateAnimation(imageUri: string, description?: string): Promise<string | null> {
     try {
         // Use configured URL or fallback to production
@@ -59,34 +91,25 @@ export async function generateAnimation(imageUri: string, description?: string):
             throw new Error(`Animation generation failed: ${response.status}`);
         }
 
-        // Response is a video file (blob)
+        // The server answers with a job id right away; the video is rendered in the background
+        const job: AnimationJob = await response.json();
+        const baseUrl = apiUrl.replace(/\/animate\/?$/, '');
+        const finishedJob = await waitForJob(baseUrl, job.job_id);
+        const videoUrl = `${baseUrl}${finishedJob.result!.video_url}`;
+
         if (isWeb) {
-            const videoBlob = await response.blob();
+            const videoResponse = await fetch(videoUrl);
+            const videoBlob = await videoResponse.blob();
             return URL.createObjectURL(videoBlob);
         } else {
             // Save to local filesystem
             const timestamp = new Date().getTime();
             const fileUri = `${FileSystem.documentDirectory}animation_${timestamp}.mp4`;
-
-            // We need to read as blob/buffer and write? 
-            // Actually, for binary response in React Native without blob support in old versions, 
-            // we might use FileSystem.downloadAsync instead.
-            // But we are POSTing data.
-            // We can use response.blob() -> FileReader -> base64 -> writeAsStringAsync
-
-            const blob = await response.blob();
-            const reader = new FileReader();
-            return new Promise((resolve, reject) => {
-                reader.onload = async () => {
-                    const base64data = (reader.result as string).split(',')[1];
-                    await FileSystem.writeAsStringAsync(fileUri, base64data, {
-                        encoding: FileSystem.EncodingType.Base64
-                    });
-                    resolve(fileUri);
-                };
-                reader.onerror = reject;
-                reader.readAsDataURL(blob);
-            });
+            const download = await FileSystem.downloadAsync(videoUrl, fileUri);
+            if (download.status !== 200) {
+                throw new Error(`Video download failed: ${download.status}`);
+            }
+            return download.uri;
         }
 
     } catch (error) {
@@ -97,9 +120,28 @@ export async function generateAnimation(imageUri: string, description?: string):
 export interface SegmentationResponse {
     rig_data: any;
     part_urls: { [key: string]: string };
+    image_hash?: string;
+    atlas?: AtlasResult;
 }
 
-export async function segmentCharacter(imageUri: string): Promise<SegmentationResponse | null> {
+export interface AtlasPart {
+    source: [number, number, number, number];
+    rect: [number, number, number, number];
+    pivot: { joint: string; source: [number, number]; local: [number, number] } | null;
+}
+
+export interface AtlasResult {
+    atlas_url: string;
+    manifest_url: string;
+    manifest: {
+        version: number;
+        image_size: [number, number];
+        atlas_size: [number, number];
+        parts: { [key: string]: AtlasPart };
+    };
+}
+
+export async function segmentCharacter(imageUri: string, layout: 'parts' | 'atlas' = 'parts'): Promise<SegmentationResponse | null> {
     try {
         // Use configured URL or fallback to production
         const apiUrl = Constants.expoConfig?.extra?.ANIMATION_API_URL || "https://animation-orchestrator-535548706733.asia-northeast1.run.app";
@@ -131,6 +173,8 @@ export async function segmentCharacter(imageUri: string): Promise<SegmentationRe
             } as any);
         }
 
+        formData.append('layout', layout);
+
         const response = await fetch(segmentUrl, {
             method: 'POST',
             body: formData,
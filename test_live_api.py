@@ -1,7 +1,9 @@
 import requests
 import os
+import time
 
-ENDPOINT = "https://animation-orchestrator-535548706733.asia-northeast1.run.app/animate"
+BASE_URL = "https://animation-orchestrator-535548706733.asia-northeast1.run.app"
+ENDPOINT = f"{BASE_URL}/animate"
 
 def create_red_square(path):
     from PIL import Image
@@ -22,13 +24,29 @@ def test_live_api():
             )
             
         print(f"Status Code: {response.status_code}")
-        if response.status_code == 200:
-            print("Success! Video headers:", response.headers)
-            with open("test_output_live.mp4", "wb") as f:
-                f.write(response.content)
-            print("Saved test_output_live.mp4")
-        else:
+        if response.status_code != 202:
             print("Error:", response.text)
+            return
+
+        job_id = response.json()["job_id"]
+        print(f"Job started: {job_id}")
+
+        while True:
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            print(f"  {job['status']} - {job['stage']} ({job['progress']:.0%})")
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(5)
+
+        if job["status"] == "failed":
+            print("Error:", job["error"])
+            return
+
+        video = requests.get(BASE_URL + job["result"]["video_url"])
+        print("Success! Video headers:", video.headers)
+        with open("test_output_live.mp4", "wb") as f:
+            f.write(video.content)
+        print("Saved test_output_live.mp4")
             
     finally:
         if os.path.exists(img_path):